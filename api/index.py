@@ -1,6 +1,13 @@
 #!/usr/bin/env python3
 """
 Vercel API endpoint для Telegram Bot
+
+В теплом контейнере event loop и инициализированное приложение (вместе с пулом
+HTTPX-соединений к Telegram API) переиспользуются между вызовами. Холодный старт
+выполняется один раз в cold_start().
+
+Клиент Google API импортируется лениво - при первой выгрузке анкеты, а не при
+загрузке модуля (профиль импорта: benchmarks/importtime_report.py).
 """
 
 import asyncio
@@ -8,7 +15,6 @@ import json
 import logging
 import sys
 import os
-from http.server import BaseHTTPRequestHandler
 from telegram import Update
 from telegram.ext import Application
 
@@ -17,6 +23,8 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from bot.handlers import setup_handlers
 from bot.config import Config
+from bot.rate_limiter import FloodControlRateLimiter
+from bot.update_processor import PerUserUpdateProcessor
 
 # Настройка логирования
 logging.basicConfig(
@@ -25,77 +33,179 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Глобальные переменные для бота
+# Размер пула соединений к Telegram API
+CONNECTION_POOL_SIZE = 32
+
+# Глобальные переменные для бота (живут, пока контейнер теплый)
 application = None
+survey_handlers = None
+_loop = None
+_cold_start_lock = None
+
+def _get_loop() -> asyncio.AbstractEventLoop:
+    """Получить постоянный event loop контейнера"""
+    global _loop
+    if _loop is None or _loop.is_closed():
+        _loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(_loop)
+    return _loop
+
+def _build_application() -> Application:
+    """Создать приложение с пулом HTTPX-соединений к Telegram API"""
+    global survey_handlers
+
+    # Загружаем переменные окружения из .env (в Vercel их задают в настройках проекта)
+    if os.path.exists('.env'):
+        from dotenv import load_dotenv
+        load_dotenv()
+
+    # В Vercel для записи доступен только /tmp
+    os.environ.setdefault('OUTBOX_PATH', '/tmp/survey_outbox.sqlite3')
+
+    # Инициализируем конфигурацию
+    config = Config()
+
+    # Webhook-режим: Updater не нужен, соединения к API переиспользуются
+    app = (
+        Application.builder()
+        .token(config.telegram_token)
+        .updater(None)
+        .concurrent_updates(PerUserUpdateProcessor(config.max_concurrent_updates))
+        .rate_limiter(FloodControlRateLimiter())
+        .connection_pool_size(CONNECTION_POOL_SIZE)
+        .pool_timeout(10.0)
+        .build()
+    )
+
+    # Настраиваем обработчики
+    survey_handlers = setup_handlers(app)
+    return app
 
-def initialize_bot_globally():
-    """Инициализация бота глобально"""
+async def cold_start() -> Application:
+    """Холодный старт: создать и инициализировать приложение один раз на контейнер"""
+    global application, _cold_start_lock
+
+    if application is not None:
+        return application
+
+    if _cold_start_lock is None:
+        _cold_start_lock = asyncio.Lock()
+
+    async with _cold_start_lock:
+        if application is None:
+            try:
+                app = _build_application()
+                # initialize() открывает HTTP-клиент и получает данные бота
+                await app.initialize()
+                application = app
+                logger.info("Бот инициализирован для Vercel")
+            except Exception as e:
+                logger.error(f"Ошибка при инициализации бота: {e}")
+                raise
+
+    return application
+
+async def process_update(update_data: dict):
+    """Обработать обновление и выгрузить анкеты до завершения вызова"""
+    app = await cold_start()
+    update = Update.de_json(update_data, app.bot)
+    # ASGI-сервер может вызывать функцию параллельно: обновления одного пользователя - по очереди
+    await app.update_processor.process_update(update, app.process_update(update))
+    # Между вызовами контейнер может быть заморожен, поэтому отложенные перерисовки
+    # клавиатур и очередь анкет сбрасываем сразу
+    await survey_handlers.keyboard_renderer.flush()
+    await survey_handlers.export_queue.flush()
+
+async def shutdown():
+    """Корректно остановить приложение"""
     global application
-    
     if application is None:
-        try:
-            # Загружаем переменные окружения
-            from dotenv import load_dotenv
-            load_dotenv()
-            
-            # Инициализируем конфигурацию
-            config = Config()
-            
-            # Инициализируем приложение
-            application = Application.builder().token(config.telegram_token).build()
-            
-            # Настраиваем обработчики
-            setup_handlers(application)
-            
-            logger.info("Бот инициализирован для Vercel")
-        except Exception as e:
-            logger.error(f"Ошибка при инициализации бота: {e}")
-            raise
+        return
+    await survey_handlers.shutdown(application)
+    await application.shutdown()
+    application = None
+
+def _json_response(status_code: int, payload: dict) -> dict:
+    return {
+        'statusCode': status_code,
+        'headers': {'Content-Type': 'application/json'},
+        'body': json.dumps(payload)
+    }
 
 def handler(request, context):
     """Основная функция для Vercel serverless"""
     try:
-        # Инициализируем бота если еще не инициализирован
-        initialize_bot_globally()
-        
         # Получаем метод запроса
         method = request.get('method', 'GET')
-        
+
         if method == 'POST':
             # Получаем тело запроса
             body = request.get('body', '{}')
-            
-            # Парсим JSON
-            update_data = json.loads(body)
-            update = Update.de_json(update_data, application.bot)
-            
-            # Обрабатываем обновление
-            asyncio.run(application.process_update(update))
-            
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json'},
-                'body': json.dumps({'status': 'ok'})
-            }
-        
+
+            # Обрабатываем обновление в постоянном event loop
+            _get_loop().run_until_complete(process_update(json.loads(body)))
+
+            return _json_response(200, {'status': 'ok'})
+
+        elif method == 'GET':
+            return _json_response(200, {'status': 'Bot is running'})
+
+        else:
+            return _json_response(405, {'error': 'Method not allowed'})
+
+    except Exception as e:
+        logger.error(f"Ошибка при обработке запроса: {e}")
+        return _json_response(500, {'error': str(e)})
+
+async def _send_json(send, status_code: int, payload: dict):
+    """Отправить JSON-ответ через ASGI"""
+    body = json.dumps(payload).encode('utf-8')
+    await send({
+        'type': 'http.response.start',
+        'status': status_code,
+        'headers': [(b'content-type', b'application/json')],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+async def app(scope, receive, send):
+    """ASGI-точка входа: event loop и приложение принадлежат ASGI-серверу"""
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                try:
+                    await cold_start()
+                    await send({'type': 'lifespan.startup.complete'})
+                except Exception as e:
+                    await send({'type': 'lifespan.startup.failed', 'message': str(e)})
+            elif message['type'] == 'lifespan.shutdown':
+                await shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    if scope['type'] != 'http':
+        return
+
+    method = scope.get('method', 'GET')
+    try:
+        if method == 'POST':
+            # Читаем тело запроса
+            body = b''
+            while True:
+                message = await receive()
+                body += message.get('body', b'')
+                if not message.get('more_body', False):
+                    break
+
+            await process_update(json.loads(body or b'{}'))
+            await _send_json(send, 200, {'status': 'ok'})
+
         elif method == 'GET':
-            return {
-                'statusCode': 200,
-                'headers': {'Content-Type': 'application/json'},
-                'body': json.dumps({'status': 'Bot is running'})
-            }
-        
+            await _send_json(send, 200, {'status': 'Bot is running'})
+
         else:
-            return {
-                'statusCode': 405,
-                'headers': {'Content-Type': 'application/json'},
-                'body': json.dumps({'error': 'Method not allowed'})
-            }
-            
+            await _send_json(send, 405, {'error': 'Method not allowed'})
+
     except Exception as e:
         logger.error(f"Ошибка при обработке запроса: {e}")
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json'},
-            'body': json.dumps({'error': str(e)})
-        }
+        await _send_json(send, 500, {'error': str(e)})
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+Выделения памяти на одно обновление: копии ответов и выборов против представлений только для чтения
+
+Для каждой операции показывается пиковый объем временной памяти (tracemalloc) и время.
+Бенчмарк завершается ошибкой, если операции без копирования начинают выделять память.
+"""
+
+import os
+import sys
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot.data_processor import DataProcessor
+from bot.survey_engine import Event, SurveyEngine
+from bot.survey_manager import SurveyManager
+from test_bulk import VALID_ANSWERS
+
+USER_ID = 1
+NUMBER = 100_000
+# Допустимая временная память операций без копирования (служебные объекты интерпретатора)
+NO_COPY_LIMIT = 256
+
+def peak_allocation(func) -> int:
+    """Пиковый объем памяти, выделенной во время одного вызова func"""
+    func()  # прогрев кэшей
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    tracemalloc.reset_peak()
+    func()
+    peak = tracemalloc.get_traced_memory()[1] - baseline
+    tracemalloc.stop()
+    return peak
+
+def make_manager() -> SurveyManager:
+    manager = SurveyManager()
+    for question_id, answer in VALID_ANSWERS.items():
+        manager.save_answer(USER_ID, question_id, answer)
+    manager.set_current_question(USER_ID, "q3_2")
+    manager.save_multi_choice_selection(USER_ID, "q3_2_finance", True)
+    return manager
+
+def legacy_toggle(manager: SurveyManager):
+    """Прежнее переключение выбора: список выборов ради одной проверки"""
+    is_selected = "q3_2_other" in manager.get_multi_choice_selections(USER_ID)
+    manager.save_multi_choice_selection(USER_ID, "q3_2_other", not is_selected)
+    return manager.get_multi_choice_mask(USER_ID)
+
+def main():
+    manager = make_manager()
+    processor = DataProcessor(manager)
+    engine = SurveyEngine(manager)
+
+    def engine_text_update():
+        # Переход по текстовому ответу с возвратом на тот же вопрос
+        manager.set_current_question(USER_ID, "q5_1")
+        engine.handle(USER_ID, Event.TEXT, text="Нет")
+
+    cases = [
+        ("Ответ: get_all_answers().get()", lambda: manager.get_all_answers(USER_ID).get("q2_2"), None),
+        ("Ответ: get_answer()", lambda: manager.get_answer(USER_ID, "q2_2"), NO_COPY_LIMIT),
+        ("Ответы: get_all_answers()", lambda: manager.get_all_answers(USER_ID), None),
+        ("Ответы: get_answers_view()", lambda: manager.get_answers_view(USER_ID), NO_COPY_LIMIT),
+        ("Выбор: список выборов + save", lambda: legacy_toggle(manager), None),
+        ("Выбор: toggle_multi_choice_selection", lambda: manager.toggle_multi_choice_selection(USER_ID, "q3_2_other"),
+         NO_COPY_LIMIT),
+        ("Выбор: is_option_selected", lambda: manager.is_option_selected(USER_ID, "q3_2_finance"), NO_COPY_LIMIT),
+        ("Обновление: текстовый ответ", engine_text_update, None),
+        ("Завершение: строки для Sheets", lambda: processor.format_answers_for_sheets(USER_ID), None),
+    ]
+
+    failures = []
+    print(f"{'Операция':<40} {'Память, байт':>12} {'Время, мкс':>11}")
+    for name, func, limit in cases:
+        peak = peak_allocation(func)
+        elapsed = min(timeit.repeat(func, number=NUMBER, repeat=3)) / NUMBER
+        print(f"{name:<40} {peak:>12} {elapsed * 1e6:>11.3f}")
+        if limit is not None and peak > limit:
+            failures.append(f"{name}: {peak} байт > {limit}")
+
+    if failures:
+        raise SystemExit("Операции без копирования выделяют память:\n" + "\n".join(failures))
+
+if __name__ == "__main__":
+    main()
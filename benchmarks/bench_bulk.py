@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Пакетная обработка архива анкет: через состояние SurveyManager (по одному пользователю)
+против BulkProcessor последовательно и в пуле процессов
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot.bulk import BulkProcessor
+from bot.data_processor import DataProcessor
+from bot.survey_manager import SurveyManager
+from test_bulk import VALID_ANSWERS
+
+SESSIONS = 20_000
+
+def make_records():
+    """Архив анкет: каждая десятая с ошибкой в кадастровом номере"""
+    for index in range(SESSIONS):
+        answers = dict(VALID_ANSWERS, q1_1=f"Иванов Иван Иванович {index}")
+        if index % 10 == 0:
+            answers["q1_5"] = "50-20-0010336-38"
+        yield answers
+
+def run_through_manager() -> int:
+    """Прежний путь: ответы загружаются в состояние пользователя и форматируются по user_id"""
+    manager = SurveyManager()
+    processor = DataProcessor(manager)
+    invalid = 0
+    for user_id, answers in enumerate(make_records()):
+        for question_id, answer in answers.items():
+            manager.save_answer(user_id, question_id, answer)
+        processor.format_answers_for_sheets(user_id)
+        stored = manager.get_all_answers(user_id)
+        valid = True
+        for question_id in manager.graph.question_ids:
+            answer = stored.get(question_id)
+            if isinstance(answer, dict):
+                answer = answer.get("option", answer.get("options"))
+            valid &= bool(answer) and processor.validate_answer(question_id, answer)
+        invalid += not valid
+        manager.clear_user_state(user_id)
+    return invalid
+
+def run_bulk(workers: int) -> int:
+    processor = BulkProcessor.from_config_file()
+    return sum(not result.is_valid for result in processor.process(make_records(), workers=workers))
+
+def measure(name, func, *args):
+    started = time.perf_counter()
+    invalid = func(*args)
+    elapsed = time.perf_counter() - started
+    print(f"{name:<36} {elapsed:6.2f} с  {SESSIONS / elapsed:8.0f} анкет/с  (с ошибками: {invalid})")
+
+def main():
+    cpus = os.cpu_count() or 1
+    print(f"Анкет: {SESSIONS}, процессоров: {cpus}")
+    measure("SurveyManager + DataProcessor", run_through_manager)
+    measure("BulkProcessor, один процесс", run_bulk, 0)
+    for workers in sorted({2, max(cpus, 2)}):
+        measure(f"BulkProcessor, пул из {workers} процессов", run_bulk, workers)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Разбор callback_data: цепочка startswith + split против словаря CallbackCodec
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot.callback_data import CallbackAction, CallbackCodec
+from bot.survey_manager import SurveyManager
+
+NUMBER = 200_000
+
+def legacy_decode(data: str):
+    """Прежний разбор в handle_callback_query"""
+    if data == "start_survey":
+        return ("start_survey",)
+    elif data.startswith("single_choice:"):
+        _, question_id, option_id = data.split(":", 2)
+        return ("single_choice", question_id, option_id)
+    elif data.startswith("multi_choice_toggle:"):
+        _, question_id, option_id = data.split(":", 2)
+        return ("multi_choice_toggle", question_id, option_id)
+    elif data.startswith("multi_choice_done:"):
+        _, question_id = data.split(":", 1)
+        return ("multi_choice_done", question_id)
+    elif data.startswith("skip_comment:"):
+        _, question_id, option_id = data.split(":", 2)
+        return ("skip_comment", question_id, option_id)
+    return None
+
+def main():
+    codec = CallbackCodec(SurveyManager().graph)
+    samples = [
+        (CallbackAction.SINGLE_CHOICE, "q4_1_consultation", "no"),
+        (CallbackAction.MULTI_CHOICE_TOGGLE, "q3_1", "q3_1_greenhouse"),
+        (CallbackAction.SKIP_COMMENT, "q3_1", "q3_1_other"),
+    ]
+    print(f"{'Кнопка':<52} {'байт':>5} {'прежний, нс':>12} {'токен, нс':>10}")
+    for action, question_id, option_id in samples:
+        legacy = f"{action.value}:{question_id}:{option_id}"
+        token = codec.encode(action, question_id, option_id)
+        legacy_time = min(timeit.repeat(lambda: legacy_decode(legacy), number=NUMBER, repeat=3)) / NUMBER
+        token_time = min(timeit.repeat(lambda: codec.decode(token), number=NUMBER, repeat=3)) / NUMBER
+        print(f"{legacy:<44} -> {token:<6} {len(token):>4} {legacy_time * 1e9:>12.0f} {token_time * 1e9:>10.0f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Время подготовки строк для Google Sheets при завершении анкеты:
+форматирование всех ответов разом против копирования ответов, отформатированных при сохранении
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot.data_processor import DataProcessor, format_answers, format_answers_row
+from bot.survey_manager import SurveyManager
+from test_bulk import VALID_ANSWERS
+
+NUMBER = 20_000
+
+def main():
+    manager = SurveyManager()
+    processor = DataProcessor(manager)
+    for question_id, answer in VALID_ANSWERS.items():
+        manager.save_answer(1, question_id, answer)
+
+    graph = manager.graph
+    assert processor.format_answers_for_sheets(1) == format_answers(graph, manager.get_all_answers(1))
+    assert processor.format_answers_wide(1) == [format_answers_row(graph, manager.get_all_answers(1))]
+
+    cases = [
+        ("Блоки: форматирование при завершении", lambda: format_answers(graph, manager.get_all_answers(1))),
+        ("Блоки: готовые ячейки", lambda: processor.format_answers_for_sheets(1)),
+        ("Строка: форматирование при завершении", lambda: format_answers_row(graph, manager.get_all_answers(1))),
+        ("Строка: готовые ячейки", lambda: processor.format_answers_wide(1)),
+    ]
+    for name, func in cases:
+        elapsed = min(timeit.repeat(func, number=NUMBER, repeat=5)) / NUMBER
+        print(f"{name:<40} {elapsed * 1e6:7.2f} мкс")
+
+if __name__ == "__main__":
+    main()
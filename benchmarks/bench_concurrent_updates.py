@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный тест обработки обновлений: последовательная обработка против
+PerUserUpdateProcessor (параллельно между пользователями, по очереди внутри пользователя)
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram import CallbackQuery, Update, User
+from telegram.ext import SimpleUpdateProcessor
+from bot.update_processor import PerUserUpdateProcessor
+
+UPDATES_PER_USER = 10
+# Время обработки обновления: в основном ожидание ответа Telegram API
+HANDLER_LATENCY = 0.01
+
+def make_update(update_id: int, user_id: int) -> Update:
+    user = User(id=user_id, first_name="user", is_bot=False)
+    query = CallbackQuery(id=str(update_id), from_user=user, chat_instance="bench",
+                          data="multi_choice_toggle:q2_3:q2_3_water")
+    return Update(update_id=update_id, callback_query=query)
+
+async def run_load(processor, users: int) -> float:
+    """Отправить обновления users пользователей вперемешку и дождаться обработки"""
+    applied = {user_id: [] for user_id in range(users)}
+
+    async def handle(update: Update):
+        user_id = update.effective_user.id
+        await asyncio.sleep(HANDLER_LATENCY)
+        applied[user_id].append(update.update_id)
+
+    updates = [
+        make_update(index * users + user_id, user_id)
+        for index in range(UPDATES_PER_USER)
+        for user_id in range(users)
+    ]
+    async with processor:
+        started = time.perf_counter()
+        # Как Application: задача на каждое обновление в порядке получения
+        await asyncio.gather(*(
+            asyncio.create_task(processor.process_update(update, handle(update))) for update in updates
+        ))
+        elapsed = time.perf_counter() - started
+
+    for user_id, update_ids in applied.items():
+        assert update_ids == sorted(update_ids), f"Нарушен порядок обновлений пользователя {user_id}"
+    return elapsed
+
+def main():
+    print(f"Обновлений на пользователя: {UPDATES_PER_USER}, обработка: {HANDLER_LATENCY * 1000:.0f} мс")
+    print(f"{'пользователей':>14} {'последовательно':>18} {'по пользователям':>18} {'ускорение':>10}")
+    for users in (1, 10, 100, 250):
+        total = users * UPDATES_PER_USER
+        sequential = asyncio.run(run_load(SimpleUpdateProcessor(1), users))
+        per_user = asyncio.run(run_load(PerUserUpdateProcessor(256), users))
+        print(f"{users:>14} {total / sequential:>13.0f} upd/s {total / per_user:>13.0f} upd/s "
+              f"{sequential / per_user:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
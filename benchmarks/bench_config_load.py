@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+"""
+Загрузка конфигурации опроса: JSON + проверка + компиляция против проверенного снимка из файла
+"""
+
+import json
+import os
+import sys
+import tempfile
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot.config_lint import lint_survey_config
+from bot.survey_snapshot import load_snapshot, write_snapshot_artifact
+
+NUMBER = 2000
+
+def measure(name: str, func):
+    elapsed = timeit.timeit(func, number=NUMBER)
+    print(f"{name:<32} {elapsed / NUMBER * 1e6:8.1f} мкс")
+
+def main():
+    with open("survey_config.json", 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    with tempfile.TemporaryDirectory() as directory:
+        artifact_file = os.path.join(directory, "survey_config.snapshot")
+        size = write_snapshot_artifact(load_snapshot("survey_config.json", 1), artifact_file)
+        print(f"survey_config.json: {os.path.getsize('survey_config.json')} байт, снимок: {size} байт")
+
+        measure("Проверка (lint_survey_config)", lambda: lint_survey_config(config))
+        measure("JSON + проверка + компиляция", lambda: load_snapshot("survey_config.json", 1))
+        measure("Проверенный снимок", lambda: load_snapshot("survey_config.json", 1, artifact_file))
+
+if __name__ == "__main__":
+    main()
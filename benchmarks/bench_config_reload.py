@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Перезагрузка конфигурации опроса: задержка event loop при компиляции в нем и в отдельном потоке
+
+Пока идет перезагрузка, фоновая задача "тикает" каждую миллисекунду; максимальная
+задержка тика - время, на которое остановились бы ответы всем пользователям.
+Из потока компиляция не блокирует loop; остаток задержки - сборка мусора по хранимым версиям.
+"""
+
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot.survey_snapshot import SurveyConfigRegistry
+
+# Во сколько раз увеличить опрос, чтобы компиляция занимала заметное время
+COPIES = 40
+RELOADS = 5
+TICK = 0.001
+
+def make_config(copies: int, revision: int):
+    """Конфигурация из copies копий вопросов survey_config.json"""
+    with open("survey_config.json", 'r', encoding='utf-8') as f:
+        base = json.load(f)
+    questions = {}
+    ids = list(base["questions"])
+    for copy in range(copies):
+        for question_id in ids:
+            question = dict(base["questions"][question_id])
+            question["text"] = f"{question['text']} ({revision})"
+            if "options" in question:
+                question["options"] = [dict(option) for option in question["options"]]
+            if question.get("next") in base["questions"]:
+                question["next"] = f"{question['next']}_{copy}"
+            elif copy + 1 < copies:
+                question["next"] = f"{ids[0]}_{copy + 1}"
+            questions[f"{question_id}_{copy}"] = question
+    return {**base, "questions": questions}
+
+async def measure(name: str, registry: SurveyConfigRegistry, path: str, reload):
+    """Максимальная задержка тика event loop во время перезагрузок"""
+    max_lag = 0.0
+    # Задержка тика до первой перезагрузки не учитывается
+    await asyncio.sleep(0)
+    running = True
+
+    async def ticker():
+        nonlocal max_lag
+        while running:
+            started = time.perf_counter()
+            await asyncio.sleep(TICK)
+            max_lag = max(max_lag, time.perf_counter() - started - TICK)
+
+    # Файлы готовятся заранее: измеряется только перезагрузка
+    payloads = [
+        json.dumps(make_config(COPIES, registry.current.version + revision + 1), ensure_ascii=False)
+        for revision in range(RELOADS)
+    ]
+    task = asyncio.create_task(ticker())
+    elapsed = 0.0
+    for payload in payloads:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(payload)
+        await asyncio.sleep(0.05)
+        started = time.perf_counter()
+        await reload(registry)
+        elapsed += time.perf_counter() - started
+    await asyncio.sleep(0.05)
+    running = False
+    await task
+    print(f"{name:<28} перезагрузка {elapsed / RELOADS * 1000:7.1f} мс, "
+          f"макс. задержка loop {max_lag * 1000:7.1f} мс")
+
+async def sync_reload(registry: SurveyConfigRegistry):
+    registry.reload()
+
+async def async_reload(registry: SurveyConfigRegistry):
+    await registry.reload_async()
+
+async def main():
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "survey_config.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(make_config(COPIES, 0), f, ensure_ascii=False)
+        registry = SurveyConfigRegistry(path)
+        print(f"Вопросов в опросе: {len(registry.current.graph.questions)}")
+        await measure("Компиляция в event loop", registry, path, sync_reload)
+        await measure("reload_async (поток)", registry, path, async_reload)
+
+if __name__ == "__main__":
+    asyncio.run(main())
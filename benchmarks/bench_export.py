@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Выгрузка анкет в CSV: потоковая запись порциями против сборки всех строк в памяти
+
+Пиковая память потоковой выгрузки не растет с числом анкет.
+"""
+
+import csv
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot.bulk import BulkProcessor
+from bot.export import KEY_COLUMN, SurveyExporter
+from test_bulk import VALID_ANSWERS
+
+SIZES = (10_000, 100_000)
+
+def make_surveys(processor: BulkProcessor, count: int):
+    """Анкеты в формате журнала: (ключ, строки format_answers_for_sheets)"""
+    rows = processor.format_rows(VALID_ANSWERS)
+    for index in range(count):
+        yield f"survey-{index}", [[question, f"{answer} {index}"] for question, answer in rows]
+
+def export_in_memory(exporter: SurveyExporter, surveys, path: str) -> int:
+    """Прежний подход: все строки собираются в список и пишутся разом"""
+    records = [[key] + exporter.to_answers(rows) for key, rows in surveys]
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow([KEY_COLUMN] + exporter.question_ids)
+        writer.writerows(records)
+    return len(records)
+
+def export_streaming(exporter: SurveyExporter, surveys, path: str) -> int:
+    return exporter.to_csv(surveys, path)
+
+def measure(name, func, exporter, processor, count, path):
+    tracemalloc.start()
+    started = time.perf_counter()
+    func(exporter, make_surveys(processor, count), path)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<24} {count:>7} анкет  {elapsed:6.2f} с  {count / elapsed:8.0f} анкет/с  "
+          f"пик памяти {peak / 1024 / 1024:7.2f} МБ")
+
+def main():
+    processor = BulkProcessor.from_config_file()
+    exporter = SurveyExporter(processor.graph)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "responses.csv")
+        for count in SIZES:
+            measure("Все строки в памяти", export_in_memory, exporter, processor, count, path)
+            measure("Потоковая запись", export_streaming, exporter, processor, count, path)
+
+if __name__ == "__main__":
+    main()
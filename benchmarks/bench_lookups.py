@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Микро-бенчмарк поиска вариантов: линейный поиск по конфигурации против скомпилированного графа
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot.survey_manager import SurveyManager
+from bot.data_processor import DataProcessor
+
+ITERATIONS = 200_000
+
+def linear_requires_comment(manager: SurveyManager, question_id: str, option_id: str) -> bool:
+    """Прежняя реализация: линейный проход по списку вариантов"""
+    for option in manager.get_question_options(question_id):
+        if option.get("id") == option_id:
+            return option.get("comment_required", False)
+    return False
+
+def linear_format_multi(manager: SurveyManager, question_id: str, option_ids) -> str:
+    """Прежняя реализация форматирования: повторный проход для каждого выбранного варианта"""
+    options = manager.get_question_options(question_id)
+    formatted = []
+    for option_id in option_ids:
+        for option in options:
+            if option.get("id") == option_id:
+                formatted.append(option.get("display_text", option.get("text", "")))
+                break
+    return "; ".join(formatted)
+
+def report(name: str, legacy_seconds: float, compiled_seconds: float):
+    legacy_ns = legacy_seconds / ITERATIONS * 1e9
+    compiled_ns = compiled_seconds / ITERATIONS * 1e9
+    print(f"{name:<40} {legacy_ns:8.0f} нс -> {compiled_ns:8.0f} нс (x{legacy_ns / compiled_ns:.1f})")
+
+def main():
+    """Запуск бенчмарка"""
+    manager = SurveyManager()
+    processor = DataProcessor(manager)
+    question = manager.get_compiled_question("q3_1")
+    # Последний вариант - худший случай для линейного поиска
+    last_option = question.option_ids[-1]
+    selected = list(question.option_ids)
+
+    report(
+        "get_option_requires_comment (q3_1)",
+        timeit.timeit(lambda: linear_requires_comment(manager, "q3_1", last_option), number=ITERATIONS),
+        timeit.timeit(lambda: manager.get_option_requires_comment("q3_1", last_option), number=ITERATIONS),
+    )
+    report(
+        "форматирование multi_choice (7 вариантов)",
+        timeit.timeit(lambda: linear_format_multi(manager, "q3_1", selected), number=ITERATIONS),
+        timeit.timeit(lambda: processor._format_answer("q3_1", selected), number=ITERATIONS),
+    )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Пропускная способность параллельной выгрузки анкет: googleapiclient в пуле потоков
+против асинхронного REST-клиента httpx (локальная заглушка API с задержкой ответа)
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from google.oauth2.credentials import Credentials
+from bot.google_sheets import GoogleSheetsManager
+from bot.sheets_async import AsyncSheetsManager, http2_available
+from test_sheets_async import STUB_TOKEN, SheetsStubServer
+
+REQUESTS = 200
+CONCURRENCY = 32
+# Задержка ответа заглушки, имитирующая сетевой round-trip до Google
+LATENCY = 0.02
+
+SURVEY = [["Вопрос", "Ответ"]] * 20
+
+async def run_exports(manager) -> float:
+    """Выполнить REQUESTS пакетных записей не более чем по CONCURRENCY одновременно"""
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+
+    async def export():
+        async with semaphore:
+            await manager.append_survey_batch_async([SURVEY])
+
+    started = time.perf_counter()
+    await asyncio.gather(*(export() for _ in range(REQUESTS)))
+    elapsed = time.perf_counter() - started
+    await manager.close_async()
+    return elapsed
+
+def main():
+    print(f"Запросов: {REQUESTS}, параллельно: {CONCURRENCY}, задержка заглушки: {LATENCY * 1000:.0f} мс")
+    print(f"HTTP/2 (h2): {'да' if http2_available() else 'нет, HTTP/1.1'}")
+
+    backends = [
+        ("googleapiclient, 4 потока", lambda url: GoogleSheetsManager(
+            "", "bench", credentials=Credentials(token=STUB_TOKEN), api_endpoint=url)),
+        (f"googleapiclient, {CONCURRENCY} потока", lambda url: GoogleSheetsManager(
+            "", "bench", max_workers=CONCURRENCY, credentials=Credentials(token=STUB_TOKEN), api_endpoint=url)),
+        ("httpx AsyncClient", lambda url: AsyncSheetsManager(
+            "", "bench", max_connections=CONCURRENCY, credentials=Credentials(token=STUB_TOKEN), api_endpoint=url)),
+    ]
+    for name, factory in backends:
+        with SheetsStubServer(latency=LATENCY) as stub:
+            elapsed = asyncio.run(run_exports(factory(stub.url)))
+            assert stub.requests == REQUESTS
+        print(f"{name:<28} {elapsed:6.2f} с  {REQUESTS / elapsed:7.1f} запросов/с")
+
+if __name__ == "__main__":
+    main()
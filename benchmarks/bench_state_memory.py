@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк памяти: байт на активную сессию опроса при 100 000 сессий
+"""
+
+import gc
+import os
+import sys
+import tracemalloc
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot.survey_manager import SurveyManager
+
+SESSIONS = 100_000
+
+@dataclass
+class LegacySurveyState:
+    """Прежнее представление состояния (dataclass со списком выборов)"""
+    user_id: int
+    current_question: str = "start"
+    answers: Dict[str, Any] = field(default_factory=dict)
+    multi_choice_selections: List[str] = field(default_factory=list)
+    waiting_for_comment: Optional[str] = None
+    comment_question: Optional[str] = None
+
+def fill_session(manager: SurveyManager, user_id: int):
+    """Типичная сессия в середине анкеты: 7 ответов и выбор на вопросе 3.1"""
+    manager.set_current_question(user_id, "q1_1")
+    manager.save_answer(user_id, "q1_1", "Иванов Иван Иванович")
+    manager.save_answer(user_id, "q1_2", "@ivanov")
+    manager.save_answer(user_id, "q1_3", "12.5")
+    manager.save_answer(user_id, "q1_4", "Краснодар")
+    manager.save_answer(user_id, "q1_5", "23:45:0101001:123")
+    manager.save_answer(user_id, "q2_2", {"option": "no", "comment": ""})
+    manager.save_answer(user_id, "q2_3", {"options": ["q2_3_water"], "comments": {}})
+    manager.set_current_question(user_id, "q3_1")
+    manager.save_multi_choice_selection(user_id, "q3_1_organic", True)
+    manager.save_multi_choice_selection(user_id, "q3_1_processing", True)
+
+def fill_legacy(user_id: int) -> LegacySurveyState:
+    """Та же сессия в прежнем представлении (ключи ответов - новые строки из JSON/ввода)"""
+    state = LegacySurveyState(user_id=user_id, current_question="".join(["q3", "_1"]))
+    state.answers["".join(["q1", "_1"])] = "Иванов Иван Иванович"
+    state.answers["".join(["q1", "_2"])] = "@ivanov"
+    state.answers["".join(["q1", "_3"])] = "12.5"
+    state.answers["".join(["q1", "_4"])] = "Краснодар"
+    state.answers["".join(["q1", "_5"])] = "23:45:0101001:123"
+    state.answers["".join(["q2", "_2"])] = {"option": "no", "comment": ""}
+    state.answers["".join(["q2", "_3"])] = {"options": ["q2_3_water"], "comments": {}}
+    state.multi_choice_selections.append("".join(["q3_1_", "organic"]))
+    state.multi_choice_selections.append("".join(["q3_1_", "processing"]))
+    return state
+
+def measure(build) -> float:
+    """Измерить прирост памяти на одну сессию"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    holder = build()
+    gc.collect()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del holder
+    return (after - before) / SESSIONS
+
+def build_compact():
+    manager = SurveyManager(max_sessions=SESSIONS, session_ttl=None)
+    for user_id in range(SESSIONS):
+        fill_session(manager, user_id)
+    return manager
+
+def build_legacy():
+    return {user_id: fill_legacy(user_id) for user_id in range(SESSIONS)}
+
+def main():
+    """Запуск бенчмарка"""
+    legacy = measure(build_legacy)
+    compact = measure(build_compact)
+    print(f"Сессий: {SESSIONS}")
+    print(f"Прежнее представление (dataclass): {legacy:.0f} байт/сессию")
+    print(f"Компактное представление (__slots__): {compact:.0f} байт/сессию")
+    print(f"Экономия: {(1 - compact / legacy) * 100:.1f}%")
+
+if __name__ == "__main__":
+    main()
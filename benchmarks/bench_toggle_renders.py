@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Количество запросов edit_message_reply_markup на вопросах с множественным выбором:
+перерисовка на каждое нажатие против RenderCoalescer
+"""
+
+import asyncio
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot.render_coalescer import RenderCoalescer
+
+USERS = 200
+OPTIONS = 6
+# Время указано в масштабе 1:10: пауза 0.3 с (не дольше 1 с), нажатия каждые 0.05..0.25 с
+WINDOW = 0.03
+MAX_DELAY = 0.1
+TAP_INTERVAL = (0.005, 0.025)
+TAPS_PER_USER = (3, 10)
+
+async def simulate_user(coalescer: RenderCoalescer, user_id: int, rng: random.Random, calls: list):
+    async def render(mask):
+        calls.append(user_id)
+
+    coalescer.mark_rendered(user_id, 0)
+    mask = 0
+    taps = rng.randint(*TAPS_PER_USER)
+    for _ in range(taps):
+        mask ^= 1 << rng.randrange(OPTIONS)
+        coalescer.schedule(user_id, mask, render)
+        await asyncio.sleep(rng.uniform(*TAP_INTERVAL))
+    return taps
+
+async def run():
+    coalescer = RenderCoalescer(window=WINDOW, max_delay=MAX_DELAY)
+    rng = random.Random(42)
+    calls = []
+    taps = await asyncio.gather(*(simulate_user(coalescer, user_id, rng, calls) for user_id in range(USERS)))
+    await asyncio.sleep(WINDOW * 2)
+    await coalescer.flush()
+    return sum(taps), len(calls), coalescer.skipped_count
+
+def main():
+    taps, calls, skipped = asyncio.run(run())
+    print(f"Пользователей: {USERS}, нажатий: {taps}")
+    print(f"Перерисовка на каждое нажатие: {taps} запросов")
+    print(f"RenderCoalescer:               {calls} запросов ({taps / calls:.1f}x меньше, "
+          f"пустых перерисовок пропущено: {skipped})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Горячий путь обработки обновления без Telegram: прежняя последовательность вызовов
+SurveyManager из обработчиков против таблицы переходов SurveyEngine
+"""
+
+import os
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot.survey_engine import Event, SurveyEngine
+from bot.survey_manager import SurveyManager
+
+SURVEYS = 5_000
+
+TEXT_ANSWERS = {
+    "q1_1": "Иванов Иван Иванович", "q1_2": "@ivanov", "q1_3": "12.5", "q1_4": "Краснодар",
+    "q1_5": "50:20:0010336:38", "q2_1": "Пашня", "q5_1": "Нет",
+    "q7_phone": "+7 (912) 345-67-89", "q7_email": "ivanov@mail.ru",
+}
+SINGLE_ANSWERS = {
+    "q2_2": "no", "q3_3": "maybe", "q4_1_water": "yes", "q4_1_electricity": "no",
+    "q4_1_roads": "yes", "q4_1_consultation": "no", "q4_2": "no",
+}
+MULTI_ANSWERS = {"q2_3": ["q2_3_water"], "q3_1": ["q3_1_plant"], "q3_2": ["q3_2_finance"]}
+
+def legacy_single_choice(manager: SurveyManager, user_id: int, question_id: str, option_id: str):
+    """Прежний _handle_single_choice без отправки сообщений"""
+    selected_option = manager.get_option(question_id, option_id)
+    if selected_option.comment_required and selected_option.comment_type != "none":
+        manager.set_waiting_for_comment(user_id, option_id, selected_option.comment_question)
+        return
+    manager.save_answer(user_id, question_id, {"option": option_id, "comment": ""})
+    manager.move_to_next_question(user_id)
+    manager.get_current_question(user_id)
+
+def legacy_multi_choice_done(manager: SurveyManager, user_id: int, question_id: str):
+    """Прежний _handle_multi_choice_done без отправки сообщений"""
+    selected_options = manager.get_multi_choice_selections(user_id)
+    options_needing_comments = [
+        option_id for option_id in selected_options
+        if manager.get_option_requires_comment(question_id, option_id)
+    ]
+    if options_needing_comments:
+        option_id = options_needing_comments[0]
+        comment_question = manager.get_option_comment_question(question_id, option_id)
+        manager.set_waiting_for_comment(user_id, option_id, comment_question)
+        return
+    manager.save_answer(user_id, question_id, {"options": selected_options, "comments": {}})
+    manager.clear_multi_choice_selections(user_id)
+    manager.move_to_next_question(user_id)
+    manager.get_current_question(user_id)
+
+def legacy_comment(manager: SurveyManager, user_id: int, text: str):
+    """Прежний _handle_comment_input для множественного выбора без отправки сообщений"""
+    option_id = manager.get_waiting_option_id(user_id)
+    current_question = manager.get_current_question(user_id)
+    current_answer = manager.get_all_answers(user_id).get(current_question, {})
+    manager.get_question_type(current_question)
+    selected_options = manager.get_multi_choice_selections(user_id)
+    if isinstance(current_answer, dict) and "options" in current_answer:
+        current_answer["comments"][option_id] = text
+    else:
+        current_answer = {"options": selected_options, "comments": {option_id: text}}
+    manager.save_answer(user_id, current_question, current_answer)
+    manager.clear_waiting_for_comment(user_id)
+    options_needing_comments = [
+        opt_id for opt_id in selected_options
+        if manager.get_option_requires_comment(current_question, opt_id)
+        and opt_id not in current_answer.get("comments", {})
+    ]
+    if not options_needing_comments:
+        manager.clear_multi_choice_selections(user_id)
+        manager.move_to_next_question(user_id)
+        manager.get_current_question(user_id)
+
+def legacy_text(manager: SurveyManager, user_id: int, text: str):
+    """Прежний handle_text_message + _handle_text_answer без отправки сообщений"""
+    if manager.is_waiting_for_comment(user_id):
+        legacy_comment(manager, user_id, text)
+        return
+    current_question = manager.get_current_question(user_id)
+    manager.get_question_type(current_question)
+    manager.save_answer(user_id, current_question, text)
+    manager.move_to_next_question(user_id)
+    manager.get_current_question(user_id)
+
+def run_legacy(manager: SurveyManager, user_id: int):
+    manager.set_current_question(user_id, "q1_1")
+    for question_id in manager.graph.question_ids:
+        if question_id in TEXT_ANSWERS:
+            legacy_text(manager, user_id, TEXT_ANSWERS[question_id])
+        elif question_id in SINGLE_ANSWERS:
+            legacy_single_choice(manager, user_id, question_id, SINGLE_ANSWERS[question_id])
+        else:
+            for option_id in MULTI_ANSWERS[question_id]:
+                manager.save_multi_choice_selection(user_id, option_id, True)
+            legacy_multi_choice_done(manager, user_id, question_id)
+            if manager.is_waiting_for_comment(user_id):
+                legacy_text(manager, user_id, "комментарий")
+
+def run_engine(engine: SurveyEngine, user_id: int):
+    manager = engine.survey_manager
+    engine.handle(user_id, Event.START)
+    for question_id in manager.graph.question_ids:
+        if question_id in TEXT_ANSWERS:
+            engine.handle(user_id, Event.TEXT, text=TEXT_ANSWERS[question_id])
+        elif question_id in SINGLE_ANSWERS:
+            engine.handle(user_id, Event.SINGLE_CHOICE, question_id, SINGLE_ANSWERS[question_id])
+        else:
+            for option_id in MULTI_ANSWERS[question_id]:
+                manager.save_multi_choice_selection(user_id, option_id, True)
+            engine.handle(user_id, Event.MULTI_CHOICE_DONE, question_id)
+            if manager.is_waiting_for_comment(user_id):
+                engine.handle(user_id, Event.TEXT, text="комментарий")
+
+def measure(name, run, target, manager: SurveyManager):
+    started = time.perf_counter()
+    for user_id in range(SURVEYS):
+        run(target, user_id)
+        manager.commit_user_state(user_id)
+    elapsed = time.perf_counter() - started
+    assert manager.is_survey_completed(SURVEYS - 1)
+    print(f"{name:<28} {elapsed / SURVEYS * 1e6:8.1f} мкс/анкету")
+
+def main():
+    print(f"Анкет: {SURVEYS}")
+    legacy_manager = SurveyManager(max_sessions=SURVEYS)
+    measure("Обработчики (прежний путь)", run_legacy, legacy_manager, legacy_manager)
+
+    engine_manager = SurveyManager(max_sessions=SURVEYS)
+    engine = SurveyEngine(engine_manager)
+    measure("SurveyEngine", run_engine, engine, engine_manager)
+    assert engine_manager.get_all_answers(0) == legacy_manager.get_all_answers(0)
+
+    # Время переходов по событиям через хук движка
+    timings = defaultdict(list)
+    engine.add_hook(lambda event, from_question, transition, elapsed: timings[event].append(elapsed))
+    hooked_manager = SurveyManager(max_sessions=SURVEYS)
+    engine.survey_manager = hooked_manager
+    measure("SurveyEngine с хуком", run_engine, engine, hooked_manager)
+    for event, values in timings.items():
+        print(f"  {event.value:<20} {sum(values) / len(values) * 1e6:6.2f} мкс/переход  ({len(values)} переходов)")
+
+if __name__ == "__main__":
+    main()
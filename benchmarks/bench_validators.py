@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+"""
+Микро-бенчмарк валидации: цепочка if/elif с поиском шаблонов на каждый вызов
+против реестра валидаторов с предкомпилированными шаблонами
+"""
+
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot.validators import ValidatorRegistry
+
+ITERATIONS = 200
+
+# Реалистичные ответы (корректные и с типичными ошибками ввода)
+CORPUS = {
+    "email": [
+        "ivanov@mail.ru", " petrova.anna@yandex.ru ", "info@agro-holding.com", "user@localhost",
+        "user@@mail.ru", "Иванов Иван", "sidorov_1985@gmail.com", "a.b-c+d@sub.domain.org",
+    ],
+    "phone": [
+        "+7 (912) 345-67-89", "89123456789", "8-912-345-67-89", "+7 912 345 67 89",
+        "12345", "+7 (912) 345-67-8x", "+375 29 123-45-67", "тел. 89123456789",
+    ],
+    "number": ["12.5", " 100 ", "0,5", "1e3", "-3.75", "сто", "25 га", "2500"],
+    "full_name": [
+        "Иванов Иван Иванович", "Петрова Анна", "  Сидоров   Петр  Алексеевич ",
+        "Оглы Мамед Гасан оглы", "Smith", "Кузнецова Мария Сергеевна",
+    ],
+    "telegram_username": ["@ivanov", "ivanov", " @farmer_2024 ", "t.me/ivanov", "@"],
+    "cadastral_number": [
+        "50:20:0010336:38", "77:01:0001001:1234", " 23:43:0000000:5 ", "50-20-0010336-38",
+        "::::", "1234567", "50:20:0010336:38а", "", "66:41:0204016:10 ",
+    ],
+}
+
+class LegacyValidator:
+    """Прежняя реализация: if/elif и поиск шаблонов по строке на каждый вызов"""
+
+    def validate(self, validation_type, value):
+        if validation_type == "email":
+            return bool(re.match(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$', value.strip()))
+        elif validation_type == "phone":
+            cleaned_phone = re.sub(r'[\s\(\)\-\+]', '', value)
+            return cleaned_phone.isdigit() and 10 <= len(cleaned_phone) <= 15
+        elif validation_type == "number":
+            try:
+                float(value.strip())
+                return True
+            except ValueError:
+                return False
+        elif validation_type == "full_name":
+            return len([word.strip() for word in value.split() if word.strip()]) >= 3
+        elif validation_type == "telegram_username":
+            return '@' in value.strip()
+        elif validation_type == "cadastral_number":
+            value = value.strip()
+            if not value or not re.match(r'^[\d:]+$', value):
+                return False
+            return bool(re.search(r'\d', value)) and ':' in value
+        return True
+
+def main():
+    legacy = LegacyValidator()
+    registry = ValidatorRegistry.from_config(CORPUS)
+    samples = [(validation_type, value) for validation_type, values in CORPUS.items() for value in values]
+
+    # Результаты совпадают с прежней реализацией
+    for validation_type, value in samples:
+        assert legacy.validate(validation_type, value) == registry.validate(validation_type, value), \
+            (validation_type, value)
+
+    print(f"Корпус: {len(samples)} ответов, {ITERATIONS} повторов")
+    print(f"{'тип':<20} {'if/elif, мкс':>14} {'реестр, мкс':>14} {'ускорение':>10}")
+    total_legacy = total_registry = 0.0
+    for validation_type, values in CORPUS.items():
+        legacy_time = timeit.timeit(
+            lambda: [legacy.validate(validation_type, value) for value in values], number=ITERATIONS
+        )
+        registry_time = timeit.timeit(
+            lambda: [registry.validate(validation_type, value) for value in values], number=ITERATIONS
+        )
+        total_legacy += legacy_time
+        total_registry += registry_time
+        per_call = 1e6 / (ITERATIONS * len(values))
+        print(f"{validation_type:<20} {legacy_time * per_call:>14.2f} {registry_time * per_call:>14.2f} "
+              f"{legacy_time / registry_time:>9.1f}x")
+    print(f"{'всего':<20} {'':>14} {'':>14} {total_legacy / total_registry:>9.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Профиль импорта точки входа Vercel (python -X importtime)
+
+Печатает самые тяжелые модули по накопленному времени и проверяет, что клиент
+Google API не загружается при импорте api.index (он нужен только при выгрузке анкет).
+Результат сохраняется в benchmarks/importtime_report.txt.
+"""
+
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+REPORT_PATH = os.path.join(ROOT, "benchmarks", "importtime_report.txt")
+TOP = 20
+
+# Модули, которые не должны загружаться при холодном старте
+FORBIDDEN_MODULES = ("googleapiclient", "google.oauth2", "httplib2", "dotenv")
+
+def run_importtime(module: str):
+    """Импортировать модуль в отдельном процессе и разобрать вывод -X importtime"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        # Формат строки: "import time: <self> | <cumulative> | <module>"
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        entries.append((int(cumulative_us), int(self_us), name.strip()))
+    return entries
+
+def main():
+    entries = run_importtime("api.index")
+    total_us = max(cumulative for cumulative, _, _ in entries)
+    loaded = {name for _, _, name in entries}
+
+    lines = [
+        f"python -X importtime -c 'import api.index' ({sys.version.split()[0]})",
+        f"Всего: {total_us / 1000:.1f} мс, модулей: {len(entries)}",
+        "",
+        f"{'накопл., мс':>12} {'собств., мс':>12}  модуль",
+    ]
+    for cumulative, self_us, name in sorted(entries, reverse=True)[:TOP]:
+        lines.append(f"{cumulative / 1000:12.1f} {self_us / 1000:12.1f}  {name}")
+
+    forbidden = sorted(
+        name for name in loaded
+        if any(name == prefix or name.startswith(prefix + ".") for prefix in FORBIDDEN_MODULES)
+    )
+    lines.append("")
+    lines.append(f"Лишние модули при холодном старте: {', '.join(forbidden) or 'нет'}")
+
+    report = "\n".join(lines) + "\n"
+    print(report)
+    with open(REPORT_PATH, "w", encoding="utf-8") as report_file:
+        report_file.write(report)
+
+    assert not forbidden, f"При импорте api.index загружены: {forbidden}"
+
+if __name__ == "__main__":
+    main()
@@ -12,6 +12,14 @@ def initialize_bot():
     """Инициализировать бота после загрузки конфигурации"""
     global bot
     from bot.config import Config
+    from bot.rate_limiter import FloodControlRateLimiter
+    from bot.update_processor import PerUserUpdateProcessor
     config = Config()
-    bot = Application.builder().token(config.telegram_token).build()
+    bot = (
+        Application.builder()
+        .token(config.telegram_token)
+        .concurrent_updates(PerUserUpdateProcessor(config.max_concurrent_updates))
+        .rate_limiter(FloodControlRateLimiter())
+        .build()
+    )
     return bot
@@ -0,0 +1,139 @@
+"""
+Пакетная проверка и форматирование сохраненных анкет (повторная обработка архива)
+
+Работает напрямую со словарями ответов (в формате SurveyState.answers), не создавая
+сессий SurveyManager. Большие объемы обрабатываются в пуле процессов: граф опроса и
+таблица валидаторов передаются каждому процессу один раз при его запуске.
+"""
+
+import itertools
+import json
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from bot.data_processor import format_answers, format_answers_row, validate_question_answer
+from bot.google_sheets import LAYOUT_BLOCKS, LAYOUT_WIDE
+from bot.survey_graph import QuestionType, SurveyGraph, compile_survey
+from bot.validators import ValidatorRegistry
+
+@dataclass(frozen=True)
+class ValidationIssue:
+    """Ошибка в ответе анкеты"""
+    question_id: str
+    message: str
+
+@dataclass(frozen=True)
+class BulkResult:
+    """Результат обработки одной анкеты"""
+    # Порядковый номер анкеты во входных данных
+    index: int
+    rows: List[List[str]]
+    errors: Tuple[ValidationIssue, ...]
+
+    @property
+    def is_valid(self) -> bool:
+        return not self.errors
+
+class BulkProcessor:
+    """Проверка и форматирование множества анкет без состояния пользователей"""
+
+    def __init__(self, graph: SurveyGraph, validators: Optional[ValidatorRegistry] = None,
+                 layout: str = LAYOUT_BLOCKS):
+        if layout not in (LAYOUT_BLOCKS, LAYOUT_WIDE):
+            raise ValueError(f"Неизвестная раскладка таблицы: {layout}")
+        self.graph = graph
+        # Для пула процессов валидаторы должны быть функциями уровня модуля (picklable)
+        self.validators = validators if validators is not None else ValidatorRegistry()
+        self.layout = layout
+
+    @classmethod
+    def from_config_file(cls, config_file: str = "survey_config.json", **kwargs) -> "BulkProcessor":
+        """Создать обработчик по файлу конфигурации опроса"""
+        with open(config_file, 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        kwargs.setdefault("validators", ValidatorRegistry.from_config(config.get("validation_types", {})))
+        return cls(compile_survey(config), **kwargs)
+
+    def format_rows(self, answers: Dict[str, Any]) -> List[List[str]]:
+        """Форматировать анкету в строки таблицы"""
+        if self.layout == LAYOUT_WIDE:
+            return [format_answers_row(self.graph, answers)]
+        return format_answers(self.graph, answers)
+
+    def validate(self, answers: Dict[str, Any]) -> List[ValidationIssue]:
+        """Проверить сохраненные ответы анкеты"""
+        errors = []
+        questions = self.graph.questions
+        for question_id in answers:
+            if question_id not in questions:
+                errors.append(ValidationIssue(question_id, "Неизвестный вопрос"))
+
+        for question in questions.values():
+            answer = answers.get(question.id)
+            if not answer:
+                errors.append(ValidationIssue(question.id, "Нет ответа"))
+                continue
+
+            # Ответы на вопросы с выбором хранятся вместе с комментариями
+            if question.type == QuestionType.SINGLE_CHOICE and isinstance(answer, dict):
+                answer = answer.get("option")
+            elif question.type == QuestionType.MULTI_CHOICE and isinstance(answer, dict):
+                answer = answer.get("options")
+
+            if not validate_question_answer(question, answer, self.validators):
+                if question.type == QuestionType.TEXT and question.validation:
+                    message = f"Не прошел проверку '{question.validation}'"
+                else:
+                    message = "Некорректный ответ"
+                errors.append(ValidationIssue(question.id, message))
+        return errors
+
+    def process_one(self, index: int, answers: Dict[str, Any]) -> BulkResult:
+        """Проверить и форматировать одну анкету"""
+        return BulkResult(index, self.format_rows(answers), tuple(self.validate(answers)))
+
+    def process(self, records: Iterable[Dict[str, Any]], workers: int = 0,
+                chunk_size: int = 500) -> Iterator[BulkResult]:
+        """Обработать анкеты потоком, сохраняя порядок входных данных
+
+        При workers > 0 анкеты обрабатываются пачками по chunk_size в пуле процессов;
+        в обработке одновременно не больше 2 * workers пачек, поэтому вход читается
+        по мере выдачи результатов.
+        """
+        chunks = _chunked(enumerate(records), chunk_size)
+        if workers <= 0:
+            for chunk in chunks:
+                yield from self._process_chunk(chunk)
+            return
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(self,)) as executor:
+            in_flight = deque()
+            for chunk in chunks:
+                in_flight.append(executor.submit(_process_chunk_in_worker, chunk))
+                if len(in_flight) >= 2 * workers:
+                    yield from in_flight.popleft().result()
+            while in_flight:
+                yield from in_flight.popleft().result()
+
+    def _process_chunk(self, chunk: List[Tuple[int, Dict[str, Any]]]) -> List[BulkResult]:
+        return [self.process_one(index, answers) for index, answers in chunk]
+
+def _chunked(items: Iterable, size: int) -> Iterator[list]:
+    iterator = iter(items)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+# Обработчик в процессе пула (передается один раз через initializer)
+_worker_processor: Optional[BulkProcessor] = None
+
+def _init_worker(processor: BulkProcessor):
+    global _worker_processor
+    _worker_processor = processor
+
+def _process_chunk_in_worker(chunk: List[Tuple[int, Dict[str, Any]]]) -> List[BulkResult]:
+    return _worker_processor._process_chunk(chunk)
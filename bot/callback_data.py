@@ -0,0 +1,135 @@
+"""
+Компактная кодировка callback_data кнопок
+
+Токены строятся по скомпилированному графу опроса: метка графа, код действия
+и индексы вопроса и варианта в base36, например "k3tt8.0" вместо
+"multi_choice_toggle:q3_1:q3_1_plant". Разбор - один поиск в словаре, в котором
+есть и прежние строки вида "single_choice:q2_2:yes" для уже отправленных клавиатур.
+"""
+
+import zlib
+from enum import Enum
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from bot.survey_graph import QuestionType, SurveyGraph
+
+# Ограничение Telegram на размер callback_data
+MAX_CALLBACK_DATA_BYTES = 64
+
+class CallbackAction(Enum):
+    """Действия кнопок"""
+    START_SURVEY = "start_survey"
+    SINGLE_CHOICE = "single_choice"
+    MULTI_CHOICE_TOGGLE = "multi_choice_toggle"
+    MULTI_CHOICE_DONE = "multi_choice_done"
+    SKIP_COMMENT = "skip_comment"
+
+class Callback(NamedTuple):
+    """Разобранная callback_data"""
+    action: CallbackAction
+    question_id: Optional[str] = None
+    option_id: Optional[str] = None
+
+# Код действия в токене
+_ACTION_CODES = {
+    CallbackAction.START_SURVEY: "s",
+    CallbackAction.SINGLE_CHOICE: "c",
+    CallbackAction.MULTI_CHOICE_TOGGLE: "t",
+    CallbackAction.MULTI_CHOICE_DONE: "d",
+    CallbackAction.SKIP_COMMENT: "k",
+}
+# Прежний формат: префикс действия и количество полей после него
+_LEGACY_FORMATS = {
+    action.value: (action, fields) for action, fields in [
+        (CallbackAction.SINGLE_CHOICE, 2),
+        (CallbackAction.MULTI_CHOICE_TOGGLE, 2),
+        (CallbackAction.MULTI_CHOICE_DONE, 1),
+        (CallbackAction.SKIP_COMMENT, 2),
+    ]
+}
+
+_BASE36 = "0123456789abcdefghijklmnopqrstuvwxyz"
+
+def _base36(number: int) -> str:
+    digits = ""
+    while True:
+        number, digit = divmod(number, 36)
+        digits = _BASE36[digit] + digits
+        if not number:
+            return digits
+
+def graph_tag(graph: SurveyGraph) -> str:
+    """Метка графа из трех символов: токены другой версии опроса не будут разобраны"""
+    ids = ";".join(
+        question.id + ":" + ",".join(question.option_ids) for question in graph.questions.values()
+    )
+    return _base36(zlib.crc32(ids.encode("utf-8")) % 36 ** 3).rjust(3, "0")
+
+def _legacy(action: CallbackAction, *fields: str) -> str:
+    return ":".join((action.value,) + fields)
+
+class CallbackCodec:
+    """Кодирование и разбор callback_data по таблицам, построенным один раз для графа"""
+
+    def __init__(self, graph: SurveyGraph):
+        self.graph = graph
+        self.tag = graph_tag(graph)
+        self._encode: Dict[Tuple[CallbackAction, Optional[str], Optional[str]], str] = {}
+        self._decode: Dict[str, Callback] = {}
+
+        self._add(Callback(CallbackAction.START_SURVEY), self.tag + "s", "start_survey")
+        for question in graph.questions.values():
+            question_code = _base36(question.index)
+            if question.type == QuestionType.MULTI_CHOICE:
+                self._add(Callback(CallbackAction.MULTI_CHOICE_DONE, question.id),
+                          f"{self.tag}d{question_code}", _legacy(CallbackAction.MULTI_CHOICE_DONE, question.id))
+            if question.type == QuestionType.SINGLE_CHOICE:
+                actions = (CallbackAction.SINGLE_CHOICE, CallbackAction.SKIP_COMMENT)
+            elif question.type == QuestionType.MULTI_CHOICE:
+                actions = (CallbackAction.MULTI_CHOICE_TOGGLE, CallbackAction.SKIP_COMMENT)
+            else:
+                actions = ()
+            for option in question.options:
+                for action in actions:
+                    self._add(
+                        Callback(action, question.id, option.id),
+                        f"{self.tag}{_ACTION_CODES[action]}{question_code}.{_base36(option.index)}",
+                        _legacy(action, question.id, option.id),
+                    )
+
+    def _add(self, callback: Callback, token: str, legacy: str):
+        # При повторяющихся ID вариантов действует первый, как и в options_by_id
+        if callback in self._encode:
+            return
+        self._encode[callback] = token
+        self._decode[token] = callback
+        self._decode.setdefault(legacy, callback)
+
+    def encode(self, action: CallbackAction, question_id: Optional[str] = None,
+               option_id: Optional[str] = None) -> str:
+        """Получить callback_data для кнопки"""
+        token = self._encode.get((action, question_id, option_id))
+        if token is not None:
+            return token
+        # Вопроса или варианта нет в графе - используем прежний формат
+        fields = tuple(field for field in (question_id, option_id) if field is not None)
+        legacy = _legacy(action, *fields) if fields else action.value
+        if len(legacy.encode("utf-8")) > MAX_CALLBACK_DATA_BYTES:
+            raise ValueError(f"callback_data длиннее {MAX_CALLBACK_DATA_BYTES} байт: {legacy}")
+        return legacy
+
+    def decode(self, data: Optional[str]) -> Optional[Callback]:
+        """Разобрать callback_data; None, если формат неизвестен"""
+        callback = self._decode.get(data)
+        if callback is not None or not data:
+            return callback
+        # Прежние клавиатуры с ID, которых уже нет в графе (разбираются как раньше)
+        prefix, _, rest = data.partition(":")
+        legacy_format = _LEGACY_FORMATS.get(prefix)
+        if legacy_format is None or not rest:
+            return None
+        action, fields = legacy_format
+        if fields == 1:
+            return Callback(action, rest)
+        question_id, separator, option_id = rest.partition(":")
+        return Callback(action, question_id, option_id) if separator else None
@@ -12,6 +12,26 @@ class Config:
         self.telegram_token: str = self._get_required_env('TELEGRAM_TOKEN')
         self.google_sheets_id: str = self._get_required_env('GOOGLE_SHEETS_ID')
         self.google_credentials_json: str = self._get_required_env('GOOGLE_CREDENTIALS_JSON')
+        # Раскладка таблицы: "blocks" (вопрос - ответ) или "wide" (строка на респондента)
+        self.sheets_layout: str = self._get_optional_env('SHEETS_LAYOUT', 'blocks')
+        # Клиент Google Sheets: "googleapiclient" (пул потоков) или "httpx" (асинхронный REST)
+        self.sheets_backend: str = self._get_optional_env('SHEETS_BACKEND', 'googleapiclient')
+        # Путь к локальному журналу анкет (пустая строка отключает журнал)
+        self.outbox_path: str = self._get_optional_env('OUTBOX_PATH', 'survey_outbox.sqlite3')
+        # Хранилище состояний опроса: memory://, sqlite:///path или redis://host:port/db
+        self.state_store_url: str = self._get_optional_env('STATE_STORE_URL', 'memory://')
+        # Ограничения кэша активных сессий: максимум записей и время простоя в секундах
+        self.session_max_entries: int = int(self._get_optional_env('SESSION_MAX_ENTRIES', '50000'))
+        self.session_ttl: float = float(self._get_optional_env('SESSION_TTL_SECONDS', str(3 * 24 * 3600)))
+        # Сколько обновлений разных пользователей обрабатывается одновременно
+        self.max_concurrent_updates: int = int(self._get_optional_env('MAX_CONCURRENT_UPDATES', '256'))
+        # Файл конфигурации опроса и период проверки его изменений в секундах (0 - только по SIGHUP)
+        self.survey_config_path: str = self._get_optional_env('SURVEY_CONFIG_PATH', 'survey_config.json')
+        self.survey_config_watch_interval: float = float(self._get_optional_env('SURVEY_CONFIG_WATCH_INTERVAL', '5'))
+        # Проверенная скомпилированная конфигурация (python -m bot.config_lint --output); пустая строка - не использовать
+        self.survey_config_artifact: str = self._get_optional_env('SURVEY_CONFIG_ARTIFACT', '')
+        # Пауза в нажатиях множественного выбора (секунды), после которой перерисовывается клавиатура
+        self.multi_choice_render_delay: float = float(self._get_optional_env('MULTI_CHOICE_RENDER_DELAY', '0.3'))
     
     def _get_required_env(self, key: str) -> str:
         """Получить обязательную переменную окружения"""
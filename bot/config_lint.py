@@ -0,0 +1,144 @@
+"""
+Проверка конфигурации опроса перед запуском
+
+Ссылки next образуют граф. Проверка проходит его один раз от первого вопроса и
+останавливается на первой ошибке, указывая место в файле: цикл, ссылка на
+несуществующий вопрос, недостижимые вопросы, неизвестный тип вопроса или
+валидации, варианты без ID.
+
+Запуск: python -m bot.config_lint survey_config.json --output survey_config.snapshot
+"""
+
+import argparse
+import logging
+import sys
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+from bot.survey_graph import COMPLETED, QuestionType
+from bot.validators import BUILTIN_VALIDATORS
+
+logger = logging.getLogger(__name__)
+
+_QUESTION_TYPES = frozenset(question_type.value for question_type in QuestionType)
+_CHOICE_TYPES = frozenset((QuestionType.SINGLE_CHOICE.value, QuestionType.MULTI_CHOICE.value))
+
+class ConfigLintError(ValueError):
+    """Ошибка в конфигурации опроса с указанием места"""
+
+    def __init__(self, location: str, message: str):
+        super().__init__(f"{location}: {message}")
+        self.location = location
+        self.message = message
+
+def lint_survey_config(config: Dict[str, Any], validation_types: Optional[Iterable[str]] = None) -> Tuple[str, ...]:
+    """Проверить конфигурацию опроса и вернуть ID вопросов в порядке прохождения
+
+    validation_types - типы валидации, для которых есть валидаторы
+    (по умолчанию встроенные). Если конфигурация объявляет validation_types, вопросы
+    проверяются по ним: собственный валидатор подключается при запуске
+    (ValidatorRegistry.from_config), поэтому тип без известного валидатора - только
+    предупреждение. При первой ошибке выбрасывается ConfigLintError.
+    """
+    questions = config.get("questions")
+    if not isinstance(questions, dict) or not questions:
+        raise ConfigLintError("questions", "нет вопросов")
+
+    known_validations: Set[str] = set(BUILTIN_VALIDATORS if validation_types is None else validation_types)
+    declared = config.get("validation_types")
+    if declared is not None:
+        for validation_type in declared:
+            if validation_type not in known_validations:
+                # Как в ValidatorRegistry.from_config: без валидатора ответы этого типа не проверяются
+                logger.warning(f"validation_types.{validation_type}: нет встроенного валидатора, "
+                               f"нужен собственный (ValidatorRegistry.from_config)")
+        known_validations = set(declared)
+    comment_types = config.get("comment_types")
+
+    # Один проход по цепочке next: каждый вопрос проверяется при первом посещении
+    path = []
+    visited: Set[str] = set()
+    question_id = next(iter(questions))
+    while question_id != COMPLETED:
+        visited.add(question_id)
+        path.append(question_id)
+        question_data = questions[question_id]
+        _lint_question(question_id, question_data, known_validations, comment_types)
+
+        next_id = question_data.get("next", COMPLETED)
+        if not isinstance(next_id, str):
+            raise ConfigLintError(f"questions.{question_id}.next", f"ожидается ID вопроса, получено {next_id!r}")
+        if next_id != COMPLETED and next_id not in questions:
+            raise ConfigLintError(f"questions.{question_id}.next", f"вопрос '{next_id}' не найден")
+        if next_id in visited:
+            cycle = path[path.index(next_id):] + [next_id]
+            raise ConfigLintError(f"questions.{question_id}.next", "цикл: " + " -> ".join(cycle))
+        question_id = next_id
+
+    if len(visited) != len(questions):
+        unreachable = [question_id for question_id in questions if question_id not in visited]
+        raise ConfigLintError(
+            f"questions.{unreachable[0]}",
+            "недостижимые вопросы (на них нет ссылок next): " + ", ".join(unreachable)
+        )
+    return tuple(path)
+
+def _lint_question(question_id: str, question_data: Any, known_validations: Set[str],
+                   comment_types: Optional[Dict[str, Any]]):
+    """Проверить один вопрос"""
+    location = "questions." + question_id
+    if not isinstance(question_data, dict):
+        raise ConfigLintError(location, "описание вопроса должно быть объектом")
+    if not question_data.get("text"):
+        raise ConfigLintError(f"{location}.text", "нет текста вопроса")
+
+    question_type = question_data.get("type", QuestionType.TEXT.value)
+    if question_type not in _QUESTION_TYPES:
+        raise ConfigLintError(f"{location}.type", f"неизвестный тип вопроса '{question_type}'")
+
+    validation = question_data.get("validation")
+    if validation is not None and validation not in known_validations:
+        raise ConfigLintError(f"{location}.validation", f"неизвестный тип валидации '{validation}'")
+
+    if question_type not in _CHOICE_TYPES:
+        return
+    options = question_data.get("options")
+    if not isinstance(options, list) or not options:
+        raise ConfigLintError(f"{location}.options", "у вопроса с выбором нет вариантов")
+
+    option_ids: Set[str] = set()
+    for index, option in enumerate(options):
+        if not isinstance(option, dict):
+            raise ConfigLintError(f"{location}.options[{index}]", "описание варианта должно быть объектом")
+        option_id = option.get("id")
+        if not option_id or not isinstance(option_id, str):
+            raise ConfigLintError(f"{location}.options[{index}].id", "нет ID варианта")
+        if option_id in option_ids:
+            raise ConfigLintError(f"{location}.options[{index}].id", f"повторяющийся ID варианта '{option_id}'")
+        option_ids.add(option_id)
+        if not option.get("text"):
+            raise ConfigLintError(f"{location}.options[{index}].text", "нет текста варианта")
+        comment_type = option.get("comment_type", "none")
+        if comment_types is not None and comment_type not in comment_types:
+            raise ConfigLintError(f"{location}.options[{index}].comment_type",
+                                  f"неизвестный тип комментария '{comment_type}'")
+
+def main():
+    parser = argparse.ArgumentParser(description="Проверка конфигурации опроса")
+    parser.add_argument("config", nargs="?", default="survey_config.json", help="Конфигурация опроса")
+    parser.add_argument("--output", help="Записать проверенную скомпилированную конфигурацию для быстрой загрузки")
+    args = parser.parse_args()
+
+    from bot.survey_snapshot import load_snapshot, write_snapshot_artifact
+
+    try:
+        snapshot = load_snapshot(args.config, 1)
+    except (OSError, ValueError) as e:
+        print(f"❌ {args.config}: {e}")
+        sys.exit(1)
+    print(f"✅ {args.config}: вопросов {len(snapshot.graph.questions)}, все достижимы")
+    if args.output:
+        size = write_snapshot_artifact(snapshot, args.output)
+        print(f"📦 {args.output}: {size} байт")
+
+if __name__ == "__main__":
+    main()
@@ -2,254 +2,126 @@
 Модуль для обработки и форматирования данных опроса
 """
 
-import re
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional
 from bot.survey_manager import SurveyManager
+from bot.formatting import format_question_answer
+from bot.survey_graph import CompiledQuestion, QuestionType, SurveyGraph
+from bot.validators import ValidatorRegistry
+
+def format_answers(graph: SurveyGraph, answers: Dict[str, Any]) -> List[List[str]]:
+    """Форматировать ответы блоком "вопрос - ответ" в порядке конфигурации"""
+    return [
+        [question.text, format_question_answer(question, answers.get(question.id, ""))]
+        for question in graph.questions.values()
+    ]
+
+def format_answers_row(graph: SurveyGraph, answers: Dict[str, Any]) -> List[str]:
+    """Форматировать ответы одной строкой (колонка на каждый вопрос)"""
+    return [
+        format_question_answer(question, answers.get(question.id, ""))
+        for question in graph.questions.values()
+    ]
+
+def validate_question_answer(question: Optional[CompiledQuestion], answer: Any,
+                             validators: ValidatorRegistry) -> bool:
+    """Проверить валидность ответа на скомпилированный вопрос"""
+    question_type = question.type if question is not None else QuestionType.TEXT
+
+    if question_type == QuestionType.TEXT:
+        if not isinstance(answer, str) or answer.strip() == "":
+            return False
+
+        # Проверяем дополнительную валидацию
+        validation_type = question.validation if question is not None else None
+        if validation_type:
+            return validators.validate(validation_type, answer)
+
+        return True
+
+    elif question_type == QuestionType.SINGLE_CHOICE:
+        return isinstance(answer, str) and answer in question.valid_option_ids
+
+    elif question_type == QuestionType.MULTI_CHOICE:
+        if isinstance(answer, list):
+            valid_ids = question.valid_option_ids
+            return all(option_id in valid_ids for option_id in answer)
+        elif isinstance(answer, dict):
+            return "options" in answer and isinstance(answer["options"], list)
+
+    return False
 
 class DataProcessor:
     """Обработчик данных опроса"""
     
-    def __init__(self, survey_manager: SurveyManager):
+    def __init__(self, survey_manager: SurveyManager, validators: Optional[ValidatorRegistry] = None):
         self.survey_manager = survey_manager
+        # Таблица валидаторов строится один раз из validation_types конфигурации
+        if validators is None:
+            validators = ValidatorRegistry.from_config(survey_manager.config.get("validation_types", {}))
+        self.validators = validators
     
     def format_answers_for_sheets(self, user_id: int) -> List[List[str]]:
-        """Форматировать ответы для записи в Google Sheets"""
-        answers = self.survey_manager.get_all_answers(user_id)
-        formatted_data = []
-        
-        # Проходим по всем вопросам в конфигурации
-        for question_id, question_data in self.survey_manager.config.get("questions", {}).items():
-            question_text = question_data.get("text", "")
-            answer = answers.get(question_id, "")
-            
-            # Форматируем ответ в зависимости от типа вопроса
-            formatted_answer = self._format_answer(question_id, answer)
-            
-            # Добавляем строку в данные
-            formatted_data.append([question_text, formatted_answer])
-        
-        return formatted_data
+        """Форматировать ответы для записи в Google Sheets
+
+        Ответы уже отформатированы при сохранении - здесь они только раскладываются по строкам.
+        """
+        formatted = self.survey_manager.get_formatted_answers(user_id)
+        # Вопросы той версии опроса, по которой пользователь отвечал
+        return [
+            [question.text, formatted.get(question.id, "")]
+            for question in self.survey_manager.get_user_graph(user_id).questions.values()
+        ]
+    
+    def get_wide_headers(self) -> List[str]:
+        """Получить заголовки широкой раскладки (ID вопросов)"""
+        return list(self.survey_manager.graph.question_ids)
+    
+    def format_answers_wide(self, user_id: int) -> List[List[str]]:
+        """Форматировать ответы одной строкой для широкой раскладки таблицы
+
+        Колонки - по текущей версии опроса, как и заголовки таблицы.
+        """
+        formatted = self.survey_manager.get_formatted_answers(user_id)
+        return [[formatted.get(question_id, "") for question_id in self.survey_manager.graph.question_ids]]
     
     def _format_answer(self, question_id: str, answer: Any) -> str:
         """Форматировать ответ для отображения"""
-        if not answer:
-            return ""
-        
-        question_type = self.survey_manager.get_question_type(question_id)
-        
-        if question_type.value == "text":
-            return str(answer)
-        
-        elif question_type.value == "single_choice":
-            return self._format_single_choice_answer(question_id, answer)
-        
-        elif question_type.value == "multi_choice":
-            return self._format_multi_choice_answer(question_id, answer)
-        
-        return str(answer)
+        question = self.survey_manager.get_compiled_question(question_id)
+        if question is None:
+            return str(answer) if answer else ""
+        return self._format_question_answer(question, answer)
     
-    def _format_single_choice_answer(self, question_id: str, answer: Any) -> str:
-        """Форматировать ответ одиночного выбора"""
-        if isinstance(answer, dict):
-            # Если ответ содержит выбор и комментарий
-            selected_option = answer.get("option", "")
-            comment = answer.get("comment", "")
-            
-            # Находим текст выбранной опции
-            options = self.survey_manager.get_question_options(question_id)
-            option_text = ""
-            for option in options:
-                if option.get("id") == selected_option:
-                    # Используем display_text если есть, иначе обычный text
-                    option_text = option.get("display_text", option.get("text", ""))
-                    break
-            
-            # Формируем ответ
-            result = option_text
-            if comment:
-                result += f" - {comment}"
-            
-            return result
-        
-        # Если ответ - просто ID опции
-        options = self.survey_manager.get_question_options(question_id)
-        for option in options:
-            if option.get("id") == answer:
-                # Используем display_text если есть, иначе обычный text
-                return option.get("display_text", option.get("text", ""))
-        
-        return str(answer)
-    
-    def _format_multi_choice_answer(self, question_id: str, answer: Any) -> str:
-        """Форматировать ответ множественного выбора"""
-        if isinstance(answer, dict):
-            # Если ответ содержит выборы и комментарии
-            selected_options = answer.get("options", [])
-            comments = answer.get("comments", {})
-            
-            formatted_options = []
-            options = self.survey_manager.get_question_options(question_id)
-            
-            for option_id in selected_options:
-                # Находим текст опции
-                option_text = ""
-                for option in options:
-                    if option.get("id") == option_id:
-                        # Используем display_text если есть, иначе обычный text
-                        option_text = option.get("display_text", option.get("text", ""))
-                        break
-                
-                # Добавляем комментарий, если есть
-                if option_id in comments and comments[option_id]:
-                    # Для опции "Другое" объединяем display_text с комментарием
-                    if option_id == "q3_2_other":
-                        option_text = f"{option_text} {comments[option_id]}"
-                    else:
-                        option_text += f" - {comments[option_id]}"
-                
-                formatted_options.append(option_text)
-            
-            return "; ".join(formatted_options)
-        
-        # Если ответ - просто список ID опций
-        if isinstance(answer, list):
-            options = self.survey_manager.get_question_options(question_id)
-            formatted_options = []
-            
-            for option_id in answer:
-                for option in options:
-                    if option.get("id") == option_id:
-                        # Используем display_text если есть, иначе обычный text
-                        formatted_options.append(option.get("display_text", option.get("text", "")))
-                        break
-            
-            return "; ".join(formatted_options)
-        
-        return str(answer)
+    def _format_question_answer(self, question: CompiledQuestion, answer: Any) -> str:
+        """Форматировать ответ на скомпилированный вопрос"""
+        return format_question_answer(question, answer)
     
     def validate_answer(self, question_id: str, answer: Any) -> bool:
         """Проверить валидность ответа"""
-        question_type = self.survey_manager.get_question_type(question_id)
-        
-        if question_type.value == "text":
-            if not isinstance(answer, str) or answer.strip() == "":
-                return False
-            
-            # Проверяем дополнительную валидацию
-            validation_type = self.survey_manager.get_question_validation(question_id)
-            if validation_type:
-                return self._validate_by_type(validation_type, answer)
-            
-            return True
-        
-        elif question_type.value == "single_choice":
-            options = self.survey_manager.get_question_options(question_id)
-            valid_ids = [option.get("id") for option in options]
-            return answer in valid_ids
-        
-        elif question_type.value == "multi_choice":
-            if isinstance(answer, list):
-                options = self.survey_manager.get_question_options(question_id)
-                valid_ids = [option.get("id") for option in options]
-                return all(option_id in valid_ids for option_id in answer)
-            elif isinstance(answer, dict):
-                return "options" in answer and isinstance(answer["options"], list)
-        
-        return False
+        question = self.survey_manager.get_compiled_question(question_id)
+        return validate_question_answer(question, answer, self.validators)
     
     def _validate_by_type(self, validation_type: str, value: str) -> bool:
         """Валидация по типу"""
-        if validation_type == "email":
-            return self._validate_email(value)
-        elif validation_type == "phone":
-            return self._validate_phone(value)
-        elif validation_type == "number":
-            return self._validate_number(value)
-        elif validation_type == "full_name":
-            return self._validate_full_name(value)
-        elif validation_type == "telegram_username":
-            return self._validate_telegram_username(value)
-        elif validation_type == "cadastral_number":
-            return self._validate_cadastral_number(value)
-        return True
-    
-    def _validate_email(self, email: str) -> bool:
-        """Валидация email адреса"""
-        # Простая проверка на наличие @ и точки
-        email_pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-        return bool(re.match(email_pattern, email.strip()))
-    
-    def _validate_phone(self, phone: str) -> bool:
-        """Валидация номера телефона"""
-        # Убираем все пробелы, скобки, дефисы и плюсы
-        cleaned_phone = re.sub(r'[\s\(\)\-\+]', '', phone)
-        # Проверяем, что остались только цифры и длина от 10 до 15 символов
-        return cleaned_phone.isdigit() and 10 <= len(cleaned_phone) <= 15
-    
-    def _validate_number(self, number: str) -> bool:
-        """Валидация числового значения"""
-        try:
-            # Пробуем преобразовать в float (поддерживает десятичные числа)
-            float(number.strip())
-            return True
-        except ValueError:
-            return False
-    
-    def _validate_full_name(self, full_name: str) -> bool:
-        """Валидация ФИО (минимум 3 слова)"""
-        # Убираем лишние пробелы и считаем слова
-        words = [word.strip() for word in full_name.split() if word.strip()]
-        return len(words) >= 3
-    
-    def _validate_telegram_username(self, username: str) -> bool:
-        """Валидация имени в Telegram (обязательно @)"""
-        # Проверяем, что есть символ @
-        return '@' in username.strip()
-    
-    def _validate_cadastral_number(self, cadastral: str) -> bool:
-        """Валидация кадастрового номера (только цифры и двоеточия)"""
-        # Убираем лишние пробелы
-        cadastral = cadastral.strip()
-        
-        # Проверяем, что строка содержит только цифры и двоеточия
-        # И что есть хотя бы одна цифра и одно двоеточие
-        if not cadastral:
-            return False
-        
-        # Проверяем, что строка состоит только из цифр и двоеточий
-        if not re.match(r'^[\d:]+$', cadastral):
-            return False
-        
-        # Проверяем, что есть хотя бы одна цифра
-        if not re.search(r'\d', cadastral):
-            return False
-        
-        # Проверяем, что есть хотя бы одно двоеточие
-        if ':' not in cadastral:
-            return False
-        
-        return True
+        return self.validators.validate(validation_type, value)
     
     def get_required_fields(self, question_id: str) -> List[str]:
         """Получить список обязательных полей для вопроса"""
-        question_type = self.survey_manager.get_question_type(question_id)
+        question = self.survey_manager.get_compiled_question(question_id)
+        question_type = question.type if question is not None else QuestionType.TEXT
         
-        if question_type.value == "text":
+        if question_type == QuestionType.TEXT:
             return ["text"]
         
-        elif question_type.value == "single_choice":
-            options = self.survey_manager.get_question_options(question_id)
+        elif question_type == QuestionType.SINGLE_CHOICE:
             required_fields = ["option"]
             
             # Проверяем, есть ли обязательные комментарии
-            for option in options:
-                if option.get("comment_required", False):
-                    required_fields.append("comment")
-                    break
+            if question.comment_option_ids:
+                required_fields.append("comment")
             
             return required_fields
         
-        elif question_type.value == "multi_choice":
+        elif question_type == QuestionType.MULTI_CHOICE:
             return ["options"]
         
         return []
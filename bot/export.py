@@ -0,0 +1,171 @@
+"""
+Локальная выгрузка собранных анкет в CSV и колоночный формат (Parquet)
+
+Анкеты читаются потоком (например, из журнала SurveyOutbox) и записываются
+порциями по chunk_size, поэтому расход памяти не зависит от числа анкет.
+В журнале могут быть анкеты, собранные по другой версии опроса: строки
+сопоставляются с вопросами по тексту, а анкеты с вопросами, которых нет в
+конфигурации, пропускаются и перечисляются в отчете, не прерывая выгрузку.
+
+Запуск: python -m bot.export --format csv --output responses.csv
+"""
+
+import argparse
+import csv
+import json
+import logging
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from bot.google_sheets import LAYOUT_BLOCKS, LAYOUT_WIDE, SEPARATOR_ROW
+from bot.survey_graph import SurveyGraph, compile_survey
+
+logger = logging.getLogger(__name__)
+
+# Анкета: ключ (например, из журнала) и строки в формате DataProcessor.format_answers_for_sheets
+Survey = Tuple[Optional[str], List[List[str]]]
+
+KEY_COLUMN = "key"
+
+class SurveyExporter:
+    """Выгрузка анкет с колонкой на каждый вопрос опроса"""
+
+    def __init__(self, graph: SurveyGraph, chunk_size: int = 1000):
+        self.graph = graph
+        self.question_ids = list(graph.question_ids)
+        self.chunk_size = chunk_size
+        # Колонки по тексту вопроса (тексты могут повторяться - тогда по порядку)
+        self._columns_by_text: Dict[str, List[int]] = {}
+        for index, question in enumerate(graph.questions.values()):
+            self._columns_by_text.setdefault(question.text, []).append(index)
+        # Ключи анкет, пропущенных при последних выгрузках: собраны по другой версии опроса
+        self.skipped: List[str] = []
+
+    def to_answers(self, rows: List[List[str]]) -> List[str]:
+        """Получить ответы в порядке вопросов из строк блочной или широкой раскладки
+
+        Строки блочной раскладки сопоставляются с вопросами по тексту, поэтому анкета
+        другой версии опроса не попадает в чужие колонки; на вопросы, которых в ней нет,
+        ответ пустой. В широкой раскладке подписей нет - проверяется только число колонок.
+        Если анкету нельзя разложить по вопросам, выбрасывается ValueError.
+        """
+        question_count = len(self.question_ids)
+        if len(rows) == 1 and len(rows[0]) == question_count:
+            # Широкая раскладка: одна строка, колонка на вопрос
+            return list(rows[0])
+        # Блочная раскладка: строки "вопрос - ответ"
+        answers = [""] * question_count
+        used: Dict[str, int] = {}
+        for row in rows:
+            text = row[0] if row else ""
+            columns = self._columns_by_text.get(text, ())
+            position = used.get(text, 0)
+            if position >= len(columns):
+                raise ValueError(f"в опросе нет вопроса '{text}': анкета собрана по другой версии опроса")
+            used[text] = position + 1
+            answers[columns[position]] = row[1] if len(row) > 1 else ""
+        return answers
+
+    def iter_records(self, surveys: Iterable[Survey]) -> Iterator[List[str]]:
+        """Строки с колонкой на вопрос: [ключ, ответ1, ответ2, ...]
+
+        Анкеты, которые нельзя разложить по вопросам, пропускаются: ключ добавляется в skipped.
+        """
+        for key, rows in surveys:
+            try:
+                answers = self.to_answers(rows)
+            except ValueError as e:
+                logger.warning(f"Анкета {key!r} пропущена: {e}")
+                self.skipped.append(key or "")
+                continue
+            yield [key or ""] + answers
+
+    def to_csv(self, surveys: Iterable[Survey], path: str, layout: str = LAYOUT_WIDE) -> int:
+        """Записать анкеты в CSV и вернуть их количество
+
+        LAYOUT_WIDE - строка на анкету с колонками key и ID вопросов,
+        LAYOUT_BLOCKS - те же строки "вопрос - ответ", что и в Google Sheets.
+        """
+        if layout not in (LAYOUT_BLOCKS, LAYOUT_WIDE):
+            raise ValueError(f"Неизвестная раскладка таблицы: {layout}")
+
+        count = 0
+        with open(path, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            if layout == LAYOUT_WIDE:
+                writer.writerow([KEY_COLUMN] + self.question_ids)
+                blocks = ([record] for record in self.iter_records(surveys))
+            else:
+                writer.writerow(['Вопросы', 'Ответы'])
+                blocks = (rows + [SEPARATOR_ROW] for _, rows in surveys)
+
+            buffer = []
+            for block in blocks:
+                buffer.extend(block)
+                count += 1
+                if len(buffer) >= self.chunk_size:
+                    writer.writerows(buffer)
+                    buffer.clear()
+            writer.writerows(buffer)
+        return count
+
+    def to_parquet(self, surveys: Iterable[Survey], path: str) -> int:
+        """Записать анкеты в Parquet (группа строк на каждые chunk_size анкет) и вернуть их количество"""
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ImportError("Для выгрузки в Parquet установите пакет pyarrow: pip install pyarrow")
+
+        columns = [KEY_COLUMN] + self.question_ids
+        schema = pa.schema([(column, pa.string()) for column in columns])
+        count = 0
+        with pq.ParquetWriter(path, schema) as writer:
+            buffer = []
+            for record in self.iter_records(surveys):
+                buffer.append(record)
+                if len(buffer) >= self.chunk_size:
+                    count += self._write_row_group(writer, pa, schema, buffer)
+                    buffer = []
+            if buffer:
+                count += self._write_row_group(writer, pa, schema, buffer)
+        return count
+
+    @staticmethod
+    def _write_row_group(writer, pa, schema, records: List[List[str]]) -> int:
+        # Транспонируем строки в колонки
+        arrays = [pa.array(column, type=pa.string()) for column in zip(*records)]
+        writer.write_table(pa.Table.from_arrays(arrays, schema=schema))
+        return len(records)
+
+def main():
+    parser = argparse.ArgumentParser(description="Выгрузка анкет из локального журнала")
+    parser.add_argument("--format", choices=["csv", "parquet"], default="csv")
+    parser.add_argument("--output", required=True, help="Путь к файлу выгрузки")
+    parser.add_argument("--outbox", default="survey_outbox.sqlite3", help="Путь к журналу анкет")
+    parser.add_argument("--config", default="survey_config.json", help="Конфигурация опроса")
+    parser.add_argument("--layout", choices=[LAYOUT_WIDE, LAYOUT_BLOCKS], default=LAYOUT_WIDE,
+                        help="Раскладка CSV")
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    from bot.outbox import SurveyOutbox
+
+    with open(args.config, 'r', encoding='utf-8') as f:
+        exporter = SurveyExporter(compile_survey(json.load(f)), chunk_size=args.chunk_size)
+
+    outbox = SurveyOutbox(args.outbox)
+    try:
+        surveys = outbox.iter_all(batch_size=args.chunk_size)
+        if args.format == "csv":
+            count = exporter.to_csv(surveys, args.output, layout=args.layout)
+        else:
+            count = exporter.to_parquet(surveys, args.output)
+    finally:
+        outbox.close()
+    print(f"Выгружено анкет: {count} -> {args.output}")
+    if exporter.skipped:
+        print(f"Пропущено анкет другой версии опроса: {len(exporter.skipped)} "
+              f"(ключи: {', '.join(exporter.skipped[:10])}{' ...' if len(exporter.skipped) > 10 else ''})")
+
+if __name__ == "__main__":
+    main()
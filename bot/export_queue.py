@@ -0,0 +1,278 @@
+"""
+Фоновая очередь выгрузки завершенных анкет в Google Sheets
+
+С журналом (SurveyOutbox) анкета сначала записывается в него. Пакеты, которые не удалось
+выгрузить, остаются в журнале и дочитываются из него раз в outbox_rescan_interval секунд.
+Без журнала такие пакеты хранятся в памяти и повторяются с тем же интервалом и при остановке.
+"""
+
+import asyncio
+import logging
+import uuid
+from typing import Any, Awaitable, Callable, List, Optional, Set, Tuple
+
+from bot.outbox import SurveyOutbox
+
+logger = logging.getLogger(__name__)
+
+# Данные одной анкеты в формате DataProcessor.format_answers_for_sheets
+SurveyRows = List[List[str]]
+
+class SurveyExportQueue:
+    """Очередь, объединяющая завершенные анкеты в пакетные записи"""
+
+    def __init__(self, writer: Callable[[List[SurveyRows]], Awaitable[Any]],
+                 max_batch_size: int = 50, flush_interval: float = 2.0,
+                 max_queue_size: int = 1000, outbox: Optional[SurveyOutbox] = None,
+                 retry_base_delay: float = 1.0, retry_max_delay: float = 300.0,
+                 max_retries: int = 3, outbox_rescan_interval: float = 60.0):
+        # writer получает список анкет и записывает их одним запросом
+        self.writer = writer
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.max_queue_size = max_queue_size
+        # Если журнал задан, анкета сначала записывается в него и не теряется при сбоях
+        self.outbox = outbox
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        # После max_retries неудачных попыток пакет откладывается до следующей попытки
+        # через outbox_rescan_interval: с журналом остается в нем, без журнала - в памяти
+        self.max_retries = max_retries
+        self.outbox_rescan_interval = outbox_rescan_interval
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._flush_requests = 0
+        self._stopping = False
+        # Ключи анкет в очереди или в записи: при чтении журнала они пропускаются
+        self._in_flight: Set[str] = set()
+        self._next_rescan = 0.0
+        # Без журнала: анкеты, не выгруженные после max_retries попыток
+        self._retained: List[Tuple[str, SurveyRows]] = []
+
+        # Счетчики для мониторинга
+        self.exported_count = 0
+        self.failed_count = 0
+        self.batches_count = 0
+        self.retries_count = 0
+
+    @property
+    def pending_count(self) -> int:
+        """Количество анкет, ожидающих выгрузки"""
+        return (self._queue.qsize() if self._queue is not None else 0) + len(self._retained)
+
+    def start(self):
+        """Запустить фоновую выгрузку в текущем event loop"""
+        loop = asyncio.get_running_loop()
+        if self._worker is not None and not self._worker.done() and self._loop is loop:
+            return
+
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._wakeup = asyncio.Event()
+        self._flush_requests = 0
+        self._stopping = False
+        self._in_flight.clear()
+        self._worker = loop.create_task(self._run())
+
+    async def put(self, survey_data: SurveyRows, key: Optional[str] = None):
+        """Поставить анкету в очередь
+
+        Без журнала ожидает, если очередь переполнена. С журналом анкета уже сохранена,
+        поэтому при переполненной очереди она выгружается при следующем чтении журнала.
+        """
+        self.start()
+
+        # Ключ идемпотентности: повторная постановка той же анкеты не создаст дубликат
+        key = key or uuid.uuid4().hex
+        if self.outbox is None:
+            await self._queue.put((key, survey_data))
+        else:
+            if key in self._in_flight:
+                return
+            # Ключ занят до записи в журнал, чтобы чтение журнала не взяло анкету второй раз
+            self._in_flight.add(key)
+            try:
+                is_new = await asyncio.to_thread(self.outbox.append, key, survey_data)
+            except BaseException:
+                self._in_flight.discard(key)
+                raise
+            if not is_new:
+                self._in_flight.discard(key)
+                return
+            try:
+                self._queue.put_nowait((key, survey_data))
+            except asyncio.QueueFull:
+                self._in_flight.discard(key)
+                return
+
+        if self._queue.qsize() >= self.max_batch_size:
+            self._wakeup.set()
+
+    async def flush(self):
+        """Дождаться записи всех анкет, поставленных в очередь"""
+        if self._worker is None or self._worker.done():
+            return
+
+        # Маркер сброса заставляет обработчик записать накопленный пакет немедленно
+        marker = self._loop.create_future()
+        self._flush_requests += 1
+        await self._queue.put(marker)
+        self._wakeup.set()
+        await marker
+
+    async def stop(self):
+        """Записать оставшиеся анкеты и остановить фоновую выгрузку"""
+        if self._worker is None:
+            return
+
+        self._stopping = True
+        await self.flush()
+        if self._retained:
+            logger.error(f"Не выгружено анкет при остановке (журнал анкет не задан): {len(self._retained)}")
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+    async def _run(self):
+        """Собирать анкеты в пакеты по размеру или по времени и записывать их"""
+        while True:
+            # Дозаписываем анкеты из журнала: оставшиеся после прошлого запуска,
+            # не выгруженные из-за ошибок и не поместившиеся в очередь. Без журнала -
+            # отложенные в памяти после неудачных попыток
+            if self._loop.time() >= self._next_rescan:
+                self._next_rescan = self._loop.time() + self.outbox_rescan_interval
+                if self.outbox is not None:
+                    await self._replay_outbox()
+                elif self._retained:
+                    await self._replay_retained()
+
+            if self.outbox is None and not self._retained:
+                item = await self._queue.get()
+            else:
+                try:
+                    item = await asyncio.wait_for(
+                        self._queue.get(), max(self._next_rescan - self._loop.time(), 0)
+                    )
+                except asyncio.TimeoutError:
+                    continue
+
+            # Ждем накопления пакета, пока не истечет окно или не наберется порог
+            if not isinstance(item, asyncio.Future):
+                self._wakeup.clear()
+                if self._flush_requests == 0 and self._queue.qsize() + 1 < self.max_batch_size:
+                    try:
+                        await asyncio.wait_for(self._wakeup.wait(), self.flush_interval)
+                    except asyncio.TimeoutError:
+                        pass
+
+            batch: List[Tuple[str, SurveyRows]] = []
+            markers: List[asyncio.Future] = []
+            while True:
+                if isinstance(item, asyncio.Future):
+                    markers.append(item)
+                else:
+                    batch.append(item)
+
+                if markers or len(batch) >= self.max_batch_size or self._queue.empty():
+                    break
+                item = self._queue.get_nowait()
+
+            if batch:
+                await self._write_batch(batch)
+            # При остановке отложенные анкеты пробуем выгрузить в последний раз
+            if markers and self._stopping and self._retained:
+                await self._replay_retained()
+
+            for marker in markers:
+                self._flush_requests -= 1
+                if not marker.done():
+                    marker.set_result(None)
+
+    async def _replay_outbox(self):
+        """Выгрузить анкеты журнала, которых нет в очереди"""
+        try:
+            pending = await asyncio.to_thread(self.outbox.pending)
+        except Exception as e:
+            logger.error(f"Ошибка при чтении журнала анкет: {e}")
+            return
+
+        pending = [(key, survey_data) for key, survey_data in pending if key not in self._in_flight]
+        if pending:
+            logger.info(f"Найдено невыгруженных анкет в журнале: {len(pending)}")
+        self._in_flight.update(key for key, _ in pending)
+        try:
+            for start in range(0, len(pending), self.max_batch_size):
+                # Если пакет не выгружен, остальные не пробуем до следующего чтения журнала
+                if not await self._write_batch(pending[start:start + self.max_batch_size]):
+                    break
+        finally:
+            self._in_flight.difference_update(key for key, _ in pending)
+
+    async def _replay_retained(self):
+        """Выгрузить анкеты, отложенные в памяти после неудачных попыток"""
+        retained, self._retained = self._retained, []
+        logger.info(f"Повторная выгрузка отложенных анкет: {len(retained)}")
+        for start in range(0, len(retained), self.max_batch_size):
+            # Не выгруженный пакет снова откладывается, остальные - вместе с ним
+            if not await self._write_batch(retained[start:start + self.max_batch_size]):
+                self._retained.extend(retained[start + self.max_batch_size:])
+                break
+
+    async def _write_batch(self, batch: List[Tuple[str, SurveyRows]]) -> bool:
+        """Записать пакет анкет одним запросом, повторяя с экспоненциальной задержкой
+
+        Возвращает False, если пакет не выгружен (с журналом он остается в нем,
+        без журнала - откладывается в памяти).
+        """
+        try:
+            return await self._write_batch_with_retries(batch)
+        finally:
+            self._in_flight.difference_update(key for key, _ in batch)
+
+    async def _write_batch_with_retries(self, batch: List[Tuple[str, SurveyRows]]) -> bool:
+        keys = [key for key, _ in batch]
+        surveys = [survey_data for _, survey_data in batch]
+        attempt = 0
+
+        while True:
+            try:
+                await self.writer(surveys)
+                break
+            except Exception as e:
+                attempt += 1
+                logger.error(f"Ошибка при выгрузке пакета анкет ({len(batch)} шт., попытка {attempt}): {e}")
+                if self.outbox is not None:
+                    await asyncio.to_thread(self.outbox.record_failure, keys)
+
+                # При остановке или явном сбросе не ждем: анкеты остаются в журнале
+                # и будут выгружены при следующем его чтении
+                give_up = attempt >= self.max_retries
+                if self.outbox is not None:
+                    give_up = give_up or self._stopping or self._flush_requests > 0
+                if give_up:
+                    self.failed_count += len(batch)
+                    if self.outbox is None:
+                        # Пользователю уже сообщили о сохранении ответов - анкеты не отбрасываем
+                        self._retained.extend(batch)
+                    return False
+
+                self.retries_count += 1
+                delay = min(self.retry_base_delay * 2 ** (attempt - 1), self.retry_max_delay)
+                await asyncio.sleep(delay)
+
+        self.exported_count += len(batch)
+        self.batches_count += 1
+        logger.info(f"Выгружен пакет анкет: {len(batch)}")
+
+        if self.outbox is not None:
+            try:
+                await asyncio.to_thread(self.outbox.mark_exported, keys)
+            except Exception as e:
+                logger.error(f"Ошибка при отметке выгруженных анкет в журнале: {e}")
+        return True
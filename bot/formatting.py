@@ -0,0 +1,74 @@
+"""
+Форматирование ответов для таблицы
+
+Используется SurveyManager при сохранении каждого ответа, поэтому не зависит
+от состояния пользователей.
+"""
+
+from typing import Any
+
+from bot.survey_graph import CompiledQuestion, QuestionType
+
+def format_question_answer(question: CompiledQuestion, answer: Any) -> str:
+    """Форматировать ответ на скомпилированный вопрос"""
+    if not answer:
+        return ""
+
+    if question.type == QuestionType.TEXT:
+        return str(answer)
+
+    elif question.type == QuestionType.SINGLE_CHOICE:
+        return _format_single_choice_answer(question, answer)
+
+    elif question.type == QuestionType.MULTI_CHOICE:
+        return _format_multi_choice_answer(question, answer)
+
+    return str(answer)
+
+def _format_single_choice_answer(question: CompiledQuestion, answer: Any) -> str:
+    """Форматировать ответ одиночного выбора"""
+    if isinstance(answer, dict):
+        # Если ответ содержит выбор и комментарий
+        result = question.get_display_text(answer.get("option", ""))
+        comment = answer.get("comment", "")
+        if comment:
+            result += f" - {comment}"
+
+        return result
+
+    # Если ответ - просто ID опции
+    option = question.options_by_id.get(answer)
+    return option.display_text if option is not None else str(answer)
+
+def _format_multi_choice_answer(question: CompiledQuestion, answer: Any) -> str:
+    """Форматировать ответ множественного выбора"""
+    if isinstance(answer, dict):
+        # Если ответ содержит выборы и комментарии
+        comments = answer.get("comments", {})
+        formatted_options = []
+
+        for option_id in answer.get("options", []):
+            option_text = question.get_display_text(option_id)
+
+            # Добавляем комментарий, если есть
+            comment = comments.get(option_id)
+            if comment:
+                # Для опции "Другое" объединяем display_text с комментарием
+                if option_id == "q3_2_other":
+                    option_text = f"{option_text} {comment}"
+                else:
+                    option_text += f" - {comment}"
+
+            formatted_options.append(option_text)
+
+        return "; ".join(formatted_options)
+
+    # Если ответ - просто список ID опций
+    if isinstance(answer, list):
+        options_by_id = question.options_by_id
+        return "; ".join(
+            options_by_id[option_id].display_text
+            for option_id in answer if option_id in options_by_id
+        )
+
+    return str(answer)
@@ -4,55 +4,168 @@
 
 import os
 import json
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from typing import List, Dict, Any
-from google.oauth2.service_account import Credentials
-from googleapiclient.discovery import build
-from googleapiclient.errors import HttpError
 import logging
 
+# Клиент Google API импортируется лениво (в _create_service и методах запросов):
+# большинство обновлений бота не обращаются к таблице, а импорт
+# googleapiclient заметно увеличивает холодный старт serverless-функции
+
 logger = logging.getLogger(__name__)
 
+# Раскладка данных в таблице
+LAYOUT_BLOCKS = "blocks"  # блок "вопрос - ответ" на каждую анкету с пустой строкой после
+LAYOUT_WIDE = "wide"      # одна строка на респондента, колонка на каждый вопрос
+
+SEPARATOR_ROW = ['', '']
+
+SCOPES = ['https://www.googleapis.com/auth/spreadsheets']
+
+# Учетные данные по JSON сервисного аккаунта: разбираются один раз на процесс,
+# токен общий для всех менеджеров и потоков
+_credentials_cache: Dict[str, Any] = {}
+_credentials_lock = threading.Lock()
+# Обновление токена выполняет один поток, остальные ждут и используют результат
+_token_refresh_lock = threading.Lock()
+
+@lru_cache(maxsize=1)
+def get_discovery_document() -> Dict[str, Any]:
+    """Получить документ обнаружения Sheets v4 из статической копии googleapiclient (без сети)"""
+    from googleapiclient import discovery_cache
+    
+    document = discovery_cache.get_static_doc('sheets', 'v4')
+    if document is None:
+        raise RuntimeError("В googleapiclient нет статического документа обнаружения sheets v4")
+    return json.loads(document)
+
+def get_credentials(credentials_json: str):
+    """Получить учетные данные сервисного аккаунта (один объект на JSON)"""
+    credentials = _credentials_cache.get(credentials_json)
+    if credentials is None:
+        from google.oauth2.service_account import Credentials
+        
+        with _credentials_lock:
+            credentials = _credentials_cache.get(credentials_json)
+            if credentials is None:
+                credentials = Credentials.from_service_account_info(
+                    json.loads(credentials_json), scopes=SCOPES
+                )
+                _credentials_cache[credentials_json] = credentials
+    return credentials
+
+def refresh_credentials(credentials):
+    """Обновить истекший токен один раз для всех потоков и менеджеров"""
+    if credentials.valid:
+        return
+    with _token_refresh_lock:
+        # Пока ждали блокировку, токен мог обновить другой поток
+        if not credentials.valid:
+            import google_auth_httplib2
+            import httplib2
+            
+            credentials.refresh(google_auth_httplib2.Request(httplib2.Http()))
+
+def get_append_range(layout: str) -> str:
+    """Получить диапазон для добавления строк"""
+    return 'A:B' if layout == LAYOUT_BLOCKS else 'A1'
+
+def build_values(surveys: List[List[List[str]]], layout: str) -> List[List[str]]:
+    """Собрать строки нескольких анкет в тело одного запроса"""
+    values = []
+    for survey_data in surveys:
+        values.extend(survey_data)
+        # В блочной раскладке каждая анкета отделяется пустой строкой
+        if layout == LAYOUT_BLOCKS:
+            values.append(SEPARATOR_ROW)
+    return values
+
 class GoogleSheetsManager:
     """Менеджер для работы с Google Sheets"""
     
-    def __init__(self, credentials_json: str, spreadsheet_id: str):
+    def __init__(self, credentials_json: str, spreadsheet_id: str, max_workers: int = 4,
+                 layout: str = LAYOUT_BLOCKS, credentials=None, api_endpoint: str = None):
+        if layout not in (LAYOUT_BLOCKS, LAYOUT_WIDE):
+            raise ValueError(f"Неизвестная раскладка таблицы: {layout}")
         self.credentials_json = credentials_json
         self.spreadsheet_id = spreadsheet_id
+        self.layout = layout
+        # Готовые учетные данные и адрес API можно передать явно (например, для локальной заглушки)
+        self.credentials = credentials
+        self.api_endpoint = api_endpoint
         self.service = self._create_service()
+        # Пул потоков для вызовов API из asyncio-кода
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="sheets")
+        # httplib2.Http не потокобезопасен, поэтому у каждого потока свой транспорт
+        self._local = threading.local()
     
     def _create_service(self):
         """Создать сервис Google Sheets"""
+        from googleapiclient.discovery import build_from_document
+        
         try:
-            # Области доступа
-            scopes = ['https://www.googleapis.com/auth/spreadsheets']
+            # Учетные данные и документ обнаружения разбираются один раз на процесс
+            if self.credentials is None:
+                self.credentials = get_credentials(self.credentials_json)
+            client_options = {'api_endpoint': self.api_endpoint} if self.api_endpoint else None
             
-            # Загружаем учетные данные из JSON строки
-            credentials_info = json.loads(self.credentials_json)
-            credentials = Credentials.from_service_account_info(
-                credentials_info, scopes=scopes
+            # Сервис строится из локального документа: без запроса к discovery API
+            # и без файлового кэша обнаружения (cache_discovery)
+            service = build_from_document(
+                get_discovery_document(),
+                credentials=self.credentials,
+                client_options=client_options
             )
-            
-            # Создаем сервис
-            service = build('sheets', 'v4', credentials=credentials)
             return service
             
         except Exception as e:
             logger.error(f"Ошибка при создании сервиса Google Sheets: {e}")
             raise
     
-    def initialize_sheet(self):
+    def _get_http(self):
+        """Получить HTTP-транспорт текущего потока (google_auth_httplib2.AuthorizedHttp)"""
+        http = getattr(self._local, "http", None)
+        if http is None:
+            import google_auth_httplib2
+            import httplib2
+            
+            http = google_auth_httplib2.AuthorizedHttp(self.credentials, http=httplib2.Http())
+            self._local.http = http
+        refresh_credentials(self.credentials)
+        return http
+    
+    async def _run_in_executor(self, func, *args):
+        """Выполнить блокирующий вызов API в пуле потоков"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+    
+    def _get_append_range(self) -> str:
+        """Получить диапазон для добавления строк"""
+        return get_append_range(self.layout)
+    
+    def _build_values(self, surveys: List[List[List[str]]]) -> List[List[str]]:
+        """Собрать строки нескольких анкет в тело одного запроса"""
+        return build_values(surveys, self.layout)
+    
+    def initialize_sheet(self, headers: List[str] = None):
         """Инициализировать таблицу с заголовками"""
+        from googleapiclient.errors import HttpError
+        
         try:
-            # Заголовки таблицы
-            headers = [['Вопросы', 'Ответы']]
+            # Заголовки таблицы (для широкой раскладки - ID вопросов)
+            if headers is None:
+                headers = ['Вопросы', 'Ответы']
             
             # Записываем заголовки
             self.service.spreadsheets().values().update(
                 spreadsheetId=self.spreadsheet_id,
-                range='A1:B1',
+                range='A1',
                 valueInputOption='RAW',
-                body={'values': headers}
-            ).execute()
+                body={'values': [headers]}
+            ).execute(http=self._get_http())
             
             logger.info("Таблица инициализирована с заголовками")
             
@@ -62,38 +175,47 @@ class GoogleSheetsManager:
     
     def append_survey_data(self, survey_data: List[List[str]]):
         """Добавить данные опроса в таблицу"""
+        # Разделитель добавляется в тот же запрос, что и данные
+        self.append_survey_batch([survey_data])
+    
+    async def append_survey_data_async(self, survey_data: List[List[str]]):
+        """Добавить данные опроса в таблицу, не блокируя event loop"""
+        await self._run_in_executor(self.append_survey_data, survey_data)
+    
+    def append_survey_batch(self, surveys: List[List[List[str]]]):
+        """Добавить несколько анкет в таблицу одним запросом"""
+        from googleapiclient.errors import HttpError
+        
         try:
-            # Добавляем данные
-            self.service.spreadsheets().values().append(
-                spreadsheetId=self.spreadsheet_id,
-                range='A:B',
-                valueInputOption='RAW',
-                insertDataOption='INSERT_ROWS',
-                body={'values': survey_data}
-            ).execute()
+            values = self._build_values(surveys)
             
-            # Добавляем пустую строку после анкеты
             self.service.spreadsheets().values().append(
                 spreadsheetId=self.spreadsheet_id,
-                range='A:B',
+                range=self._get_append_range(),
                 valueInputOption='RAW',
                 insertDataOption='INSERT_ROWS',
-                body={'values': [['', '']]}
-            ).execute()
+                body={'values': values}
+            ).execute(http=self._get_http())
             
-            logger.info(f"Добавлены данные опроса: {len(survey_data)} строк")
+            logger.info(f"Добавлен пакет анкет: {len(surveys)} шт., {len(values)} строк")
             
         except HttpError as e:
-            logger.error(f"Ошибка при добавлении данных в таблицу: {e}")
+            logger.error(f"Ошибка при пакетном добавлении данных в таблицу: {e}")
             raise
     
+    async def append_survey_batch_async(self, surveys: List[List[List[str]]]):
+        """Добавить пакет анкет в таблицу, не блокируя event loop"""
+        await self._run_in_executor(self.append_survey_batch, surveys)
+    
     def get_last_row(self) -> int:
         """Получить номер последней строки с данными"""
+        from googleapiclient.errors import HttpError
+        
         try:
             result = self.service.spreadsheets().values().get(
                 spreadsheetId=self.spreadsheet_id,
                 range='A:A'
-            ).execute()
+            ).execute(http=self._get_http())
             
             values = result.get('values', [])
             return len(values)
@@ -104,15 +226,29 @@ class GoogleSheetsManager:
     
     def test_connection(self) -> bool:
         """Проверить подключение к Google Sheets"""
+        from googleapiclient.errors import HttpError
+        
         try:
             # Пытаемся получить информацию о таблице
             self.service.spreadsheets().get(
                 spreadsheetId=self.spreadsheet_id
-            ).execute()
+            ).execute(http=self._get_http())
             return True
         except HttpError as e:
             logger.error(f"Ошибка подключения к Google Sheets: {e}")
             return False
+    
+    async def test_connection_async(self) -> bool:
+        """Проверить подключение к Google Sheets, не блокируя event loop"""
+        return await self._run_in_executor(self.test_connection)
+    
+    def close(self):
+        """Остановить пул потоков"""
+        self._executor.shutdown(wait=True)
+    
+    async def close_async(self):
+        """Остановить пул потоков, не блокируя event loop"""
+        await asyncio.to_thread(self.close)
 
 
 
@@ -2,40 +2,156 @@
 Обработчики команд и сообщений бота
 """
 
+import asyncio
+import functools
 import logging
-from telegram import Update
+from typing import Dict, Optional
+from telegram import Message, Update
 from telegram.ext import (
     Application, CommandHandler, MessageHandler, CallbackQueryHandler,
     ContextTypes, filters
 )
 from bot.survey_manager import SurveyManager, QuestionType
+from bot.survey_snapshot import SurveyConfigRegistry, SurveySnapshot
+from bot.survey_engine import Action, Event, SurveyEngine
+from bot.callback_data import Callback, CallbackAction
 from bot.keyboard_builder import KeyboardBuilder
 from bot.data_processor import DataProcessor
-from bot.google_sheets import GoogleSheetsManager
+from bot.google_sheets import GoogleSheetsManager, LAYOUT_WIDE
+from bot.sheets_async import AsyncSheetsManager
+from bot.export_queue import SurveyExportQueue
+from bot.outbox import SurveyOutbox
+from bot.render_coalescer import RenderCoalescer
+from bot.state_store import create_state_store
 from bot.config import Config
 
 logger = logging.getLogger(__name__)
 
+def with_user_state(func):
+    """Загрузить состояние пользователя в начале обновления и сохранить в конце"""
+    @functools.wraps(func)
+    async def wrapper(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        user_id = update.effective_user.id
+        await self.survey_manager.begin_update_async(user_id)
+        try:
+            return await func(self, update, context)
+        finally:
+            await self.survey_manager.commit_user_state_async(user_id)
+    return wrapper
+
 class SurveyHandlers:
     """Обработчики опроса"""
     
     def __init__(self):
         self.config = Config()
-        self.survey_manager = SurveyManager()
-        self.keyboard_builder = KeyboardBuilder(self.survey_manager)
+        self.survey_manager = SurveyManager(
+            config_registry=SurveyConfigRegistry(
+                self.config.survey_config_path,
+                artifact_file=self.config.survey_config_artifact or None
+            ),
+            state_store=create_state_store(self.config.state_store_url, ttl=self.config.session_ttl),
+            max_sessions=self.config.session_max_entries,
+            session_ttl=self.config.session_ttl
+        )
+        # Версии конфигурации опроса: перезагрузка по SIGHUP и при изменении файла
+        self.config_registry = self.survey_manager.config_registry
+        self._config_watch_task: Optional[asyncio.Task] = None
+        # Таблица переходов опроса: одно изменение состояния и один ответ на обновление
+        self.engine = SurveyEngine(self.survey_manager)
+        # Клавиатуры с короткими токенами callback_data - по одному построителю на версию опроса
+        self._keyboard_builders: Dict[int, KeyboardBuilder] = {}
+        self._callback_handlers = {
+            CallbackAction.START_SURVEY: self._on_start_survey,
+            CallbackAction.SINGLE_CHOICE: self._on_single_choice,
+            CallbackAction.MULTI_CHOICE_TOGGLE: self._on_multi_choice_toggle,
+            CallbackAction.MULTI_CHOICE_DONE: self._on_multi_choice_done,
+            CallbackAction.SKIP_COMMENT: self._on_skip_comment,
+        }
+        # Быстрые нажатия множественного выбора перерисовываются одним запросом
+        self.keyboard_renderer = RenderCoalescer(window=self.config.multi_choice_render_delay)
         self.data_processor = DataProcessor(self.survey_manager)
         # Инициализируем Google Sheets только при необходимости
         self.sheets_manager = None
+        self._sheets_manager_lock = asyncio.Lock()
+        # Завершенные анкеты сначала пишутся в локальный журнал,
+        # а затем выгружаются пакетами в фоне
+        self.outbox = SurveyOutbox(self.config.outbox_path) if self.config.outbox_path else None
+        self.export_queue = SurveyExportQueue(self._write_survey_batch, outbox=self.outbox)
+    
+    @property
+    def keyboard_builder(self) -> KeyboardBuilder:
+        """Построитель клавиатур текущей версии опроса"""
+        return self._get_keyboard_builder(self.config_registry.current)
+    
+    def _get_keyboard_builder(self, snapshot: SurveySnapshot) -> KeyboardBuilder:
+        """Построитель клавиатур версии опроса (создается при первом обращении)"""
+        builder = self._keyboard_builders.get(snapshot.version)
+        if builder is None:
+            # Построители версий, которые уже не хранятся, больше не нужны
+            for version in list(self._keyboard_builders):
+                if self.config_registry.get(version).version != version:
+                    del self._keyboard_builders[version]
+            builder = self._keyboard_builders[snapshot.version] = KeyboardBuilder(
+                self.survey_manager, callback_codec=snapshot.codec, graph=snapshot.graph
+            )
+        return builder
+    
+    def _get_user_keyboard_builder(self, user_id: int) -> KeyboardBuilder:
+        """Построитель клавиатур версии опроса, по которой отвечает пользователь"""
+        return self._get_keyboard_builder(self.survey_manager.get_user_snapshot(user_id))
+    
+    async def start_config_reload(self, application: Application = None):
+        """Включить перезагрузку конфигурации опроса по SIGHUP и при изменении файла"""
+        self.config_registry.install_signal_handler()
+        interval = self.config.survey_config_watch_interval
+        if interval > 0 and self._config_watch_task is None:
+            self._config_watch_task = asyncio.create_task(self.config_registry.watch(interval))
     
     def _get_sheets_manager(self):
         """Получить менеджер Google Sheets (ленивая инициализация)"""
         if self.sheets_manager is None:
-            self.sheets_manager = GoogleSheetsManager(
+            if self.config.sheets_backend == "httpx":
+                manager_class = AsyncSheetsManager
+            elif self.config.sheets_backend == "googleapiclient":
+                manager_class = GoogleSheetsManager
+            else:
+                raise ValueError(f"Неизвестный клиент Google Sheets: {self.config.sheets_backend}")
+            self.sheets_manager = manager_class(
                 self.config.google_credentials_json,
-                self.config.google_sheets_id
+                self.config.google_sheets_id,
+                layout=self.config.sheets_layout
             )
         return self.sheets_manager
     
+    async def _get_sheets_manager_async(self):
+        """Получить менеджер Google Sheets, создавая его вне event loop"""
+        if self.sheets_manager is None:
+            async with self._sheets_manager_lock:
+                if self.sheets_manager is None:
+                    # Создание менеджера разбирает учетные данные - это блокирующая операция
+                    await asyncio.to_thread(self._get_sheets_manager)
+        return self.sheets_manager
+    
+    async def _write_survey_batch(self, surveys):
+        """Записать пакет анкет в Google Sheets"""
+        sheets_manager = await self._get_sheets_manager_async()
+        await sheets_manager.append_survey_batch_async(surveys)
+    
+    async def shutdown(self, application: Application = None):
+        """Выгрузить оставшиеся анкеты при остановке бота"""
+        if self._config_watch_task is not None:
+            self._config_watch_task.cancel()
+            self._config_watch_task = None
+        await self.keyboard_renderer.flush()
+        await self.export_queue.stop()
+        if self.sheets_manager is not None:
+            await self.sheets_manager.close_async()
+        if self.outbox is not None:
+            self.outbox.close()
+        self.survey_manager.commit_all()
+        self.survey_manager.state_store.close()
+    
+    @with_user_state
     async def start_command(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработчик команды /start"""
         user_id = update.effective_user.id
@@ -52,410 +168,122 @@ class SurveyHandlers:
             reply_markup=keyboard
         )
     
+    @with_user_state
     async def handle_callback_query(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Обработчик callback запросов"""
         query = update.callback_query
         await query.answer()
         
-        user_id = update.effective_user.id
-        data = query.data
-        
-        if data == "start_survey":
-            await self._start_survey(update, context)
-        
-
-        
-        elif data.startswith("single_choice:"):
-            await self._handle_single_choice(update, context, data)
-        
-        elif data.startswith("multi_choice_toggle:"):
-            await self._handle_multi_choice_toggle(update, context, data)
-        
-        elif data.startswith("multi_choice_done:"):
-            await self._handle_multi_choice_done(update, context, data)
-        
-        elif data.startswith("skip_comment:"):
-            await self._handle_skip_comment(update, context, data)
-    
-    async def handle_text_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Обработчик текстовых сообщений"""
-        user_id = update.effective_user.id
-        text = update.message.text
-        
-        # Проверяем, ожидается ли комментарий
-        if self.survey_manager.is_waiting_for_comment(user_id):
-            await self._handle_comment_input(update, context, text)
+        # Кнопки разбираются по версии опроса пользователя или по метке версии в токене
+        user_version = self.survey_manager.get_user_snapshot(update.effective_user.id).version
+        callback = self.config_registry.decode_callback(query.data, user_version)
+        if callback is None:
+            logger.warning(f"Неизвестная callback_data: {query.data!r}")
             return
         
-        # Проверяем, ожидается ли текстовый ответ
-        current_question = self.survey_manager.get_current_question(user_id)
-        if current_question != "start" and current_question != "completed":
-            question_type = self.survey_manager.get_question_type(current_question)
-            if question_type == QuestionType.TEXT:
-                await self._handle_text_answer(update, context, text)
-                return
-        
-        # Если не в процессе опроса, предлагаем начать
-        await update.message.reply_text(
-            "Для начала опроса используйте команду /start"
-        )
+        await self._callback_handlers[callback.action](update, context, callback)
     
-    async def _start_survey(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
-        """Начать опрос"""
-        user_id = update.effective_user.id
-        
-        # Устанавливаем первый вопрос
-        self.survey_manager.set_current_question(user_id, "q1_1")
-        
-        # Отправляем первый вопрос
-        await self._send_question(update, context, "q1_1")
+    async def _on_start_survey(self, update: Update, context: ContextTypes.DEFAULT_TYPE, callback: Callback):
+        await self._run_transition(update, context, Event.START)
     
-
+    async def _on_single_choice(self, update: Update, context: ContextTypes.DEFAULT_TYPE, callback: Callback):
+        await self._run_transition(update, context, Event.SINGLE_CHOICE, callback.question_id, callback.option_id)
     
-    async def _handle_single_choice(self, update: Update, context: ContextTypes.DEFAULT_TYPE, data: str):
-        """Обработчик одиночного выбора"""
-        user_id = update.effective_user.id
-        _, question_id, option_id = data.split(":", 2)
-        
-        # Получаем информацию об опции
-        options = self.survey_manager.get_question_options(question_id)
-        selected_option = None
-        for option in options:
-            if option.get("id") == option_id:
-                selected_option = option
-                break
-        
-        if not selected_option:
-            return
-        
-        # Проверяем, нужен ли комментарий
-        comment_required = selected_option.get("comment_required", False)
-        comment_type = selected_option.get("comment_type", "none")
-        
-        if comment_required and comment_type != "none":
-            # Устанавливаем ожидание комментария
-            comment_question = selected_option.get("comment_question", "Укажите дополнительную информацию:")
-            self.survey_manager.set_waiting_for_comment(user_id, option_id, comment_question)
-            
-            # Запрашиваем комментарий
-            keyboard = self.keyboard_builder.build_comment_prompt_keyboard(
-                question_id, option_id, comment_required
-            )
-            
-            await update.callback_query.edit_message_text(
-                comment_question,
-                reply_markup=keyboard
-            )
-        else:
-            # Сохраняем ответ и переходим к следующему вопросу
-            # Форматируем ответ для одиночного выбора
-            formatted_answer = {
-                "option": option_id,
-                "comment": ""
-            }
-            self.survey_manager.save_answer(user_id, question_id, formatted_answer)
-            self.survey_manager.move_to_next_question(user_id)
-            
-            # Отправляем следующий вопрос
-            next_question = self.survey_manager.get_current_question(user_id)
-            if next_question == "completed":
-                await self._complete_survey(update, context)
-            else:
-                await self._send_question(update, context, next_question)
+    async def _on_multi_choice_done(self, update: Update, context: ContextTypes.DEFAULT_TYPE, callback: Callback):
+        # Сообщение будет заменено целиком: отложенная перерисовка клавиатуры не нужна
+        await self.keyboard_renderer.cancel(self._get_message_key(update.callback_query))
+        await self._run_transition(update, context, Event.MULTI_CHOICE_DONE, callback.question_id)
     
-    async def _handle_multi_choice_toggle(self, update: Update, context: ContextTypes.DEFAULT_TYPE, data: str):
-        """Обработчик переключения множественного выбора"""
-        user_id = update.effective_user.id
-        _, question_id, option_id = data.split(":", 2)
-        
-        # Переключаем выбор
-        current_selections = self.survey_manager.get_multi_choice_selections(user_id)
-        is_selected = option_id in current_selections
-        
-        self.survey_manager.save_multi_choice_selection(user_id, option_id, not is_selected)
-        
-        # Обновляем клавиатуру
-        keyboard = self.keyboard_builder.build_multi_choice_keyboard(question_id, user_id)
-        
-        await update.callback_query.edit_message_reply_markup(reply_markup=keyboard)
+    async def _on_skip_comment(self, update: Update, context: ContextTypes.DEFAULT_TYPE, callback: Callback):
+        await self._run_transition(update, context, Event.SKIP_COMMENT, callback.question_id, callback.option_id)
     
-    async def _handle_multi_choice_done(self, update: Update, context: ContextTypes.DEFAULT_TYPE, data: str):
-        """Обработчик завершения множественного выбора"""
-        user_id = update.effective_user.id
-        _, question_id = data.split(":", 1)
-        
-        # Получаем выбранные опции
-        selected_options = self.survey_manager.get_multi_choice_selections(user_id)
-        
-        if not selected_options:
-            await update.callback_query.edit_message_text(
-                "Пожалуйста, выберите хотя бы один вариант.",
-                reply_markup=self.keyboard_builder.build_multi_choice_keyboard(question_id, user_id)
-            )
-            return
-        
-        # Проверяем, нужны ли комментарии для выбранных опций
-        options_needing_comments = []
-        for option_id in selected_options:
-            if self.survey_manager.get_option_requires_comment(question_id, option_id):
-                options_needing_comments.append(option_id)
-        
-        if options_needing_comments:
-            # Запрашиваем комментарии
-            option_id = options_needing_comments[0]
-            comment_question = self.survey_manager.get_option_comment_question(question_id, option_id)
-            if not comment_question:
-                comment_question = "Укажите дополнительную информацию:"
-            
-            self.survey_manager.set_waiting_for_comment(user_id, option_id, comment_question)
-            
-            keyboard = self.keyboard_builder.build_comment_prompt_keyboard(
-                question_id, option_id, True
-            )
-            
-            await update.callback_query.edit_message_text(
-                comment_question,
-                reply_markup=keyboard
-            )
-        else:
-            # Сохраняем ответ и переходим к следующему вопросу
-            # Форматируем ответ для множественного выбора
-            formatted_answer = {
-                "options": selected_options,
-                "comments": {}
-            }
-            self.survey_manager.save_answer(user_id, question_id, formatted_answer)
-            self.survey_manager.clear_multi_choice_selections(user_id)
-            self.survey_manager.move_to_next_question(user_id)
-            
-            # Отправляем следующий вопрос
-            next_question = self.survey_manager.get_current_question(user_id)
-            if next_question == "completed":
-                await self._complete_survey(update, context)
-            else:
-                await self._send_question(update, context, next_question)
+    @with_user_state
+    async def handle_text_message(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        """Обработчик текстовых сообщений (ответы на текстовые вопросы и комментарии)"""
+        await self._run_transition(update, context, Event.TEXT, text=update.message.text)
     
-    async def _handle_comment_input(self, update: Update, context: ContextTypes.DEFAULT_TYPE, text: str):
-        """Обработчик ввода комментария"""
+    async def _run_transition(self, update: Update, context: ContextTypes.DEFAULT_TYPE, event: Event,
+                              question_id: str = None, option_id: str = None, text: str = None):
+        """Выполнить переход опроса и отправить пользователю его результат"""
         user_id = update.effective_user.id
-        option_id = self.survey_manager.get_waiting_option_id(user_id)
-        
-        if not option_id:
-            return
+        transition = self.engine.handle(user_id, event, question_id, option_id, text)
+        action = transition.action
         
-        # Сохраняем комментарий
-        current_question = self.survey_manager.get_current_question(user_id)
-        current_answer = self.survey_manager.get_all_answers(user_id).get(current_question, {})
-        question_type = self.survey_manager.get_question_type(current_question)
+        if action == Action.SEND_QUESTION:
+            await self._send_question(update, context, transition.question_id)
         
-        if question_type.value == "single_choice":
-            # Обработка комментария для одиночного выбора
-            if isinstance(current_answer, dict) and "option" in current_answer:
-                # Если ответ уже в правильном формате, обновляем комментарий
-                current_answer["comment"] = text
-            else:
-                # Создаем новый ответ в правильном формате для одиночного выбора
-                current_answer = {
-                    "option": option_id,
-                    "comment": text
-                }
-            
-            self.survey_manager.save_answer(user_id, current_question, current_answer)
-            
-            # Очищаем ожидание комментария
-            self.survey_manager.clear_waiting_for_comment(user_id)
-            
-            # Переходим к следующему вопросу
-            self.survey_manager.move_to_next_question(user_id)
-            
-            # Отправляем следующий вопрос
-            next_question = self.survey_manager.get_current_question(user_id)
-            if next_question == "completed":
-                await self._complete_survey(update, context)
-            else:
-                await self._send_question(update, context, next_question)
+        elif action == Action.COMPLETE:
+            await self._complete_survey(update, context)
         
-        else:
-            # Обработка комментария для множественного выбора
-            # Получаем все выбранные опции для текущего вопроса
-            selected_options = self.survey_manager.get_multi_choice_selections(user_id)
-            
-            if isinstance(current_answer, dict) and "options" in current_answer:
-                # Если ответ уже в правильном формате, добавляем комментарий
-                if "comments" not in current_answer:
-                    current_answer["comments"] = {}
-                current_answer["comments"][option_id] = text
-            else:
-                # Создаем новый ответ в правильном формате
-                current_answer = {
-                    "options": selected_options,
-                    "comments": {option_id: text}
-                }
-            
-            self.survey_manager.save_answer(user_id, current_question, current_answer)
-            
-            # Очищаем ожидание комментария
-            self.survey_manager.clear_waiting_for_comment(user_id)
-            
-            # Проверяем, есть ли еще опции, требующие комментариев
-            options_needing_comments = []
-            for opt_id in selected_options:
-                if self.survey_manager.get_option_requires_comment(current_question, opt_id):
-                    if opt_id not in current_answer.get("comments", {}):
-                        options_needing_comments.append(opt_id)
-            
-            if options_needing_comments:
-                # Запрашиваем следующий комментарий
-                next_option_id = options_needing_comments[0]
-                comment_question = self.survey_manager.get_option_comment_question(current_question, next_option_id)
-                if not comment_question:
-                    comment_question = "Укажите дополнительную информацию:"
-                
-                self.survey_manager.set_waiting_for_comment(user_id, next_option_id, comment_question)
-                
-                keyboard = self.keyboard_builder.build_comment_prompt_keyboard(
-                    current_question, next_option_id, True
-                )
-                
+        elif action == Action.ASK_COMMENT:
+            keyboard = self._get_user_keyboard_builder(user_id).build_comment_prompt_keyboard(
+                transition.question_id, transition.option_id, transition.comment_required
+            )
+            if transition.new_message:
                 await context.bot.send_message(
                     chat_id=update.effective_chat.id,
-                    text=comment_question,
+                    text=transition.prompt,
                     reply_markup=keyboard
                 )
             else:
-                # Все комментарии получены, переходим к следующему вопросу
-                self.survey_manager.clear_multi_choice_selections(user_id)
-                self.survey_manager.move_to_next_question(user_id)
-                
-                # Отправляем следующий вопрос
-                next_question = self.survey_manager.get_current_question(user_id)
-                if next_question == "completed":
-                    await self._complete_survey(update, context)
-                else:
-                    await self._send_question(update, context, next_question)
-    
-    async def _handle_skip_comment(self, update: Update, context: ContextTypes.DEFAULT_TYPE, data: str):
-        """Обработчик пропуска комментария"""
-        user_id = update.effective_user.id
-        _, question_id, option_id = data.split(":", 2)
-        
-        # Получаем текущий ответ и тип вопроса
-        current_answer = self.survey_manager.get_all_answers(user_id).get(question_id, {})
-        question_type = self.survey_manager.get_question_type(question_id)
-        
-        if question_type.value == "single_choice":
-            # Обработка пропуска комментария для одиночного выбора
-            if isinstance(current_answer, dict) and "option" in current_answer:
-                # Если ответ уже в правильном формате, помечаем комментарий как пустую строку
-                current_answer["comment"] = ""
-            else:
-                # Создаем новый ответ в правильном формате для одиночного выбора
-                current_answer = {
-                    "option": option_id,
-                    "comment": ""
-                }
-            
-            self.survey_manager.save_answer(user_id, question_id, current_answer)
-            
-            # Очищаем ожидание комментария
-            self.survey_manager.clear_waiting_for_comment(user_id)
-            
-            # Переходим к следующему вопросу
-            self.survey_manager.move_to_next_question(user_id)
-            
-            # Отправляем следующий вопрос
-            next_question = self.survey_manager.get_current_question(user_id)
-            if next_question == "completed":
-                await self._complete_survey(update, context)
-            else:
-                await self._send_question(update, context, next_question)
-        
-        else:
-            # Обработка пропуска комментария для множественного выбора
-            selected_options = self.survey_manager.get_multi_choice_selections(user_id)
-            
-            # Создаем или обновляем ответ в правильном формате
-            if isinstance(current_answer, dict) and "options" in current_answer:
-                if "comments" not in current_answer:
-                    current_answer["comments"] = {}
-                # Помечаем пропущенный комментарий как пустую строку
-                current_answer["comments"][option_id] = ""
-            else:
-                current_answer = {
-                    "options": selected_options,
-                    "comments": {option_id: ""}
-                }
-            
-            self.survey_manager.save_answer(user_id, question_id, current_answer)
-            
-            # Очищаем ожидание комментария
-            self.survey_manager.clear_waiting_for_comment(user_id)
-            
-            # Проверяем, есть ли еще опции, требующие комментариев
-            options_needing_comments = []
-            for opt_id in selected_options:
-                if self.survey_manager.get_option_requires_comment(question_id, opt_id):
-                    if opt_id not in current_answer.get("comments", {}):
-                        options_needing_comments.append(opt_id)
-            
-            if options_needing_comments:
-                # Запрашиваем следующий комментарий
-                next_option_id = options_needing_comments[0]
-                comment_question = self.survey_manager.get_option_comment_question(question_id, next_option_id)
-                if not comment_question:
-                    comment_question = "Укажите дополнительную информацию:"
-                
-                self.survey_manager.set_waiting_for_comment(user_id, next_option_id, comment_question)
-                
-                keyboard = self.keyboard_builder.build_comment_prompt_keyboard(
-                    question_id, next_option_id, True
-                )
-                
                 await update.callback_query.edit_message_text(
-                    comment_question,
+                    transition.prompt,
                     reply_markup=keyboard
                 )
-            else:
-                # Все комментарии обработаны, переходим к следующему вопросу
-                self.survey_manager.clear_multi_choice_selections(user_id)
-                self.survey_manager.move_to_next_question(user_id)
-                
-                # Отправляем следующий вопрос
-                next_question = self.survey_manager.get_current_question(user_id)
-                if next_question == "completed":
-                    await self._complete_survey(update, context)
-                else:
-                    await self._send_question(update, context, next_question)
+        
+        elif action == Action.SELECT_REQUIRED:
+            await update.callback_query.edit_message_text(
+                "Пожалуйста, выберите хотя бы один вариант.",
+                reply_markup=self._get_user_keyboard_builder(user_id).build_multi_choice_keyboard_for_mask(
+                    transition.question_id, transition.mask
+                )
+            )
+        
+        elif action == Action.NOT_STARTED:
+            # Если не в процессе опроса, предлагаем начать
+            await update.message.reply_text(
+                "Для начала опроса используйте команду /start"
+            )
     
-    async def _handle_text_answer(self, update: Update, context: ContextTypes.DEFAULT_TYPE, text: str):
-        """Обработчик текстового ответа"""
+    async def _on_multi_choice_toggle(self, update: Update, context: ContextTypes.DEFAULT_TYPE, callback: Callback):
+        """Обработчик переключения множественного выбора"""
         user_id = update.effective_user.id
-        current_question = self.survey_manager.get_current_question(user_id)
+        question_id = callback.question_id
+        
+        # Переключаем выбор
+        mask = self.survey_manager.toggle_multi_choice_selection(user_id, callback.option_id)
         
-        # Сохраняем ответ
-        self.survey_manager.save_answer(user_id, current_question, text)
+        # Обновляем клавиатуру: серия быстрых нажатий дает одно редактирование
+        query = update.callback_query
+        keyboard_builder = self._get_user_keyboard_builder(user_id)
         
-        # Переходим к следующему вопросу
-        self.survey_manager.move_to_next_question(user_id)
+        async def render(mask: int):
+            keyboard = keyboard_builder.build_multi_choice_keyboard_for_mask(question_id, mask)
+            await query.edit_message_reply_markup(reply_markup=keyboard)
         
-        # Отправляем следующий вопрос
-        next_question = self.survey_manager.get_current_question(user_id)
-        if next_question == "completed":
-            await self._complete_survey(update, context)
-        else:
-            await self._send_question(update, context, next_question)
+        self.keyboard_renderer.schedule(self._get_message_key(query), mask, render)
+    
+    @staticmethod
+    def _get_message_key(query):
+        """Ключ сообщения с клавиатурой для RenderCoalescer"""
+        if query.message is not None:
+            return (query.message.chat_id, query.message.message_id)
+        return query.inline_message_id
     
     async def _send_question(self, update: Update, context: ContextTypes.DEFAULT_TYPE, question_id: str):
         """Отправить вопрос пользователю"""
-        question_text = self.survey_manager.get_question_text(question_id)
-        question_type = self.survey_manager.get_question_type(question_id)
+        # Текст и клавиатура - из версии опроса, по которой отвечает пользователь
+        keyboard_builder = self._get_user_keyboard_builder(update.effective_user.id)
+        question = keyboard_builder.graph.questions.get(question_id)
+        question_text = question.text if question is not None else ""
+        question_type = question.type if question is not None else QuestionType.TEXT
         
         # Проверяем, есть ли callback_query (для inline кнопок)
         has_callback_query = update.callback_query is not None
         
         if question_type == QuestionType.TEXT:
             # Для текстовых вопросов отправляем новое сообщение
-            keyboard = self.keyboard_builder.build_text_input_keyboard()
+            keyboard = keyboard_builder.build_text_input_keyboard()
             await context.bot.send_message(
                 chat_id=update.effective_chat.id,
                 text=question_text,
@@ -464,23 +292,30 @@ class SurveyHandlers:
         else:
             # Для вопросов с выбором используем inline клавиатуру
             if question_type == QuestionType.SINGLE_CHOICE:
-                keyboard = self.keyboard_builder.build_single_choice_keyboard(question_id)
+                keyboard = keyboard_builder.build_single_choice_keyboard(question_id)
             else:
-                keyboard = self.keyboard_builder.build_multi_choice_keyboard(question_id, update.effective_user.id)
+                keyboard = keyboard_builder.build_multi_choice_keyboard(question_id, update.effective_user.id)
             
             if has_callback_query:
                 # Если есть callback_query, редактируем сообщение
-                await update.callback_query.edit_message_text(
+                message = await update.callback_query.edit_message_text(
                     question_text,
                     reply_markup=keyboard
                 )
             else:
                 # Если нет callback_query, отправляем новое сообщение
-                await context.bot.send_message(
+                message = await context.bot.send_message(
                     chat_id=update.effective_chat.id,
                     text=question_text,
                     reply_markup=keyboard
                 )
+            
+            # Запоминаем показанную маску, чтобы не отправлять пустые перерисовки
+            if question_type == QuestionType.MULTI_CHOICE and isinstance(message, Message):
+                self.keyboard_renderer.mark_rendered(
+                    (message.chat_id, message.message_id),
+                    self.survey_manager.get_multi_choice_mask(update.effective_user.id)
+                )
     
     async def _complete_survey(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
         """Завершить опрос"""
@@ -488,42 +323,49 @@ class SurveyHandlers:
         
         try:
             # Форматируем данные для Google Sheets
-            survey_data = self.data_processor.format_answers_for_sheets(user_id)
+            if self.config.sheets_layout == LAYOUT_WIDE:
+                survey_data = self.data_processor.format_answers_wide(user_id)
+            else:
+                survey_data = self.data_processor.format_answers_for_sheets(user_id)
             
-            # Записываем в Google Sheets
-            sheets_manager = self._get_sheets_manager()
-            sheets_manager.append_survey_data(survey_data)
-            
-            # Отправляем сообщение об успешном завершении
-            completion_message = (
-                "Спасибо за участие в опросе! Ваши ответы успешно сохранены. "
-                "Мы свяжемся с вами для дальнейших консультаций."
-            )
+            # Ставим анкету в очередь пакетной выгрузки в Google Sheets. Ключ прохождения
+            # не меняется, поэтому повторная отправка той же анкеты не создаст дубликат
+            await self.export_queue.put(survey_data, key=self.survey_manager.get_session_key(user_id))
             
+        except Exception as e:
+            logger.error(f"Ошибка при сохранении данных: {e}")
             if update.callback_query is not None:
                 await update.callback_query.edit_message_text(
-                    completion_message
+                    "Произошла ошибка при сохранении данных. Пожалуйста, попробуйте позже."
                 )
             else:
                 await context.bot.send_message(
                     chat_id=update.effective_chat.id,
-                    text=completion_message
+                    text="Произошла ошибка при сохранении данных. Пожалуйста, попробуйте позже."
                 )
-            
-            # Очищаем состояние пользователя
-            self.survey_manager.clear_user_state(user_id)
-            
-        except Exception as e:
-            logger.error(f"Ошибка при сохранении данных: {e}")
+            return
+        
+        # Анкета принята к выгрузке - очищаем состояние, даже если сообщение ниже не отправится
+        self.survey_manager.clear_user_state(user_id)
+        
+        # Отправляем сообщение об успешном завершении
+        completion_message = (
+            "Спасибо за участие в опросе! Ваши ответы успешно сохранены. "
+            "Мы свяжемся с вами для дальнейших консультаций."
+        )
+        
+        try:
             if update.callback_query is not None:
                 await update.callback_query.edit_message_text(
-                    "Произошла ошибка при сохранении данных. Пожалуйста, попробуйте позже."
+                    completion_message
                 )
             else:
                 await context.bot.send_message(
                     chat_id=update.effective_chat.id,
-                    text="Произошла ошибка при сохранении данных. Пожалуйста, попробуйте позже."
+                    text=completion_message
                 )
+        except Exception as e:
+            logger.error(f"Ошибка при отправке сообщения о завершении опроса: {e}")
 
 def setup_handlers(application: Application):
     """Настройка обработчиков"""
@@ -533,3 +375,25 @@ def setup_handlers(application: Application):
     application.add_handler(CommandHandler("start", handlers.start_command))
     application.add_handler(CallbackQueryHandler(handlers.handle_callback_query))
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handlers.handle_text_message))
+    
+    # Перезагрузка конфигурации опроса включается после запуска event loop
+    previous_post_init = application.post_init
+    
+    async def post_init(app: Application):
+        await handlers.start_config_reload(app)
+        if previous_post_init is not None:
+            await previous_post_init(app)
+    
+    application.post_init = post_init
+    
+    # Выгружаем очередь анкет при остановке приложения
+    previous_post_shutdown = application.post_shutdown
+    
+    async def post_shutdown(app: Application):
+        await handlers.shutdown(app)
+        if previous_post_shutdown is not None:
+            await previous_post_shutdown(app)
+    
+    application.post_shutdown = post_shutdown
+    
+    return handlers
@@ -2,74 +2,121 @@
 Модуль для построения клавиатур и кнопок
 """
 
+import functools
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup, KeyboardButton
-from typing import List, Dict, Any
+from typing import Dict, Optional
+from bot.callback_data import CallbackAction, CallbackCodec
+from bot.survey_graph import SurveyGraph
 from bot.survey_manager import SurveyManager, QuestionType
 
 class KeyboardBuilder:
-    """Построитель клавиатур"""
+    """Построитель клавиатур
     
-    def __init__(self, survey_manager: SurveyManager):
+    Клавиатуры одинаковы для всех пользователей, поэтому строятся один раз:
+    одиночный выбор - при запуске, множественный - по (вопрос, маска выбора) в LRU-кэше.
+    Объекты клавиатур python-telegram-bot неизменяемы, их можно переиспользовать.
+    callback_data кнопок - короткие токены CallbackCodec.
+    Построитель привязан к одной версии графа опроса (по умолчанию - текущей).
+    """
+    
+    def __init__(self, survey_manager: SurveyManager, multi_choice_cache_size: int = 1024,
+                 callback_codec: Optional[CallbackCodec] = None, graph: Optional[SurveyGraph] = None):
         self.survey_manager = survey_manager
+        self.graph = graph if graph is not None else survey_manager.graph
+        self.callback_codec = callback_codec if callback_codec is not None else CallbackCodec(self.graph)
+        
+        self._welcome_keyboard = InlineKeyboardMarkup([
+            [InlineKeyboardButton("Перейти к вопросам",
+                                  callback_data=self.callback_codec.encode(CallbackAction.START_SURVEY))]
+        ])
+        # Для текстового ввода используем обычную клавиатуру
+        self._text_input_keyboard = ReplyKeyboardMarkup([], resize_keyboard=True, one_time_keyboard=False)
+        
+        self._single_choice_keyboards: Dict[str, InlineKeyboardMarkup] = {
+            question.id: self._build_single_choice_markup(question.id)
+            for question in self.graph.questions.values()
+            if question.type == QuestionType.SINGLE_CHOICE
+        }
+        
+        self._multi_choice_markup = functools.lru_cache(maxsize=multi_choice_cache_size)(
+            self._build_multi_choice_markup
+        )
+        self._comment_prompt_markup = functools.lru_cache(maxsize=256)(
+            self._build_comment_prompt_markup
+        )
     
     def build_welcome_keyboard(self) -> InlineKeyboardMarkup:
         """Построить клавиатуру приветствия"""
-        keyboard = [
-            [InlineKeyboardButton("Перейти к вопросам", callback_data="start_survey")]
-        ]
-        return InlineKeyboardMarkup(keyboard)
+        return self._welcome_keyboard
     
     def build_single_choice_keyboard(self, question_id: str) -> InlineKeyboardMarkup:
         """Построить клавиатуру для одиночного выбора"""
-        options = self.survey_manager.get_question_options(question_id)
+        keyboard = self._single_choice_keyboards.get(question_id)
+        if keyboard is None:
+            keyboard = self._build_single_choice_markup(question_id)
+        return keyboard
+    
+    def _build_single_choice_markup(self, question_id: str) -> InlineKeyboardMarkup:
+        """Создать клавиатуру одиночного выбора"""
+        question = self.graph.questions.get(question_id)
+        options = question.options if question is not None else ()
         keyboard = []
         
         for option in options:
-            button_text = option.get("text", "")
-            callback_data = f"single_choice:{question_id}:{option.get('id', '')}"
-            keyboard.append([InlineKeyboardButton(button_text, callback_data=callback_data)])
+            callback_data = self.callback_codec.encode(CallbackAction.SINGLE_CHOICE, question_id, option.id)
+            keyboard.append([InlineKeyboardButton(option.text, callback_data=callback_data)])
         
         return InlineKeyboardMarkup(keyboard)
     
     def build_multi_choice_keyboard(self, question_id: str, user_id: int) -> InlineKeyboardMarkup:
         """Построить клавиатуру для множественного выбора"""
-        options = self.survey_manager.get_question_options(question_id)
-        current_selections = self.survey_manager.get_multi_choice_selections(user_id)
+        mask = self.survey_manager.get_multi_choice_mask(user_id)
+        return self._multi_choice_markup(question_id, mask)
+    
+    def build_multi_choice_keyboard_for_mask(self, question_id: str, mask: int) -> InlineKeyboardMarkup:
+        """Построить клавиатуру множественного выбора по битовой маске выбранных вариантов"""
+        return self._multi_choice_markup(question_id, mask)
+    
+    def _build_multi_choice_markup(self, question_id: str, mask: int) -> InlineKeyboardMarkup:
+        """Создать клавиатуру множественного выбора"""
+        question = self.graph.questions.get(question_id)
+        options = question.options if question is not None else ()
         keyboard = []
         
         for option in options:
-            option_id = option.get("id", "")
-            button_text = option.get("text", "")
-            
             # Добавляем маркер выбора
-            if option_id in current_selections:
-                button_text = f"✅ {button_text}"
+            if mask & option.bit:
+                button_text = f"✅ {option.text}"
             else:
-                button_text = f"⬜ {button_text}"
+                button_text = f"⬜ {option.text}"
             
-            callback_data = f"multi_choice_toggle:{question_id}:{option_id}"
+            callback_data = self.callback_codec.encode(CallbackAction.MULTI_CHOICE_TOGGLE, question_id, option.id)
             keyboard.append([InlineKeyboardButton(button_text, callback_data=callback_data)])
         
         # Кнопка "Готово"
-        keyboard.append([InlineKeyboardButton("Готово", callback_data=f"multi_choice_done:{question_id}")])
+        keyboard.append([InlineKeyboardButton(
+            "Готово", callback_data=self.callback_codec.encode(CallbackAction.MULTI_CHOICE_DONE, question_id)
+        )])
         
         return InlineKeyboardMarkup(keyboard)
     
-    def build_comment_prompt_keyboard(self, question_id: str, option_id: str, is_required: bool = True) -> InlineKeyboardMarkup:
+    def build_comment_prompt_keyboard(self, question_id: str, option_id: str, is_required: bool = True) -> Optional[InlineKeyboardMarkup]:
         """Построить клавиатуру для запроса комментария"""
-        keyboard = []
-        
-        if not is_required:
-            # Если комментарий необязательный, добавляем кнопку "Пропустить"
-            keyboard.append([InlineKeyboardButton("Пропустить", callback_data=f"skip_comment:{question_id}:{option_id}")])
-        
-        return InlineKeyboardMarkup(keyboard) if keyboard else None
+        if is_required:
+            return None
+        return self._comment_prompt_markup(question_id, option_id)
+    
+    def _build_comment_prompt_markup(self, question_id: str, option_id: str) -> InlineKeyboardMarkup:
+        """Создать клавиатуру необязательного комментария с кнопкой «Пропустить»"""
+        return InlineKeyboardMarkup([
+            [InlineKeyboardButton("Пропустить", callback_data=self.callback_codec.encode(
+                CallbackAction.SKIP_COMMENT, question_id, option_id
+            ))]
+        ])
     
     def build_text_input_keyboard(self) -> ReplyKeyboardMarkup:
         """Построить клавиатуру для текстового ввода"""
-        # Для текстового ввода используем обычную клавиатуру
-        keyboard = []
-        return ReplyKeyboardMarkup(keyboard, resize_keyboard=True, one_time_keyboard=False)
+        return self._text_input_keyboard
     
 
 
@@ -0,0 +1,115 @@
+"""
+Локальный журнал (outbox) завершенных анкет перед выгрузкой в Google Sheets
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+# Данные одной анкеты в формате DataProcessor.format_answers_for_sheets
+SurveyRows = List[List[str]]
+
+class SurveyOutbox:
+    """Журнал анкет в SQLite: запись до выгрузки, отметка после успешной выгрузки"""
+
+    def __init__(self, path: str = "survey_outbox.sqlite3"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        # WAL + synchronous=NORMAL: запись переживает падение процесса,
+        # а fsync выполняется пакетно при checkpoint, а не на каждую анкету
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS outbox ("
+            " key TEXT PRIMARY KEY,"
+            " payload TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " exported_at REAL"
+            ")"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS outbox_pending ON outbox (exported_at, created_at)"
+        )
+
+    def append(self, key: str, survey_data: SurveyRows) -> bool:
+        """Записать анкету в журнал (повторная запись с тем же ключом игнорируется)"""
+        payload = json.dumps(survey_data, ensure_ascii=False, separators=(',', ':'))
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO outbox (key, payload, created_at) VALUES (?, ?, ?)",
+                (key, payload, time.time())
+            )
+        return cursor.rowcount == 1
+
+    def pending(self, limit: Optional[int] = None,
+                created_before: Optional[float] = None) -> List[Tuple[str, SurveyRows]]:
+        """Получить невыгруженные анкеты в порядке поступления"""
+        query = "SELECT key, payload FROM outbox WHERE exported_at IS NULL"
+        params: list = []
+        if created_before is not None:
+            query += " AND created_at < ?"
+            params.append(created_before)
+        query += " ORDER BY created_at"
+        if limit is not None:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, tuple(params)).fetchall()
+        return [(key, json.loads(payload)) for key, payload in rows]
+
+    def iter_all(self, batch_size: int = 1000) -> Iterator[Tuple[str, SurveyRows]]:
+        """Перебрать все анкеты журнала (включая выгруженные) порциями по batch_size"""
+        last_rowid = 0
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT rowid, key, payload FROM outbox WHERE rowid > ? ORDER BY rowid LIMIT ?",
+                    (last_rowid, batch_size)
+                ).fetchall()
+            if not rows:
+                return
+            last_rowid = rows[-1][0]
+            for _, key, payload in rows:
+                yield key, json.loads(payload)
+
+    def pending_count(self) -> int:
+        """Количество невыгруженных анкет"""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM outbox WHERE exported_at IS NULL"
+            ).fetchone()[0]
+
+    def mark_exported(self, keys: Iterable[str]):
+        """Отметить анкеты как выгруженные"""
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE outbox SET exported_at = ? WHERE key = ?",
+                [(now, key) for key in keys]
+            )
+
+    def record_failure(self, keys: Iterable[str]):
+        """Увеличить счетчик неудачных попыток выгрузки"""
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE outbox SET attempts = attempts + 1 WHERE key = ?",
+                [(key,) for key in keys]
+            )
+
+    def purge_exported(self, older_than: float) -> int:
+        """Удалить выгруженные анкеты старше указанного времени (unix time)"""
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM outbox WHERE exported_at IS NOT NULL AND exported_at < ?",
+                (older_than,)
+            )
+        return cursor.rowcount
+
+    def close(self):
+        """Закрыть журнал"""
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,207 @@
+"""
+Ограничение исходящих запросов к Telegram Bot API с учетом flood control
+
+Все вызовы бота (send_message, edit_message_text, answer_callback_query и т.д.)
+проходят через FloodControlRateLimiter, подключенный к Application через
+ApplicationBuilder.rate_limiter().
+"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from typing import Any, Callable, Coroutine, Dict, List, Optional, Tuple, Union
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+logger = logging.getLogger(__name__)
+
+# Приоритеты запросов (меньше - срочнее). Передаются через rate_limit_args:
+# bot.send_message(..., rate_limit_args={"priority": PRIORITY_BULK})
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BULK = 10
+
+class TokenBucket:
+    """Корзина токенов с резервированием: возвращает, сколько ждать до своего токена"""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated_at")
+
+    def __init__(self, rate: float, capacity: float, now: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated_at = now
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    def reserve(self, now: float) -> float:
+        """Занять токен (возможно, в долг) и вернуть задержку до его появления"""
+        self._refill(now)
+        self.tokens -= 1
+        return -self.tokens / self.rate if self.tokens < 0 else 0.0
+
+    def delay(self, now: float) -> float:
+        """Задержка до появления свободного токена (без резервирования)"""
+        self._refill(now)
+        return (1 - self.tokens) / self.rate if self.tokens < 1 else 0.0
+
+    def is_full(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+class FloodControlRateLimiter(BaseRateLimiter[Dict[str, Any]]):
+    """Корзины токенов на каждый чат и общая на бота, повтор после RetryAfter, приоритеты
+
+    Запросы одного чата ограничены per_chat_rate в секунду, все запросы - global_rate.
+    Общие токены выдаются ожидающим в порядке приоритета, поэтому ответы пользователям
+    не ждут за массовыми рассылками. При RetryAfter запрос повторяется после паузы,
+    а чат (или весь бот, если чат неизвестен) приостанавливается на это время.
+    """
+
+    def __init__(self, global_rate: float = 30.0, global_burst: int = 30,
+                 per_chat_rate: float = 1.0, per_chat_burst: int = 3,
+                 max_retries: int = 3, max_tracked_chats: int = 10000,
+                 clock: Callable[[], float] = time.monotonic):
+        self.global_rate = global_rate
+        self.per_chat_rate = per_chat_rate
+        self.per_chat_burst = per_chat_burst
+        self.max_retries = max_retries
+        self.max_tracked_chats = max_tracked_chats
+        self._clock = clock
+        self._global_bucket = TokenBucket(global_rate, global_burst, clock())
+        self._chat_buckets: Dict[Union[int, str], TokenBucket] = {}
+        # Пауза после RetryAfter: для чата и для всего бота
+        self._chat_blocked_until: Dict[Union[int, str], float] = {}
+        self._global_blocked_until = 0.0
+        # Ожидающие общего токена: (приоритет, порядковый номер, future)
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+        self._dispatcher: Optional[asyncio.Task] = None
+
+        # Счетчики для мониторинга
+        self.sent_count = 0
+        self.delayed_count = 0
+        self.retry_after_count = 0
+        self.failed_count = 0
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            self._dispatcher = None
+        for _, _, future in self._waiters:
+            future.cancel()
+        self._waiters.clear()
+
+    @property
+    def queue_depth(self) -> int:
+        """Количество запросов, ожидающих общего токена"""
+        return len(self._waiters)
+
+    def get_stats(self) -> Dict[str, int]:
+        """Статистика для мониторинга"""
+        waiting = {PRIORITY_INTERACTIVE: 0, PRIORITY_BULK: 0}
+        for priority, _, _ in self._waiters:
+            waiting[priority] = waiting.get(priority, 0) + 1
+        return {
+            "queue_depth": len(self._waiters),
+            "waiting_interactive": waiting[PRIORITY_INTERACTIVE],
+            "waiting_bulk": waiting[PRIORITY_BULK],
+            "tracked_chats": len(self._chat_buckets),
+            "sent": self.sent_count,
+            "delayed": self.delayed_count,
+            "retry_after": self.retry_after_count,
+            "failed": self.failed_count,
+        }
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, Union[bool, Dict[str, Any], List[Dict[str, Any]]]]],
+        args: Any,
+        kwargs: Dict[str, Any],
+        endpoint: str,
+        data: Dict[str, Any],
+        rate_limit_args: Optional[Dict[str, Any]],
+    ) -> Union[bool, Dict[str, Any], List[Dict[str, Any]]]:
+        priority = (rate_limit_args or {}).get("priority", PRIORITY_INTERACTIVE)
+        chat_id = data.get("chat_id")
+
+        for attempt in range(self.max_retries + 1):
+            await self._acquire(chat_id, priority)
+            try:
+                result = await callback(*args, **kwargs)
+                self.sent_count += 1
+                return result
+            except RetryAfter as e:
+                self.retry_after_count += 1
+                if attempt == self.max_retries:
+                    self.failed_count += 1
+                    raise
+                retry_after = float(e.retry_after)
+                logger.warning(f"Flood control для {endpoint} (чат {chat_id}): повтор через {retry_after} с")
+                self._block(chat_id, retry_after)
+
+    def _block(self, chat_id, retry_after: float):
+        """Приостановить отправку в чат (или всю отправку, если чат неизвестен)"""
+        until = self._clock() + retry_after
+        if chat_id is None:
+            self._global_blocked_until = max(self._global_blocked_until, until)
+        else:
+            self._chat_blocked_until[chat_id] = max(self._chat_blocked_until.get(chat_id, 0.0), until)
+
+    async def _acquire(self, chat_id, priority: int):
+        """Дождаться токена чата, затем общего токена в порядке приоритета"""
+        if chat_id is not None:
+            now = self._clock()
+            delay = self._get_chat_bucket(chat_id, now).reserve(now)
+            blocked_until = self._chat_blocked_until.get(chat_id)
+            if blocked_until is not None:
+                if blocked_until > now:
+                    delay = max(delay, blocked_until - now)
+                else:
+                    del self._chat_blocked_until[chat_id]
+            if delay > 0:
+                self.delayed_count += 1
+                await asyncio.sleep(delay)
+
+        now = self._clock()
+        if not self._waiters and self._global_blocked_until <= now and self._global_bucket.delay(now) == 0:
+            self._global_bucket.reserve(now)
+            return
+
+        self.delayed_count += 1
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), future))
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        await future
+
+    async def _dispatch(self):
+        """Выдавать общие токены ожидающим по приоритету"""
+        while self._waiters:
+            now = self._clock()
+            delay = max(self._global_bucket.delay(now), self._global_blocked_until - now)
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            _, _, future = heapq.heappop(self._waiters)
+            if future.cancelled():
+                continue
+            self._global_bucket.reserve(now)
+            future.set_result(None)
+
+    def _get_chat_bucket(self, chat_id, now: float) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if bucket is None:
+            if len(self._chat_buckets) >= self.max_tracked_chats:
+                # Полные корзины ничем не отличаются от новых - их можно забыть
+                for idle_chat_id in [key for key, value in self._chat_buckets.items() if value.is_full(now)]:
+                    del self._chat_buckets[idle_chat_id]
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self.per_chat_rate, self.per_chat_burst, now)
+        return bucket
@@ -0,0 +1,128 @@
+"""
+Схлопывание частых перерисовок клавиатуры одного сообщения
+"""
+
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, Hashable, Tuple
+
+from telegram.error import BadRequest
+
+logger = logging.getLogger(__name__)
+
+# Функция перерисовки получает итоговое состояние (битовую маску выбора)
+RenderFunc = Callable[[int], Awaitable]
+
+class RenderCoalescer:
+    """Перерисовывает сообщение после паузы в нажатиях и отправляет только итоговое состояние
+
+    Каждое нажатие кнопки множественного выбора меняет маску выбора, но в Telegram
+    уходит одно редактирование на серию быстрых нажатий: перерисовка выполняется, когда
+    нажатий не было window секунд, и не позже max_delay после первого нажатия серии.
+    Если итоговая маска совпадает с уже показанной, запрос не отправляется вовсе.
+    """
+
+    def __init__(self, window: float = 0.3, max_delay: float = 1.0, max_tracked: int = 10000):
+        self.window = window
+        self.max_delay = max(max_delay, window)
+        self.max_tracked = max_tracked
+        # Ожидающие перерисовки: ключ сообщения -> (маска, функция перерисовки, время нажатия)
+        self._pending: Dict[Hashable, Tuple[int, RenderFunc, float]] = {}
+        self._tasks: Dict[Hashable, asyncio.Task] = {}
+        # Перерисовки, запрос которых уже отправляется
+        self._in_flight: Dict[Hashable, asyncio.Task] = {}
+        # Последняя показанная пользователю маска по ключу сообщения
+        self._rendered: "OrderedDict[Hashable, int]" = OrderedDict()
+
+        # Счетчики для мониторинга
+        self.scheduled_count = 0
+        self.rendered_count = 0
+        self.skipped_count = 0
+
+    @property
+    def pending_count(self) -> int:
+        """Количество сообщений, ожидающих перерисовки"""
+        return len(self._pending)
+
+    def schedule(self, key: Hashable, mask: int, render: RenderFunc):
+        """Запланировать перерисовку сообщения key с маской mask"""
+        self.scheduled_count += 1
+        now = asyncio.get_running_loop().time()
+        self._pending[key] = (mask, render, now)
+        if key not in self._tasks:
+            self._tasks[key] = asyncio.create_task(self._render_later(key, now + self.max_delay))
+
+    def mark_rendered(self, key: Hashable, mask: int):
+        """Запомнить маску, с которой сообщение уже показано пользователю"""
+        self._rendered[key] = mask
+        self._rendered.move_to_end(key)
+        while len(self._rendered) > self.max_tracked:
+            self._rendered.popitem(last=False)
+
+    async def cancel(self, key: Hashable):
+        """Отменить перерисовку (сообщение будет заменено целиком) и забыть сообщение
+
+        Уже начатая перерисовка дожидается завершения: иначе запоздавшая клавиатура
+        могла бы перезаписать сообщение, которое отправят после отмены.
+        """
+        self._pending.pop(key, None)
+        task = self._tasks.pop(key, None)
+        if task is not None:
+            task.cancel()
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            await asyncio.wait({in_flight})
+        self._rendered.pop(key, None)
+
+    async def flush(self):
+        """Немедленно выполнить все ожидающие перерисовки"""
+        keys = list(self._pending)
+        for key in keys:
+            task = self._tasks.pop(key, None)
+            if task is not None:
+                task.cancel()
+        await asyncio.gather(*(self._render(key) for key in keys))
+
+    async def _render_later(self, key: Hashable, deadline: float):
+        loop = asyncio.get_running_loop()
+        try:
+            while key in self._pending:
+                # Ждем паузы в нажатиях, но не дольше deadline
+                due = min(self._pending[key][2] + self.window, deadline)
+                delay = due - loop.time()
+                if delay <= 0:
+                    break
+                await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            return
+        self._tasks.pop(key, None)
+        task = asyncio.current_task()
+        self._in_flight[key] = task
+        try:
+            await self._render(key)
+        finally:
+            if self._in_flight.get(key) is task:
+                del self._in_flight[key]
+
+    async def _render(self, key: Hashable):
+        pending = self._pending.pop(key, None)
+        if pending is None:
+            return
+        mask, render, _ = pending
+        if self._rendered.get(key) == mask:
+            # Нажатия взаимно отменились: клавиатура на экране уже актуальна
+            self.skipped_count += 1
+            return
+        try:
+            await render(mask)
+            self.rendered_count += 1
+        except BadRequest as e:
+            # "Message is not modified" - на экране уже нужное состояние
+            if "not modified" not in str(e).lower():
+                logger.error(f"Ошибка при перерисовке клавиатуры: {e}")
+                return
+        except Exception as e:
+            logger.error(f"Ошибка при перерисовке клавиатуры: {e}")
+            return
+        self.mark_rendered(key, mask)
@@ -0,0 +1,104 @@
+"""
+Ограниченный кэш активных сессий опроса с вытеснением по TTL и LRU
+"""
+
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Generic, Iterator, Optional, TypeVar
+
+V = TypeVar("V")
+
+class SessionCache(Generic[V]):
+    """Кэш сессий: вытесняет простаивающие дольше ttl и самые старые сверх max_entries"""
+
+    def __init__(self, max_entries: int = 50000, ttl: Optional[float] = 3 * 24 * 3600,
+                 on_evict: Optional[Callable[[int, V], None]] = None,
+                 clock: Callable[[], float] = time.monotonic):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        # Вызывается для каждой вытесненной сессии (например, для выгрузки в хранилище)
+        self.on_evict = on_evict
+        self._clock = clock
+        # Порядок ключей совпадает с порядком последнего обращения
+        self._entries: "OrderedDict[int, V]" = OrderedDict()
+        self._last_access: Dict[int, float] = {}
+
+        # Счетчики для мониторинга
+        self.ttl_evictions = 0
+        self.lru_evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._entries
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._entries)
+
+    def __getitem__(self, user_id: int) -> V:
+        value = self.get(user_id)
+        if value is None:
+            raise KeyError(user_id)
+        return value
+
+    def __setitem__(self, user_id: int, value: V):
+        self._entries[user_id] = value
+        self._touch(user_id)
+        self._evict()
+
+    def get(self, user_id: int, default: Optional[V] = None) -> Optional[V]:
+        """Получить сессию и отметить обращение"""
+        value = self._entries.get(user_id)
+        if value is None:
+            return default
+        if self._is_expired(user_id):
+            self._remove(user_id, value)
+            self.ttl_evictions += 1
+            return default
+        self._touch(user_id)
+        return value
+
+    def pop(self, user_id: int, default: Optional[V] = None) -> Optional[V]:
+        """Удалить сессию без вызова on_evict"""
+        self._last_access.pop(user_id, None)
+        return self._entries.pop(user_id, default)
+
+    def values(self):
+        return self._entries.values()
+
+    @property
+    def evictions(self) -> int:
+        """Общее количество вытесненных сессий"""
+        return self.ttl_evictions + self.lru_evictions
+
+    def evict_idle(self) -> int:
+        """Вытеснить все простаивающие сессии"""
+        before = self.ttl_evictions
+        self._evict()
+        return self.ttl_evictions - before
+
+    def _touch(self, user_id: int):
+        self._entries.move_to_end(user_id)
+        self._last_access[user_id] = self._clock()
+
+    def _is_expired(self, user_id: int) -> bool:
+        return self.ttl is not None and self._clock() - self._last_access[user_id] > self.ttl
+
+    def _remove(self, user_id: int, value: V):
+        del self._entries[user_id]
+        del self._last_access[user_id]
+        if self.on_evict is not None:
+            self.on_evict(user_id, value)
+
+    def _evict(self):
+        """Вытеснить сессии с начала очереди (самые давние обращения): O(1) амортизированно"""
+        while self._entries:
+            user_id, value = next(iter(self._entries.items()))
+            if self._is_expired(user_id):
+                self.ttl_evictions += 1
+            elif len(self._entries) > self.max_entries:
+                self.lru_evictions += 1
+            else:
+                break
+            self._remove(user_id, value)
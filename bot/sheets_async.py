@@ -0,0 +1,136 @@
+"""
+Асинхронный клиент Google Sheets v4 REST API поверх пула соединений httpx
+
+Альтернатива GoogleSheetsManager (googleapiclient + httplib2 в пуле потоков):
+запросы выполняются прямо в event loop, соединения переиспользуются, а при
+установленном пакете h2 используется HTTP/2 с мультиплексированием запросов.
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+from urllib.parse import quote
+
+import httpx
+
+from bot.google_sheets import (
+    LAYOUT_BLOCKS, LAYOUT_WIDE, build_values, get_append_range, get_credentials,
+    refresh_credentials
+)
+
+logger = logging.getLogger(__name__)
+
+SHEETS_API_URL = "https://sheets.googleapis.com"
+
+def http2_available() -> bool:
+    """Проверить, установлен ли пакет h2 (нужен httpx для HTTP/2)"""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+class AsyncSheetsManager:
+    """Менеджер Google Sheets на асинхронном HTTP-клиенте (тот же интерфейс, что у GoogleSheetsManager)"""
+
+    def __init__(self, credentials_json: str, spreadsheet_id: str, max_connections: int = 10,
+                 layout: str = LAYOUT_BLOCKS, credentials=None, api_endpoint: str = SHEETS_API_URL,
+                 http2: Optional[bool] = None, timeout: float = 30.0):
+        if layout not in (LAYOUT_BLOCKS, LAYOUT_WIDE):
+            raise ValueError(f"Неизвестная раскладка таблицы: {layout}")
+        self.spreadsheet_id = spreadsheet_id
+        self.layout = layout
+        # Учетные данные общие с GoogleSheetsManager: токен обновляется один раз на процесс
+        self.credentials = credentials if credentials is not None else get_credentials(credentials_json)
+        self._token_lock = asyncio.Lock()
+        self._base_url = f"{api_endpoint.rstrip('/')}/v4/spreadsheets/{quote(spreadsheet_id, safe='')}"
+        self._client = httpx.AsyncClient(
+            http2=http2_available() if http2 is None else http2,
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            timeout=timeout,
+        )
+
+    async def _get_token(self, rejected_token: Optional[str] = None) -> str:
+        """Получить действующий токен доступа (обновляется вне event loop)"""
+        if rejected_token is not None or not self.credentials.valid:
+            async with self._token_lock:
+                # Токен отклонен сервером и еще не заменен другой корутиной
+                if rejected_token is not None and self.credentials.token == rejected_token:
+                    self.credentials.token = None
+                if not self.credentials.valid:
+                    await asyncio.to_thread(refresh_credentials, self.credentials)
+        return self.credentials.token
+
+    async def _request(self, method: str, path: str, params: Dict[str, str] = None,
+                       json: Any = None) -> Dict[str, Any]:
+        """Выполнить запрос к API; при 401 один раз повторить с новым токеном"""
+        url = f"{self._base_url}{path}"
+        token = await self._get_token()
+        for attempt in range(2):
+            response = await self._client.request(
+                method, url, params=params, json=json,
+                headers={"Authorization": f"Bearer {token}"}
+            )
+            if response.status_code != 401 or attempt:
+                break
+            token = await self._get_token(rejected_token=token)
+        response.raise_for_status()
+        return response.json() if response.content else {}
+
+    def _values_path(self, range_name: str, suffix: str = "") -> str:
+        return f"/values/{quote(range_name, safe='')}{suffix}"
+
+    async def initialize_sheet_async(self, headers: List[str] = None):
+        """Инициализировать таблицу с заголовками"""
+        if headers is None:
+            headers = ['Вопросы', 'Ответы']
+        try:
+            await self._request(
+                "PUT", self._values_path('A1'),
+                params={"valueInputOption": "RAW"},
+                json={"values": [headers]}
+            )
+            logger.info("Таблица инициализирована с заголовками")
+        except httpx.HTTPError as e:
+            logger.error(f"Ошибка при инициализации таблицы: {e}")
+            raise
+
+    async def append_survey_data_async(self, survey_data: List[List[str]]):
+        """Добавить данные опроса в таблицу"""
+        await self.append_survey_batch_async([survey_data])
+
+    async def append_survey_batch_async(self, surveys: List[List[List[str]]]):
+        """Добавить несколько анкет в таблицу одним запросом"""
+        values = build_values(surveys, self.layout)
+        try:
+            await self._request(
+                "POST", self._values_path(get_append_range(self.layout), ":append"),
+                params={"valueInputOption": "RAW", "insertDataOption": "INSERT_ROWS"},
+                json={"values": values}
+            )
+            logger.info(f"Добавлен пакет анкет: {len(surveys)} шт., {len(values)} строк")
+        except httpx.HTTPError as e:
+            logger.error(f"Ошибка при пакетном добавлении данных в таблицу: {e}")
+            raise
+
+    async def get_last_row_async(self) -> int:
+        """Получить номер последней строки с данными"""
+        try:
+            result = await self._request("GET", self._values_path('A:A'))
+            return len(result.get('values', []))
+        except httpx.HTTPError as e:
+            logger.error(f"Ошибка при получении последней строки: {e}")
+            return 1
+
+    async def test_connection_async(self) -> bool:
+        """Проверить подключение к Google Sheets"""
+        try:
+            await self._request("GET", "", params={"fields": "spreadsheetId"})
+            return True
+        except httpx.HTTPError as e:
+            logger.error(f"Ошибка подключения к Google Sheets: {e}")
+            return False
+
+    async def close_async(self):
+        """Закрыть пул соединений"""
+        await self._client.aclose()
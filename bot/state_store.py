@@ -0,0 +1,253 @@
+"""
+Хранилища состояний опроса (в памяти, SQLite, Redis)
+"""
+
+import json
+import sqlite3
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, Optional
+
+from bot.survey_manager import SurveyState
+
+def dump_state(state: SurveyState) -> bytes:
+    """Сериализовать состояние в компактный JSON-массив"""
+    data = [
+        state.current_question,
+        state.answers,
+        state.selection_mask,
+        state.waiting_for_comment,
+        state.comment_question,
+        state.formatted,
+        state.config_digest,
+        state.session_id,
+    ]
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+def load_state(user_id: int, payload: bytes) -> SurveyState:
+    """Восстановить состояние из компактного JSON-массива"""
+    data = json.loads(payload)
+    current_question, answers, selection_mask, waiting_for_comment, comment_question = data[:5]
+    # В состояниях, сохраненных прежними версиями, нет отформатированных ответов
+    formatted = data[5] if len(data) > 5 else {}
+    # Пустой хэш - сессия начата до появления версий конфигурации (используется текущая);
+    # номер версии, который сохранялся раньше, действует только в своем процессе
+    config_digest = data[6] if len(data) > 6 and isinstance(data[6], str) else ""
+    # Сессии без session_id получают новый идентификатор при загрузке
+    session_id = data[7] if len(data) > 7 else None
+    return SurveyState(
+        user_id=user_id,
+        current_question=sys.intern(current_question),
+        answers={sys.intern(key): value for key, value in answers.items()},
+        selection_mask=selection_mask,
+        waiting_for_comment=waiting_for_comment,
+        comment_question=comment_question,
+        formatted={sys.intern(key): value for key, value in formatted.items()},
+        config_digest=config_digest,
+        session_id=session_id,
+    )
+
+class StateStore(ABC):
+    """Интерфейс хранилища состояний пользователей"""
+
+    # True, если состояние могут менять другие процессы (нужно перечитывать на каждом обновлении)
+    shared: bool = False
+    # Время жизни записи в секундах; общие хранилища удаляют устаревшие записи сами
+    ttl: Optional[float] = None
+
+    @abstractmethod
+    def load(self, user_id: int) -> Optional[SurveyState]:
+        """Загрузить состояние пользователя"""
+
+    @abstractmethod
+    def save(self, state: SurveyState):
+        """Сохранить состояние пользователя"""
+
+    @abstractmethod
+    def delete(self, user_id: int):
+        """Удалить состояние пользователя"""
+
+    def load_many(self, user_ids: Iterable[int]) -> Dict[int, SurveyState]:
+        """Загрузить состояния нескольких пользователей"""
+        states = {}
+        for user_id in user_ids:
+            state = self.load(user_id)
+            if state is not None:
+                states[user_id] = state
+        return states
+
+    def save_many(self, states: Iterable[SurveyState]):
+        """Сохранить состояния нескольких пользователей"""
+        for state in states:
+            self.save(state)
+
+    def close(self):
+        """Освободить ресурсы хранилища"""
+
+class MemoryStateStore(StateStore):
+    """Хранилище в памяти процесса (состояние теряется при перезапуске)"""
+
+    def __init__(self):
+        self._states: Dict[int, SurveyState] = {}
+
+    def load(self, user_id: int) -> Optional[SurveyState]:
+        return self._states.get(user_id)
+
+    def save(self, state: SurveyState):
+        self._states[state.user_id] = state
+
+    def delete(self, user_id: int):
+        self._states.pop(user_id, None)
+
+class SQLiteStateStore(StateStore):
+    """Хранилище в SQLite (переживает перезапуск, общее для процессов одной машины)
+
+    При заданном ttl записи, не обновлявшиеся ttl секунд, не загружаются и удаляются
+    при открытии хранилища и затем не чаще раза в purge_interval секунд при сохранении.
+    """
+
+    shared = True
+
+    def __init__(self, path: str = "survey_states.sqlite3", ttl: Optional[float] = None,
+                 purge_interval: float = 3600.0):
+        self.path = path
+        # Время жизни незавершенной анкеты в секундах
+        self.ttl = ttl
+        self.purge_interval = purge_interval
+        self._next_purge = 0.0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS survey_states ("
+            " user_id INTEGER PRIMARY KEY,"
+            " data BLOB NOT NULL,"
+            " updated_at REAL NOT NULL"
+            ")"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS survey_states_updated_at ON survey_states (updated_at)"
+        )
+        self.purge_expired()
+
+    def _expired_before(self) -> float:
+        """Время обновления, раньше которого записи устарели (0 - без ограничения)"""
+        return time.time() - self.ttl if self.ttl else 0.0
+
+    def purge_expired(self) -> int:
+        """Удалить устаревшие записи и вернуть их количество"""
+        self._next_purge = time.time() + self.purge_interval
+        if not self.ttl:
+            return 0
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM survey_states WHERE updated_at < ?", (self._expired_before(),)
+            )
+        return cursor.rowcount
+
+    def load(self, user_id: int) -> Optional[SurveyState]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT data FROM survey_states WHERE user_id = ? AND updated_at >= ?",
+                (user_id, self._expired_before())
+            ).fetchone()
+        return load_state(user_id, row[0]) if row else None
+
+    def load_many(self, user_ids: Iterable[int]) -> Dict[int, SurveyState]:
+        user_ids = list(user_ids)
+        if not user_ids:
+            return {}
+        placeholders = ",".join("?" * len(user_ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT user_id, data FROM survey_states WHERE user_id IN ({placeholders}) AND updated_at >= ?",
+                user_ids + [self._expired_before()]
+            ).fetchall()
+        return {user_id: load_state(user_id, data) for user_id, data in rows}
+
+    def save(self, state: SurveyState):
+        self.save_many([state])
+
+    def save_many(self, states: Iterable[SurveyState]):
+        now = time.time()
+        rows = [(state.user_id, dump_state(state), now) for state in states]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO survey_states (user_id, data, updated_at) VALUES (?, ?, ?)",
+                rows
+            )
+        if self.ttl and now >= self._next_purge:
+            self.purge_expired()
+
+    def delete(self, user_id: int):
+        with self._lock:
+            self._conn.execute("DELETE FROM survey_states WHERE user_id = ?", (user_id,))
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+class RedisStateStore(StateStore):
+    """Хранилище в Redis (общее для нескольких воркеров)
+
+    Клиент должен поддерживать методы get/set/delete/mget, как redis.Redis.
+    """
+
+    shared = True
+
+    def __init__(self, client: Any, prefix: str = "survey:state:", ttl: Optional[float] = None):
+        self.client = client
+        self.prefix = prefix
+        # Время жизни незавершенной анкеты в секундах
+        self.ttl = ttl
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> "RedisStateStore":
+        """Создать хранилище по URL вида redis://host:port/db"""
+        try:
+            import redis
+        except ImportError:
+            raise ImportError("Для хранилища Redis установите пакет redis: pip install redis")
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def _key(self, user_id: int) -> str:
+        return f"{self.prefix}{user_id}"
+
+    def load(self, user_id: int) -> Optional[SurveyState]:
+        payload = self.client.get(self._key(user_id))
+        return load_state(user_id, payload) if payload is not None else None
+
+    def load_many(self, user_ids: Iterable[int]) -> Dict[int, SurveyState]:
+        user_ids = list(user_ids)
+        if not user_ids:
+            return {}
+        payloads = self.client.mget([self._key(user_id) for user_id in user_ids])
+        return {
+            user_id: load_state(user_id, payload)
+            for user_id, payload in zip(user_ids, payloads)
+            if payload is not None
+        }
+
+    def save(self, state: SurveyState):
+        # Redis принимает время жизни ключа в целых секундах
+        ex = max(int(self.ttl), 1) if self.ttl else None
+        self.client.set(self._key(state.user_id), dump_state(state), ex=ex)
+
+    def delete(self, user_id: int):
+        self.client.delete(self._key(user_id))
+
+def create_state_store(url: str, ttl: Optional[float] = None) -> StateStore:
+    """Создать хранилище по URL: memory://, sqlite:///path или redis://host:port/db
+
+    ttl - время жизни незавершенной анкеты в секундах (для SQLite и Redis).
+    """
+    if not url or url == "memory://":
+        return MemoryStateStore()
+    if url.startswith("sqlite:///"):
+        return SQLiteStateStore(url[len("sqlite:///"):], ttl=ttl)
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisStateStore.from_url(url, ttl=ttl)
+    raise ValueError(f"Неизвестный тип хранилища состояний: {url}")
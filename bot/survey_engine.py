@@ -0,0 +1,240 @@
+"""
+Движок переходов опроса
+
+Каждое действие пользователя обрабатывается по таблице переходов на скомпилированном
+графе опроса: состояние пользователя берется один раз, изменяется на месте, а результат
+перехода описывает единственный ответ, который нужно отправить в Telegram.
+"""
+
+import time
+from dataclasses import dataclass
+from enum import Enum
+from typing import Callable, Dict, List, Optional
+
+from bot.survey_graph import COMPLETED, DEFAULT_COMMENT_QUESTION, CompiledQuestion, QuestionType, SurveyGraph
+from bot.survey_manager import SurveyManager, SurveyState, store_answer
+
+class Event(Enum):
+    """Действия пользователя"""
+    START = "start"
+    SINGLE_CHOICE = "single_choice"
+    MULTI_CHOICE_DONE = "multi_choice_done"
+    TEXT = "text"
+    COMMENT = "comment"
+    SKIP_COMMENT = "skip_comment"
+
+class Action(Enum):
+    """Ответ пользователю по итогам перехода"""
+    SEND_QUESTION = "send_question"
+    ASK_COMMENT = "ask_comment"
+    SELECT_REQUIRED = "select_required"
+    COMPLETE = "complete"
+    NOT_STARTED = "not_started"
+    NONE = "none"
+
+@dataclass(frozen=True)
+class Transition:
+    """Результат перехода"""
+    action: Action
+    question_id: Optional[str] = None
+    option_id: Optional[str] = None
+    # Текст запроса комментария
+    prompt: Optional[str] = None
+    # Необязательный комментарий можно пропустить кнопкой
+    comment_required: bool = True
+    # Отправить запрос комментария новым сообщением, а не редактированием
+    new_message: bool = False
+    # Маска выбора для перерисовки клавиатуры множественного выбора
+    mask: int = 0
+
+_NONE = Transition(Action.NONE)
+_NOT_STARTED = Transition(Action.NOT_STARTED)
+_COMPLETE = Transition(Action.COMPLETE)
+
+# Хук получает событие, вопрос до перехода, результат и время перехода в секундах
+TransitionHook = Callable[[Event, str, Transition, float], None]
+
+class SurveyEngine:
+    """Таблица переходов опроса: (событие, состояние) -> изменение состояния и ответ"""
+
+    def __init__(self, survey_manager: SurveyManager, clock: Callable[[], float] = time.perf_counter):
+        self.survey_manager = survey_manager
+        self._clock = clock
+        self._hooks: List[TransitionHook] = []
+        # Переходы к вопросам неизменяемы и зависят только от ID - создаются один раз
+        self._show_question: Dict[str, Transition] = {}
+        self._table: Dict[Event, Callable[..., Transition]] = {
+            Event.START: self._start,
+            Event.SINGLE_CHOICE: self._single_choice,
+            Event.MULTI_CHOICE_DONE: self._multi_choice_done,
+            Event.TEXT: self._text,
+            Event.COMMENT: self._comment,
+            Event.SKIP_COMMENT: self._skip_comment,
+        }
+
+    def add_hook(self, hook: TransitionHook):
+        """Добавить хук, вызываемый после каждого перехода"""
+        self._hooks.append(hook)
+
+    def remove_hook(self, hook: TransitionHook):
+        """Удалить хук"""
+        self._hooks.remove(hook)
+
+    def handle(self, user_id: int, event: Event, question_id: Optional[str] = None,
+               option_id: Optional[str] = None, text: Optional[str] = None) -> Transition:
+        """Обработать действие пользователя и вернуть ответ, который нужно отправить"""
+        started = self._clock() if self._hooks else 0.0
+        state = self.survey_manager.peek_user_state(user_id)
+        if state is None:
+            if event is Event.TEXT:
+                # Текст вне опроса не создает сессию
+                transition = _NOT_STARTED
+                self._run_hooks(event, "start", transition, started)
+                return transition
+            state = self.survey_manager.get_user_state(user_id)
+        elif event is Event.TEXT and state.waiting_for_comment is not None:
+            event = Event.COMMENT
+
+        from_question = state.current_question
+        # Сессия проходит опрос по версии конфигурации, с которой начата
+        graph = self.survey_manager.get_state_snapshot(state).graph
+        transition = self._table[event](state, graph, question_id, option_id, text)
+        self._run_hooks(event, from_question, transition, started)
+        return transition
+
+    def _run_hooks(self, event: Event, from_question: str, transition: Transition, started: float):
+        if self._hooks:
+            elapsed = self._clock() - started
+            for hook in self._hooks:
+                hook(event, from_question, transition, elapsed)
+
+    # Переходы
+
+    def _start(self, state: SurveyState, graph: SurveyGraph, question_id, option_id, text) -> Transition:
+        # Новое прохождение начинается с текущей версии конфигурации
+        snapshot = self.survey_manager.config_registry.current
+        self.survey_manager.mark_dirty(state.user_id)
+        state.config_digest = snapshot.digest
+        state.current_question = snapshot.graph.first_question or COMPLETED
+        return self._show_current(snapshot.graph, state)
+
+    def _single_choice(self, state: SurveyState, graph: SurveyGraph, question_id, option_id, text) -> Transition:
+        question = graph.questions.get(question_id)
+        option = question.options_by_id.get(option_id) if question is not None else None
+        if option is None:
+            return _NONE
+
+        if option.comment_required and option.comment_type != "none":
+            return self._ask_comment(state, question, option.id)
+
+        store_answer(state, question, {"option": option.id, "comment": ""})
+        return self._advance(graph, state)
+
+    def _multi_choice_done(self, state: SurveyState, graph: SurveyGraph, question_id, option_id, text) -> Transition:
+        question = graph.questions.get(question_id)
+        if question is None:
+            return _NONE
+
+        selected = self._get_selections(graph, state)
+        if not selected:
+            return Transition(Action.SELECT_REQUIRED, question_id=question.id, mask=state.selection_mask)
+
+        for selected_id in selected:
+            if selected_id in question.comment_option_ids:
+                return self._ask_comment(state, question, selected_id)
+
+        store_answer(state, question, {"options": selected, "comments": {}})
+        state.selection_mask = 0
+        return self._advance(graph, state)
+
+    def _text(self, state: SurveyState, graph: SurveyGraph, question_id, option_id, text) -> Transition:
+        question = graph.questions.get(state.current_question)
+        if question is None or question.type != QuestionType.TEXT:
+            return _NOT_STARTED
+
+        store_answer(state, question, text)
+        return self._advance(graph, state)
+
+    def _comment(self, state: SurveyState, graph: SurveyGraph, question_id, option_id, text) -> Transition:
+        question = graph.questions.get(state.current_question)
+        if question is None:
+            return _NONE
+        # Ответ на запрос комментария приходит новым сообщением - следующий запрос тоже
+        return self._save_comment(state, graph, question, state.waiting_for_comment, text, new_message=True)
+
+    def _skip_comment(self, state: SurveyState, graph: SurveyGraph, question_id, option_id, text) -> Transition:
+        question = graph.questions.get(question_id)
+        if question is None:
+            return _NONE
+        return self._save_comment(state, graph, question, option_id, "", new_message=False)
+
+    # Общие шаги
+
+    def _save_comment(self, state: SurveyState, graph: SurveyGraph, question: CompiledQuestion, option_id: str,
+                      comment: str, new_message: bool) -> Transition:
+        """Сохранить комментарий к варианту и перейти дальше или запросить следующий"""
+        answer = state.answers.get(question.id)
+
+        if question.type == QuestionType.SINGLE_CHOICE:
+            if isinstance(answer, dict) and "option" in answer:
+                answer = {**answer, "comment": comment}
+            else:
+                answer = {"option": option_id, "comment": comment}
+            store_answer(state, question, answer)
+            return self._advance(graph, state)
+
+        selected = self._get_selections(graph, state)
+        if isinstance(answer, dict) and "options" in answer:
+            answer = {**answer, "comments": {**answer.get("comments", {}), option_id: comment}}
+        else:
+            answer = {"options": selected, "comments": {option_id: comment}}
+        store_answer(state, question, answer)
+        state.waiting_for_comment = None
+        state.comment_question = None
+
+        comments = answer["comments"]
+        for selected_id in selected:
+            if selected_id in question.comment_option_ids and selected_id not in comments:
+                return self._ask_comment(state, question, selected_id, new_message=new_message)
+
+        state.selection_mask = 0
+        return self._advance(graph, state)
+
+    def _ask_comment(self, state: SurveyState, question: CompiledQuestion, option_id: str,
+                     new_message: bool = False) -> Transition:
+        """Запросить комментарий к варианту"""
+        option = question.options_by_id[option_id]
+        prompt = option.comment_question or DEFAULT_COMMENT_QUESTION
+        self.survey_manager.mark_dirty(state.user_id)
+        state.waiting_for_comment = option.id
+        state.comment_question = prompt
+        return Transition(
+            Action.ASK_COMMENT, question_id=question.id, option_id=option.id, prompt=prompt,
+            comment_required=option.comment_required, new_message=new_message,
+        )
+
+    def _advance(self, graph: SurveyGraph, state: SurveyState) -> Transition:
+        """Перейти к следующему вопросу"""
+        self.survey_manager.mark_dirty(state.user_id)
+        state.current_question = graph.get_next_question(state.current_question)
+        state.waiting_for_comment = None
+        state.comment_question = None
+        return self._show_current(graph, state)
+
+    def _show_current(self, graph: SurveyGraph, state: SurveyState) -> Transition:
+        question = graph.questions.get(state.current_question)
+        if question is None:
+            # Конец опроса или вопроса нет в графе (ошибка в next) - дальше спрашивать нечего
+            return _COMPLETE
+        transition = self._show_question.get(question.id)
+        if transition is None:
+            transition = self._show_question[question.id] = Transition(Action.SEND_QUESTION, question_id=question.id)
+        return transition
+
+    def _get_selections(self, graph: SurveyGraph, state: SurveyState) -> List[str]:
+        """Выбранные варианты текущего вопроса (в порядке вариантов)"""
+        mask = state.selection_mask
+        question = graph.questions.get(state.current_question)
+        if not mask or question is None:
+            return []
+        return [option.id for option in question.options if mask & option.bit]
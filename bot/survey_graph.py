@@ -0,0 +1,155 @@
+"""
+Скомпилированный граф опроса - неизменяемое представление survey_config.json
+
+Один граф используют все сессии версии опроса, поэтому словари в нем доступны
+только для чтения (MappingProxyType).
+"""
+
+import sys
+from dataclasses import dataclass, fields
+from enum import Enum
+from types import MappingProxyType
+from typing import Any, Dict, FrozenSet, Mapping, Optional, Tuple
+
+class QuestionType(Enum):
+    """Типы вопросов"""
+    TEXT = "text"
+    SINGLE_CHOICE = "single_choice"
+    MULTI_CHOICE = "multi_choice"
+
+# Идентификатор конца опроса в цепочке next
+COMPLETED = "completed"
+
+DEFAULT_COMMENT_QUESTION = "Укажите дополнительную информацию:"
+
+class _ReadOnlyMappings:
+    """Словари из _mapping_fields оборачиваются в MappingProxyType при создании"""
+
+    _mapping_fields: Tuple[str, ...] = ()
+
+    def __post_init__(self):
+        for name in self._mapping_fields:
+            value = getattr(self, name)
+            if not isinstance(value, MappingProxyType):
+                object.__setattr__(self, name, MappingProxyType(dict(value)))
+
+    def __reduce__(self):
+        # mappingproxy не сериализуется pickle - передаем обычные словари
+        # (граф передается процессам BulkProcessor и записывается в файл снимка)
+        return (self.__class__, tuple(
+            dict(value) if isinstance(value, MappingProxyType) else value
+            for value in (getattr(self, field.name) for field in fields(self))
+        ))
+
+@dataclass(frozen=True)
+class CompiledOption:
+    """Вариант ответа"""
+    id: str
+    index: int
+    bit: int
+    text: str
+    # Текст для таблицы: display_text, если задан, иначе text
+    display_text: str
+    comment_required: bool
+    comment_type: str
+    comment_question: Optional[str]
+
+@dataclass(frozen=True)
+class CompiledQuestion(_ReadOnlyMappings):
+    """Вопрос с предвычисленными индексами вариантов"""
+    _mapping_fields = ("options_by_id",)
+
+    id: str
+    index: int
+    text: str
+    type: QuestionType
+    validation: Optional[str]
+    next: str
+    options: Tuple[CompiledOption, ...]
+    options_by_id: Mapping[str, CompiledOption]
+    option_ids: Tuple[str, ...]
+    valid_option_ids: FrozenSet[str]
+    # ID вариантов, для которых запрашивается комментарий
+    comment_option_ids: FrozenSet[str]
+
+    def get_option(self, option_id: str) -> Optional[CompiledOption]:
+        """Получить вариант по ID"""
+        return self.options_by_id.get(option_id)
+
+    def get_display_text(self, option_id: str) -> str:
+        """Получить текст варианта для таблицы"""
+        option = self.options_by_id.get(option_id)
+        return option.display_text if option is not None else ""
+
+@dataclass(frozen=True)
+class SurveyGraph(_ReadOnlyMappings):
+    """Граф опроса: вопросы по ID в порядке конфигурации"""
+    _mapping_fields = ("questions",)
+
+    questions: Mapping[str, CompiledQuestion]
+    question_ids: Tuple[str, ...]
+    first_question: Optional[str]
+
+    def get_question(self, question_id: str) -> Optional[CompiledQuestion]:
+        """Получить вопрос по ID"""
+        return self.questions.get(question_id)
+
+    def get_next_question(self, question_id: str) -> str:
+        """Получить ID следующего вопроса"""
+        question = self.questions.get(question_id)
+        return question.next if question is not None else COMPLETED
+
+def _parse_question_type(type_str: str) -> QuestionType:
+    try:
+        return QuestionType(type_str)
+    except ValueError:
+        return QuestionType.TEXT
+
+def compile_survey(config: Dict[str, Any]) -> SurveyGraph:
+    """Скомпилировать конфигурацию опроса в граф"""
+    questions: Dict[str, CompiledQuestion] = {}
+
+    for question_index, (question_id, question_data) in enumerate(config.get("questions", {}).items()):
+        question_id = sys.intern(question_id)
+
+        options = []
+        for option_index, option_data in enumerate(question_data.get("options", [])):
+            text = option_data.get("text", "")
+            options.append(CompiledOption(
+                id=sys.intern(option_data.get("id", "")),
+                index=option_index,
+                bit=1 << option_index,
+                text=text,
+                display_text=option_data.get("display_text", text),
+                comment_required=option_data.get("comment_required", False),
+                comment_type=option_data.get("comment_type", "none"),
+                comment_question=option_data.get("comment_question"),
+            ))
+
+        options_by_id = {}
+        for option in options:
+            # При повторяющихся ID действует первый вариант, как при линейном поиске
+            options_by_id.setdefault(option.id, option)
+
+        questions[question_id] = CompiledQuestion(
+            id=question_id,
+            index=question_index,
+            text=question_data.get("text", ""),
+            type=_parse_question_type(question_data.get("type", "text")),
+            validation=question_data.get("validation"),
+            next=sys.intern(question_data.get("next", COMPLETED)),
+            options=tuple(options),
+            options_by_id=options_by_id,
+            option_ids=tuple(option.id for option in options),
+            valid_option_ids=frozenset(options_by_id),
+            comment_option_ids=frozenset(
+                option.id for option in options_by_id.values() if option.comment_required
+            ),
+        )
+
+    question_ids = tuple(questions)
+    return SurveyGraph(
+        questions=questions,
+        question_ids=question_ids,
+        first_question=question_ids[0] if question_ids else None,
+    )
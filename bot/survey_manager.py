@@ -2,44 +2,265 @@
 Менеджер опроса - управление состоянием и логикой анкеты
 """
 
-import json
-from typing import Dict, List, Any, Optional
-from dataclasses import dataclass, field
-from enum import Enum
+import asyncio
+import uuid
+from types import MappingProxyType
+from typing import Dict, List, Any, Mapping, Optional, Set, Tuple
+from bot.formatting import format_question_answer
+from bot.session_cache import SessionCache
+from bot.survey_snapshot import SurveyConfigRegistry, SurveySnapshot
+from bot.survey_graph import (
+    QuestionType, SurveyGraph, CompiledQuestion, CompiledOption, COMPLETED
+)
 
-class QuestionType(Enum):
-    """Типы вопросов"""
-    TEXT = "text"
-    SINGLE_CHOICE = "single_choice"
-    MULTI_CHOICE = "multi_choice"
-
-@dataclass
 class SurveyState:
-    """Состояние опроса пользователя"""
-    user_id: int
-    current_question: str = "start"
-    answers: Dict[str, Any] = field(default_factory=dict)
-    multi_choice_selections: List[str] = field(default_factory=list)
-    waiting_for_comment: Optional[str] = None
-    comment_question: Optional[str] = None
+    """Состояние опроса пользователя
+    
+    Компактное представление: без __dict__, ID вопросов интернированы,
+    а выборы текущего вопроса с множественным выбором хранятся битовой маской
+    по индексам вариантов в конфигурации. Ответы форматируются для таблицы
+    при сохранении (formatted), а не при завершении анкеты. config_digest - хэш
+    конфигурации опроса, с которой начата сессия (номер версии свой в каждом процессе,
+    а хэш одинаков во всех процессах и после перезапуска). session_id отличает прохождения
+    анкеты одним пользователем (ключ идемпотентности выгрузки).
+    """
+    
+    __slots__ = (
+        "user_id", "current_question", "answers", "selection_mask",
+        "waiting_for_comment", "comment_question", "formatted", "config_digest", "session_id",
+    )
+    
+    def __init__(self, user_id: int, current_question: str = "start",
+                 answers: Optional[Dict[str, Any]] = None, selection_mask: int = 0,
+                 waiting_for_comment: Optional[str] = None, comment_question: Optional[str] = None,
+                 formatted: Optional[Dict[str, str]] = None, config_digest: str = "",
+                 session_id: Optional[str] = None):
+        self.user_id = user_id
+        self.current_question = current_question
+        self.answers = answers if answers is not None else {}
+        # Ответы в виде ячеек таблицы по ID вопроса
+        self.formatted = formatted if formatted is not None else {}
+        self.config_digest = config_digest
+        self.session_id = session_id if session_id is not None else uuid.uuid4().hex
+        self.selection_mask = selection_mask
+        self.waiting_for_comment = waiting_for_comment
+        self.comment_question = comment_question
+    
+    def __repr__(self) -> str:
+        return (f"SurveyState(user_id={self.user_id!r}, current_question={self.current_question!r}, "
+                f"answers={self.answers!r}, selection_mask={self.selection_mask:#b}, "
+                f"waiting_for_comment={self.waiting_for_comment!r})")
+
+def store_answer(state: SurveyState, question: CompiledQuestion, answer: Any):
+    """Записать ответ на вопрос и сразу отформатировать его для таблицы"""
+    state.answers[question.id] = answer
+    state.formatted[question.id] = format_question_answer(question, answer)
+
+# Пустое представление ответов для пользователя без состояния
+_EMPTY_ANSWERS: Mapping[str, Any] = MappingProxyType({})
 
 class SurveyManager:
     """Менеджер опроса"""
     
-    def __init__(self, config_file: str = "survey_config.json"):
-        self.config = self._load_config(config_file)
-        self.states: Dict[int, SurveyState] = {}
+    def __init__(self, config_file: str = "survey_config.json", state_store=None,
+                 max_sessions: int = 50000, session_ttl: Optional[float] = 3 * 24 * 3600,
+                 spill_store=None, config_registry: Optional[SurveyConfigRegistry] = None):
+        from bot.state_store import MemoryStateStore
+        
+        # Версии конфигурации опроса; файл можно перезагрузить без перезапуска бота
+        self.config_registry = config_registry if config_registry is not None else SurveyConfigRegistry(config_file)
+        # Локальный кэш состояний поверх хранилища, ограниченный по размеру и времени простоя
+        self.states: SessionCache[SurveyState] = SessionCache(
+            max_entries=max_sessions, ttl=session_ttl, on_evict=self._on_session_evicted
+        )
+        self.state_store = state_store if state_store is not None else MemoryStateStore()
+        # Вытесненная сессия остается в общем хранилище: без своего времени жизни
+        # хранилище удаляет записи через session_ttl
+        if self.state_store.shared and self.state_store.ttl is None and session_ttl:
+            self.state_store.ttl = session_ttl
+        # Хранилище для вытесненных сессий (например, SQLite), чтобы их можно было продолжить
+        self.spill_store = spill_store
+        # Пользователи, чье состояние изменено в рамках текущего обновления
+        self._dirty: Set[int] = set()
+        # Общее хранилище: пользователи без сохраненного состояния (до конца обновления
+        # не перечитываются) и записи, отложенные до сохранения в конце обновления
+        self._absent: Set[int] = set()
+        self._pending_saves: Dict[int, SurveyState] = {}
+        self._pending_deletes: Set[int] = set()
+    
+    @property
+    def config(self) -> Dict[str, Any]:
+        """Текущая конфигурация опроса"""
+        return self.config_registry.current.config
+    
+    @property
+    def graph(self) -> SurveyGraph:
+        """Граф текущей версии опроса для O(1) поиска вопросов и вариантов"""
+        return self.config_registry.current.graph
+    
+    def get_state_snapshot(self, state: SurveyState) -> SurveySnapshot:
+        """Версия конфигурации, с которой начата сессия"""
+        return self.config_registry.get_by_digest(state.config_digest)
     
-    def _load_config(self, config_file: str) -> Dict[str, Any]:
-        """Загрузить конфигурацию опроса"""
-        with open(config_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
+    def get_user_snapshot(self, user_id: int) -> SurveySnapshot:
+        """Версия конфигурации пользователя (для нового пользователя - текущая)"""
+        state = self._peek_state(user_id)
+        if state is None:
+            return self.config_registry.current
+        return self.config_registry.get_by_digest(state.config_digest)
+    
+    def get_user_graph(self, user_id: int) -> SurveyGraph:
+        """Граф опроса той версии, по которой пользователь проходит анкету"""
+        return self.get_user_snapshot(user_id).graph
+    
+    def _graph_for(self, state: SurveyState) -> SurveyGraph:
+        return self.config_registry.get_by_digest(state.config_digest).graph
+    
+    def intern_question_id(self, question_id: str) -> str:
+        """Получить общий экземпляр строки ID вопроса"""
+        question = self.graph.questions.get(question_id)
+        return question.id if question is not None else question_id
+    
+    def _on_session_evicted(self, user_id: int, state: SurveyState):
+        """Обработать вытеснение сессии из кэша"""
+        if user_id in self._dirty:
+            self._dirty.discard(user_id)
+            if self.state_store.shared:
+                # Запись в общее хранилище - при сохранении в конце обновления, не в event loop
+                self._pending_saves[user_id] = state
+            else:
+                self.state_store.save(state)
+        # В общем хранилище запись удаляется по истечении его ttl (по умолчанию session_ttl),
+        # локальное - очищаем
+        if not self.state_store.shared:
+            self.state_store.delete(user_id)
+            if self.spill_store is not None:
+                self.spill_store.save(state)
+    
+    def _peek_state(self, user_id: int) -> Optional[SurveyState]:
+        """Получить состояние пользователя, не создавая новое"""
+        state = self.states.get(user_id)
+        if state is None:
+            # Вытесненная в ходе обновления сессия еще не записана в хранилище
+            state = self._pending_saves.pop(user_id, None)
+            if state is not None:
+                self._dirty.add(user_id)
+                self.states[user_id] = state
+                return state
+            if user_id in self._absent:
+                return None
+            state = self.state_store.load(user_id)
+            if state is None and self.spill_store is not None:
+                state = self.spill_store.load(user_id)
+                if state is not None:
+                    self.spill_store.delete(user_id)
+                    self._dirty.add(user_id)
+            if state is not None:
+                self.states[user_id] = state
+        return state
     
     def get_user_state(self, user_id: int) -> SurveyState:
         """Получить состояние пользователя"""
-        if user_id not in self.states:
-            self.states[user_id] = SurveyState(user_id=user_id)
-        return self.states[user_id]
+        state = self._peek_state(user_id)
+        if state is None:
+            state = SurveyState(user_id=user_id, config_digest=self.config_registry.current.digest)
+            self.states[user_id] = state
+            self._absent.discard(user_id)
+        return state
+    
+    def peek_user_state(self, user_id: int) -> Optional[SurveyState]:
+        """Получить состояние пользователя, если оно есть (без создания нового)"""
+        return self._peek_state(user_id)
+    
+    def mark_dirty(self, user_id: int):
+        """Отметить состояние пользователя как измененное в рамках текущего обновления"""
+        self._dirty.add(user_id)
+    
+    def get_session_stats(self) -> Dict[str, int]:
+        """Получить счетчики активных и вытесненных сессий"""
+        return {
+            "resident_sessions": len(self.states),
+            "ttl_evictions": self.states.ttl_evictions,
+            "lru_evictions": self.states.lru_evictions,
+            "evictions": self.states.evictions,
+        }
+    
+    def _get_state_for_update(self, user_id: int) -> SurveyState:
+        """Получить состояние пользователя для изменения"""
+        self._dirty.add(user_id)
+        return self.get_user_state(user_id)
+    
+    def begin_update(self, user_id: int):
+        """Подготовить состояние пользователя к обработке обновления"""
+        # Общее хранилище могли изменить другие воркеры - перечитываем один раз за обновление
+        if self.state_store.shared:
+            self.states.pop(user_id, None)
+            self._dirty.discard(user_id)
+            self._absent.discard(user_id)
+    
+    def _take_writes(self, user_id: int) -> Tuple[Optional[SurveyState], bool]:
+        """Забрать отложенную запись пользователя: состояние для сохранения и нужно ли удалить запись"""
+        self._absent.discard(user_id)
+        state = None
+        if user_id in self._dirty:
+            state = self.states.get(user_id)
+            self._dirty.discard(user_id)
+        pending = self._pending_saves.pop(user_id, None)
+        if state is None:
+            state = pending
+        delete = user_id in self._pending_deletes
+        self._pending_deletes.discard(user_id)
+        return state, delete
+    
+    def commit_user_state(self, user_id: int):
+        """Сохранить измененное состояние пользователя в хранилище (одна запись за обновление)"""
+        state, delete = self._take_writes(user_id)
+        if state is not None:
+            self.state_store.save(state)
+        elif delete:
+            self.state_store.delete(user_id)
+    
+    async def begin_update_async(self, user_id: int):
+        """Загрузить состояние пользователя из общего хранилища, не блокируя event loop"""
+        if not self.state_store.shared:
+            return
+        self._dirty.discard(user_id)
+        self._absent.discard(user_id)
+        state = await asyncio.to_thread(self.state_store.load, user_id)
+        if state is None:
+            self.states.pop(user_id, None)
+            # До конца обновления состояние пользователя не перечитывается
+            self._absent.add(user_id)
+        else:
+            self.states[user_id] = state
+    
+    async def commit_user_state_async(self, user_id: int):
+        """Сохранить измененное состояние пользователя, не блокируя event loop"""
+        if not self.state_store.shared:
+            self.commit_user_state(user_id)
+            return
+        state, delete = self._take_writes(user_id)
+        if state is not None:
+            await asyncio.to_thread(self.state_store.save, state)
+        elif delete:
+            await asyncio.to_thread(self.state_store.delete, user_id)
+    
+    def commit_all(self):
+        """Сохранить все измененные состояния одной пакетной записью"""
+        states = dict(self._pending_saves)
+        for user_id in self._dirty:
+            state = self.states.get(user_id)
+            if state is not None:
+                states[user_id] = state
+        deletes = self._pending_deletes - states.keys()
+        self._dirty.clear()
+        self._pending_saves.clear()
+        self._pending_deletes.clear()
+        self._absent.clear()
+        if states:
+            self.state_store.save_many(states.values())
+        for user_id in deletes:
+            self.state_store.delete(user_id)
     
     def get_welcome_message(self) -> str:
         """Получить приветственное сообщение"""
@@ -52,22 +273,24 @@ class SurveyManager:
         """Получить вопрос по ID"""
         return self.config.get("questions", {}).get(question_id)
     
+    def get_compiled_question(self, question_id: str) -> Optional[CompiledQuestion]:
+        """Получить скомпилированный вопрос по ID"""
+        return self.graph.questions.get(question_id)
+    
+    def get_option(self, question_id: str, option_id: str) -> Optional[CompiledOption]:
+        """Получить скомпилированный вариант ответа"""
+        question = self.graph.questions.get(question_id)
+        return question.options_by_id.get(option_id) if question is not None else None
+    
     def get_question_text(self, question_id: str) -> str:
         """Получить текст вопроса"""
-        question = self.get_question(question_id)
-        return question.get("text", "") if question else ""
+        question = self.graph.questions.get(question_id)
+        return question.text if question is not None else ""
     
     def get_question_type(self, question_id: str) -> QuestionType:
         """Получить тип вопроса"""
-        question = self.get_question(question_id)
-        if not question:
-            return QuestionType.TEXT
-        
-        type_str = question.get("type", "text")
-        try:
-            return QuestionType(type_str)
-        except ValueError:
-            return QuestionType.TEXT
+        question = self.graph.questions.get(question_id)
+        return question.type if question is not None else QuestionType.TEXT
     
     def get_question_options(self, question_id: str) -> List[Dict[str, Any]]:
         """Получить варианты ответов для вопроса"""
@@ -76,117 +299,181 @@ class SurveyManager:
     
     def get_next_question(self, question_id: str) -> str:
         """Получить следующий вопрос"""
-        question = self.get_question(question_id)
-        return question.get("next", "completed") if question else "completed"
+        return self.graph.get_next_question(question_id)
     
     def save_answer(self, user_id: int, question_id: str, answer: Any):
-        """Сохранить ответ пользователя"""
-        state = self.get_user_state(user_id)
-        state.answers[question_id] = answer
+        """Сохранить ответ пользователя и сразу отформатировать его для таблицы"""
+        state = self._get_state_for_update(user_id)
+        question = self._graph_for(state).questions.get(question_id)
+        if question is None:
+            state.answers[question_id] = answer
+            return
+        store_answer(state, question, answer)
     
     def save_multi_choice_selection(self, user_id: int, option_id: str, selected: bool):
         """Сохранить выбор в множественном выборе"""
-        state = self.get_user_state(user_id)
-        if selected and option_id not in state.multi_choice_selections:
-            state.multi_choice_selections.append(option_id)
-        elif not selected and option_id in state.multi_choice_selections:
-            state.multi_choice_selections.remove(option_id)
+        state = self._get_state_for_update(user_id)
+        question = self._graph_for(state).questions.get(state.current_question)
+        option = question.options_by_id.get(option_id) if question is not None else None
+        if option is None:
+            return
+        if selected:
+            state.selection_mask |= option.bit
+        else:
+            state.selection_mask &= ~option.bit
+    
+    def toggle_multi_choice_selection(self, user_id: int, option_id: str) -> int:
+        """Переключить выбор варианта текущего вопроса и вернуть новую битовую маску"""
+        state = self._get_state_for_update(user_id)
+        question = self._graph_for(state).questions.get(state.current_question)
+        option = question.options_by_id.get(option_id) if question is not None else None
+        if option is not None:
+            state.selection_mask ^= option.bit
+        return state.selection_mask
+    
+    def is_option_selected(self, user_id: int, option_id: str) -> bool:
+        """Проверить, выбран ли вариант текущего вопроса"""
+        state = self._peek_state(user_id)
+        if state is None or not state.selection_mask:
+            return False
+        question = self._graph_for(state).questions.get(state.current_question)
+        option = question.options_by_id.get(option_id) if question is not None else None
+        return option is not None and bool(state.selection_mask & option.bit)
     
     def get_multi_choice_selections(self, user_id: int) -> List[str]:
-        """Получить текущие выборы множественного выбора"""
-        state = self.get_user_state(user_id)
-        return state.multi_choice_selections.copy()
+        """Получить текущие выборы множественного выбора (в порядке вариантов)"""
+        state = self._peek_state(user_id)
+        if state is None or not state.selection_mask:
+            return []
+        mask = state.selection_mask
+        question = self._graph_for(state).questions.get(state.current_question)
+        if question is None:
+            return []
+        return [option.id for option in question.options if mask & option.bit]
+    
+    def get_multi_choice_mask(self, user_id: int) -> int:
+        """Получить битовую маску выборов текущего вопроса"""
+        state = self._peek_state(user_id)
+        return state.selection_mask if state else 0
     
     def clear_multi_choice_selections(self, user_id: int):
         """Очистить выборы множественного выбора"""
-        state = self.get_user_state(user_id)
-        state.multi_choice_selections.clear()
+        state = self._get_state_for_update(user_id)
+        state.selection_mask = 0
     
     def set_waiting_for_comment(self, user_id: int, option_id: str, comment_question: str):
         """Установить ожидание комментария"""
-        state = self.get_user_state(user_id)
+        state = self._get_state_for_update(user_id)
         state.waiting_for_comment = option_id
         state.comment_question = comment_question
     
     def clear_waiting_for_comment(self, user_id: int):
         """Очистить ожидание комментария"""
-        state = self.get_user_state(user_id)
+        state = self._get_state_for_update(user_id)
         state.waiting_for_comment = None
         state.comment_question = None
     
     def is_waiting_for_comment(self, user_id: int) -> bool:
         """Проверить, ожидается ли комментарий"""
-        state = self.get_user_state(user_id)
-        return state.waiting_for_comment is not None
+        state = self._peek_state(user_id)
+        return state is not None and state.waiting_for_comment is not None
     
     def get_comment_question(self, user_id: int) -> Optional[str]:
         """Получить вопрос для комментария"""
-        state = self.get_user_state(user_id)
-        return state.comment_question
+        state = self._peek_state(user_id)
+        return state.comment_question if state else None
     
     def get_waiting_option_id(self, user_id: int) -> Optional[str]:
         """Получить ID опции, для которой ожидается комментарий"""
-        state = self.get_user_state(user_id)
-        return state.waiting_for_comment
+        state = self._peek_state(user_id)
+        return state.waiting_for_comment if state else None
     
     def move_to_next_question(self, user_id: int):
         """Перейти к следующему вопросу"""
-        state = self.get_user_state(user_id)
-        state.current_question = self.get_next_question(state.current_question)
+        state = self._get_state_for_update(user_id)
+        state.current_question = self._graph_for(state).get_next_question(state.current_question)
         state.waiting_for_comment = None
         state.comment_question = None
     
     def get_current_question(self, user_id: int) -> str:
         """Получить текущий вопрос"""
-        state = self.get_user_state(user_id)
-        return state.current_question
+        state = self._peek_state(user_id)
+        return state.current_question if state else "start"
     
     def set_current_question(self, user_id: int, question_id: str):
         """Установить текущий вопрос"""
-        state = self.get_user_state(user_id)
-        state.current_question = question_id
+        state = self._get_state_for_update(user_id)
+        question = self._graph_for(state).questions.get(question_id)
+        state.current_question = question.id if question is not None else question_id
     
     def is_survey_completed(self, user_id: int) -> bool:
         """Проверить, завершен ли опрос"""
-        state = self.get_user_state(user_id)
-        return state.current_question == "completed"
+        state = self._peek_state(user_id)
+        return state is not None and state.current_question == COMPLETED
+    
+    def get_answer(self, user_id: int, question_id: str, default: Any = None) -> Any:
+        """Получить ответ на один вопрос (без копирования ответов)"""
+        state = self._peek_state(user_id)
+        return state.answers.get(question_id, default) if state else default
+    
+    def get_answers_view(self, user_id: int) -> Mapping[str, Any]:
+        """Получить ответы пользователя только для чтения (без копирования)"""
+        state = self._peek_state(user_id)
+        return MappingProxyType(state.answers) if state else _EMPTY_ANSWERS
     
     def get_all_answers(self, user_id: int) -> Dict[str, Any]:
-        """Получить все ответы пользователя"""
-        state = self.get_user_state(user_id)
-        return state.answers.copy()
+        """Получить копию всех ответов пользователя (для передачи за пределы процесса)"""
+        state = self._peek_state(user_id)
+        return state.answers.copy() if state else {}
+    
+    def get_formatted_answers(self, user_id: int) -> Mapping[str, str]:
+        """Получить ответы пользователя, отформатированные для таблицы (только для чтения)"""
+        state = self._peek_state(user_id)
+        if state is None:
+            return _EMPTY_ANSWERS
+        formatted = state.formatted
+        if len(formatted) < len(state.answers):
+            # Состояние сохранено до появления formatted - форматируем недостающие ответы
+            graph = self._graph_for(state)
+            for question_id, answer in state.answers.items():
+                question = graph.questions.get(question_id)
+                if question is not None and question_id not in formatted:
+                    formatted[question.id] = format_question_answer(question, answer)
+        return MappingProxyType(formatted)
+    
+    def get_session_key(self, user_id: int) -> Optional[str]:
+        """Ключ прохождения анкеты: одинаков при повторной отправке той же анкеты"""
+        state = self._peek_state(user_id)
+        return f"{user_id}:{state.session_id}" if state is not None else None
     
     def clear_user_state(self, user_id: int):
         """Очистить состояние пользователя"""
-        if user_id in self.states:
-            del self.states[user_id]
+        self.states.pop(user_id, None)
+        self._dirty.discard(user_id)
+        if self.state_store.shared:
+            # Запись в общем хранилище удаляется при сохранении в конце обновления, не в event loop
+            self._pending_saves.pop(user_id, None)
+            self._pending_deletes.add(user_id)
+            self._absent.add(user_id)
+        else:
+            self.state_store.delete(user_id)
     
     def get_option_requires_comment(self, question_id: str, option_id: str) -> bool:
         """Проверить, требует ли опция комментария"""
-        options = self.get_question_options(question_id)
-        for option in options:
-            if option.get("id") == option_id:
-                return option.get("comment_required", False)
-        return False
+        option = self.get_option(question_id, option_id)
+        return option.comment_required if option is not None else False
     
     def get_option_comment_type(self, question_id: str, option_id: str) -> str:
         """Получить тип комментария для опции"""
-        options = self.get_question_options(question_id)
-        for option in options:
-            if option.get("id") == option_id:
-                return option.get("comment_type", "none")
-        return "none"
+        option = self.get_option(question_id, option_id)
+        return option.comment_type if option is not None else "none"
     
     def get_option_comment_question(self, question_id: str, option_id: str) -> Optional[str]:
         """Получить вопрос для комментария опции"""
-        options = self.get_question_options(question_id)
-        for option in options:
-            if option.get("id") == option_id:
-                return option.get("comment_question")
-        return None
+        option = self.get_option(question_id, option_id)
+        return option.comment_question if option is not None else None
     
     def get_question_validation(self, question_id: str) -> Optional[str]:
         """Получить тип валидации для вопроса"""
-        question = self.get_question(question_id)
-        return question.get("validation") if question else None
-
+        question = self.graph.questions.get(question_id)
+        return question.validation if question is not None else None
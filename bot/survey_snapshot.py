@@ -0,0 +1,234 @@
+"""
+Версии конфигурации опроса с перезагрузкой без перезапуска
+
+survey_config.json компилируется в неизменяемый SurveySnapshot. При изменении файла
+(проверка mtime) или по сигналу SIGHUP новая версия компилируется в отдельном потоке,
+а затем одной операцией становится текущей. Сессии хранят хэш содержимого версии,
+с которой начались, и проходят опрос до конца по ней.
+
+Перед компиляцией конфигурация проверяется (bot.config_lint): файл с ошибкой не
+становится текущей версией. Проверенный снимок можно записать в файл (pickle) и
+загружать его без разбора JSON, проверки и компиляции, пока не изменился исходный файл.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import pickle
+import signal
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from typing import Any, Dict, Optional, Set
+
+from bot.callback_data import Callback, CallbackCodec
+from bot.config_lint import lint_survey_config
+from bot.survey_graph import SurveyGraph, compile_survey
+
+logger = logging.getLogger(__name__)
+
+# Версия формата файла скомпилированной конфигурации
+ARTIFACT_FORMAT = 1
+
+@dataclass(frozen=True)
+class SurveySnapshot:
+    """Скомпилированная версия конфигурации опроса"""
+    version: int
+    config: Dict[str, Any]
+    graph: SurveyGraph
+    codec: CallbackCodec
+    # Хэш содержимого файла: повторная загрузка без изменений не создает новую версию
+    digest: str
+
+def compile_snapshot(config: Dict[str, Any], version: int, digest: str = "") -> SurveySnapshot:
+    """Проверить и скомпилировать конфигурацию опроса в снимок"""
+    lint_survey_config(config)
+    graph = compile_survey(config)
+    return SurveySnapshot(version=version, config=config, graph=graph, codec=CallbackCodec(graph), digest=digest)
+
+def load_snapshot(config_file: str, version: int, artifact_file: Optional[str] = None) -> SurveySnapshot:
+    """Прочитать и скомпилировать файл конфигурации
+
+    Если artifact_file записан для того же содержимого файла, снимок берется из него.
+    """
+    with open(config_file, 'rb') as f:
+        payload = f.read()
+    digest = hashlib.sha1(payload).hexdigest()
+    if artifact_file:
+        snapshot = read_snapshot_artifact(artifact_file, digest)
+        if snapshot is not None:
+            return replace(snapshot, version=version)
+    config = json.loads(payload.decode('utf-8'))
+    return compile_snapshot(config, version, digest)
+
+def write_snapshot_artifact(snapshot: SurveySnapshot, artifact_file: str) -> int:
+    """Записать проверенный снимок в файл и вернуть его размер в байтах"""
+    payload = pickle.dumps((ARTIFACT_FORMAT, snapshot.digest, snapshot), protocol=pickle.HIGHEST_PROTOCOL)
+    # Запись через временный файл: бот не прочитает файл наполовину записанным
+    temp_file = artifact_file + ".tmp"
+    with open(temp_file, 'wb') as f:
+        f.write(payload)
+    os.replace(temp_file, artifact_file)
+    return len(payload)
+
+def read_snapshot_artifact(artifact_file: str, digest: str) -> Optional[SurveySnapshot]:
+    """Прочитать снимок из файла; None, если файла нет или он записан для другой конфигурации
+
+    Файл загружается через pickle - используйте только файлы, записанные write_snapshot_artifact.
+    """
+    try:
+        with open(artifact_file, 'rb') as f:
+            artifact_format, artifact_digest, snapshot = pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Не удалось прочитать {artifact_file}, конфигурация будет скомпилирована: {e}")
+        return None
+    if artifact_format != ARTIFACT_FORMAT or artifact_digest != digest:
+        return None
+    return snapshot
+
+class SurveyConfigRegistry:
+    """Текущая версия конфигурации опроса и предыдущие версии для начатых сессий"""
+
+    def __init__(self, config_file: str = "survey_config.json", max_versions: int = 16,
+                 snapshot: Optional[SurveySnapshot] = None, artifact_file: Optional[str] = None):
+        self.config_file = config_file
+        # Скомпилированная конфигурация для быстрой загрузки (используется, пока совпадает хэш файла)
+        self.artifact_file = artifact_file
+        # Сколько версий хранится для сессий, начатых до перезагрузки
+        self.max_versions = max_versions
+        self._snapshots: "OrderedDict[int, SurveySnapshot]" = OrderedDict()
+        self._by_tag: Dict[str, SurveySnapshot] = {}
+        self._by_digest: Dict[str, SurveySnapshot] = {}
+        self._install_lock = threading.Lock()
+        self._reload_lock: Optional[asyncio.Lock] = None
+        # Задачи перезагрузки по SIGHUP: без ссылки задачу может удалить сборщик мусора
+        self._signal_tasks: Set[asyncio.Task] = set()
+        self._mtime = self._get_mtime()
+        self._current = snapshot if snapshot is not None else load_snapshot(config_file, 1, artifact_file)
+        self._install(self._current)
+
+        # Счетчики для мониторинга
+        self.reload_count = 0
+        self.failed_reload_count = 0
+
+    @property
+    def current(self) -> SurveySnapshot:
+        """Текущая версия (для новых сессий)"""
+        return self._current
+
+    def get(self, version: int) -> SurveySnapshot:
+        """Версия по номеру (номера действуют только в этом процессе); если не хранится - текущая"""
+        current = self._current
+        if version == current.version:
+            return current
+        return self._snapshots.get(version, current)
+
+    def get_by_digest(self, digest: str) -> SurveySnapshot:
+        """Версия, с которой начата сессия, по хэшу содержимого; если она не загружена - текущая
+
+        Хэш, в отличие от номера версии, одинаков во всех процессах и после перезапуска.
+        """
+        current = self._current
+        if digest == current.digest:
+            return current
+        return self._by_digest.get(digest, current)
+
+    def decode_callback(self, data: Optional[str], version: int) -> Optional[Callback]:
+        """Разобрать callback_data кнопки, отправленной в версии version или любой другой хранимой"""
+        callback = self.get(version).codec.decode(data)
+        if callback is None and data:
+            snapshot = self._by_tag.get(data[:3])
+            if snapshot is not None:
+                callback = snapshot.codec.decode(data)
+        return callback
+
+    def reload(self) -> bool:
+        """Перечитать файл и сделать новую версию текущей; False, если файл не изменился или с ошибкой"""
+        return self._install_next(self._compile_next())
+
+    async def reload_async(self) -> bool:
+        """Перечитать файл, компилируя новую версию вне event loop"""
+        if self._reload_lock is None:
+            self._reload_lock = asyncio.Lock()
+        async with self._reload_lock:
+            return self._install_next(await asyncio.to_thread(self._compile_next))
+
+    async def reload_if_changed(self) -> bool:
+        """Перезагрузить конфигурацию, если у файла изменилось время модификации"""
+        if self._get_mtime() == self._mtime:
+            return False
+        return await self.reload_async()
+
+    async def watch(self, interval: float = 5.0):
+        """Следить за файлом конфигурации (запускается фоновой задачей)"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.reload_if_changed()
+            except Exception as e:
+                logger.error(f"Ошибка при проверке конфигурации опроса: {e}")
+
+    def install_signal_handler(self, loop: Optional[asyncio.AbstractEventLoop] = None) -> bool:
+        """Перезагружать конфигурацию по SIGHUP; False, если сигналы недоступны"""
+        loop = loop or asyncio.get_running_loop()
+        try:
+            loop.add_signal_handler(signal.SIGHUP, self._on_sighup, loop)
+        except (AttributeError, NotImplementedError, RuntimeError, ValueError):
+            # Windows или не главный поток
+            return False
+        return True
+
+    def _on_sighup(self, loop: asyncio.AbstractEventLoop):
+        task = loop.create_task(self.reload_async())
+        self._signal_tasks.add(task)
+        task.add_done_callback(self._signal_tasks.discard)
+
+    def _get_mtime(self) -> Optional[float]:
+        try:
+            return os.stat(self.config_file).st_mtime
+        except OSError:
+            return None
+
+    def _compile_next(self) -> Optional[SurveySnapshot]:
+        """Скомпилировать следующую версию (вызывается в отдельном потоке)"""
+        mtime = self._get_mtime()
+        # Время модификации запоминается и при ошибке: файл с ошибкой не перечитывается
+        # при каждой проверке, а только после следующего изменения (или по SIGHUP)
+        self._mtime = mtime
+        try:
+            snapshot = load_snapshot(self.config_file, self._current.version + 1, self.artifact_file)
+        except Exception as e:
+            # Ошибка в файле не должна останавливать опрос - продолжаем с текущей версией
+            self.failed_reload_count += 1
+            logger.error(f"Конфигурация опроса не перезагружена, остается версия {self._current.version}: {e}")
+            return None
+        return snapshot
+
+    def _install_next(self, snapshot: Optional[SurveySnapshot]) -> bool:
+        if snapshot is None or snapshot.digest == self._current.digest:
+            return False
+        with self._install_lock:
+            if snapshot.version <= self._current.version:
+                snapshot = compile_snapshot(snapshot.config, self._current.version + 1, snapshot.digest)
+            self._install(snapshot)
+            # Новые сессии начинаются с новой версии, начатые - продолжают со своей
+            self._current = snapshot
+        self.reload_count += 1
+        logger.info(f"Конфигурация опроса перезагружена: версия {snapshot.version}")
+        return True
+
+    def _install(self, snapshot: SurveySnapshot):
+        self._snapshots[snapshot.version] = snapshot
+        self._by_tag[snapshot.codec.tag] = snapshot
+        if snapshot.digest:
+            self._by_digest[snapshot.digest] = snapshot
+        while len(self._snapshots) > self.max_versions:
+            _, expired = self._snapshots.popitem(last=False)
+            if self._by_tag.get(expired.codec.tag) is expired:
+                del self._by_tag[expired.codec.tag]
+            if self._by_digest.get(expired.digest) is expired:
+                del self._by_digest[expired.digest]
@@ -0,0 +1,80 @@
+"""
+Параллельная обработка обновлений с сохранением порядка для каждого пользователя
+"""
+
+import asyncio
+from typing import Any, Awaitable, Dict, Optional
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Обновления разных пользователей обрабатываются параллельно, одного пользователя - по очереди
+
+    Без этого двойное нажатие кнопки множественного выбора или повторная отправка
+    ответа могли бы одновременно менять одно и то же состояние опроса.
+    """
+
+    def __init__(self, max_concurrent_updates: int = 256):
+        super().__init__(max_concurrent_updates)
+        # Блокировки существуют, пока у пользователя есть обновления в обработке
+        self._locks: Dict[int, asyncio.Lock] = {}
+        self._pending: Dict[int, int] = {}
+
+    @staticmethod
+    def get_user_key(update: object) -> Optional[int]:
+        """Ключ очереди: ID пользователя, иначе ID чата; None - обновление без очереди"""
+        if not isinstance(update, Update):
+            return None
+        if update.effective_user is not None:
+            return update.effective_user.id
+        if update.effective_chat is not None:
+            return update.effective_chat.id
+        return None
+
+    @property
+    def active_users(self) -> int:
+        """Количество пользователей с обновлениями в обработке"""
+        return len(self._locks)
+
+    async def process_update(self, update: object, coroutine: "Awaitable[Any]") -> None:  # type: ignore[misc]
+        """Дождаться очереди пользователя, затем занять место среди одновременно обрабатываемых
+
+        В базовом классе семафор берется до do_process_update: обновление, ждущее
+        своей очереди, занимало бы место, и один пользователь с длинной очередью
+        мог бы занять все max_concurrent_updates мест, задерживая остальных.
+        """
+        key = self.get_user_key(update)
+        if key is None:
+            async with self._semaphore:
+                await self.do_process_update(update, coroutine)
+            return
+
+        lock = self._locks.get(key)
+        if lock is None:
+            lock = self._locks[key] = asyncio.Lock()
+        self._pending[key] = self._pending.get(key, 0) + 1
+        try:
+            # asyncio.Lock пропускает ожидающих в порядке очереди, то есть в порядке обновлений
+            async with lock:
+                async with self._semaphore:
+                    await self.do_process_update(update, coroutine)
+        except asyncio.CancelledError:
+            # Отмена во время ожидания очереди: корутина так и не была запущена
+            if asyncio.iscoroutine(coroutine):
+                coroutine.close()
+            raise
+        finally:
+            self._pending[key] -= 1
+            if not self._pending[key]:
+                del self._pending[key]
+                del self._locks[key]
+
+    async def do_process_update(self, update: object, coroutine: "Awaitable[Any]") -> None:
+        await coroutine
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
@@ -0,0 +1,101 @@
+"""
+Реестр валидаторов текстовых ответов
+
+Регулярные выражения компилируются один раз при импорте, а таблица валидаторов
+строится один раз из validation_types в survey_config.json. Собственные проверки
+добавляются через ValidatorRegistry.register().
+"""
+
+import logging
+import re
+from typing import Callable, Dict, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+# Валидатор получает текст ответа и возвращает True, если он корректен
+Validator = Callable[[str], bool]
+
+_EMAIL_RE = re.compile(r'[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}')
+_PHONE_SEPARATORS_RE = re.compile(r'[\s\(\)\-\+]')
+# Один класс символов без вложенных повторений - проверка за линейное время
+# Цифры и двоеточия, хотя бы по одному. Две ветки не пересекаются (первый символ - цифра
+# или двоеточие), и в каждой нет вложенных повторений - проверка за один линейный проход
+_CADASTRAL_RE = re.compile(r'\d+:[\d:]*|:+\d[\d:]*')
+
+def validate_email(value: str) -> bool:
+    """Валидация email адреса"""
+    return _EMAIL_RE.fullmatch(value.strip()) is not None
+
+def validate_phone(value: str) -> bool:
+    """Валидация номера телефона: 10-15 цифр без пробелов, скобок, дефисов и плюсов"""
+    cleaned_phone = _PHONE_SEPARATORS_RE.sub('', value)
+    return 10 <= len(cleaned_phone) <= 15 and cleaned_phone.isdigit()
+
+def validate_number(value: str) -> bool:
+    """Валидация числового значения (поддерживает десятичные числа)"""
+    try:
+        float(value)
+        return True
+    except ValueError:
+        return False
+
+def validate_full_name(value: str) -> bool:
+    """Валидация ФИО (минимум 3 слова)"""
+    return len(value.split()) >= 3
+
+def validate_telegram_username(value: str) -> bool:
+    """Валидация имени в Telegram (обязательно @)"""
+    return '@' in value
+
+def validate_cadastral_number(value: str) -> bool:
+    """Валидация кадастрового номера (только цифры и двоеточия, хотя бы по одному)"""
+    return _CADASTRAL_RE.fullmatch(value.strip()) is not None
+
+BUILTIN_VALIDATORS: Dict[str, Validator] = {
+    "email": validate_email,
+    "phone": validate_phone,
+    "number": validate_number,
+    "full_name": validate_full_name,
+    "telegram_username": validate_telegram_username,
+    "cadastral_number": validate_cadastral_number,
+}
+
+class ValidatorRegistry:
+    """Таблица валидаторов по типу валидации"""
+
+    def __init__(self, validators: Optional[Dict[str, Validator]] = None):
+        self._validators: Dict[str, Validator] = dict(BUILTIN_VALIDATORS if validators is None else validators)
+
+    @classmethod
+    def from_config(cls, validation_types: Iterable[str],
+                    custom_validators: Optional[Dict[str, Validator]] = None) -> "ValidatorRegistry":
+        """Построить таблицу для типов из validation_types конфигурации опроса"""
+        available = dict(BUILTIN_VALIDATORS)
+        if custom_validators:
+            available.update(custom_validators)
+
+        validators = {}
+        for validation_type in validation_types:
+            validator = available.get(validation_type)
+            if validator is None:
+                # Как и раньше, ответ с неизвестным типом валидации считается корректным
+                logger.warning(f"Нет валидатора для типа '{validation_type}', проверка пропускается")
+                continue
+            validators[validation_type] = validator
+        return cls(validators)
+
+    def register(self, validation_type: str, validator: Validator):
+        """Добавить или заменить валидатор"""
+        self._validators[validation_type] = validator
+
+    def get(self, validation_type: str) -> Optional[Validator]:
+        """Получить валидатор по типу"""
+        return self._validators.get(validation_type)
+
+    def __contains__(self, validation_type: str) -> bool:
+        return validation_type in self._validators
+
+    def validate(self, validation_type: str, value: str) -> bool:
+        """Проверить значение; неизвестный тип валидации ничего не ограничивает"""
+        validator = self._validators.get(validation_type)
+        return validator(value) if validator is not None else True
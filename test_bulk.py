@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Скрипт для тестирования пакетной обработки сохраненных анкет
+"""
+
+from bot.bulk import BulkProcessor
+from bot.data_processor import DataProcessor
+from bot.survey_manager import SurveyManager
+
+VALID_ANSWERS = {
+    "q1_1": "Иванов Иван Иванович",
+    "q1_2": "@ivanov",
+    "q1_3": "12.5",
+    "q1_4": "Московская область, Дмитровский район",
+    "q1_5": "50:20:0010336:38",
+    "q2_1": "Пашня",
+    "q2_2": {"option": "yes", "comment": ""},
+    "q2_3": {"options": ["q2_3_water", "q2_3_money"], "comments": {}},
+    "q3_1": {"options": ["q3_1_plant"], "comments": {}},
+    "q3_2": {"options": ["q3_2_finance", "q3_2_other"], "comments": {"q3_2_other": "пасека"}},
+    "q3_3": {"option": "maybe", "comment": ""},
+    "q4_1_water": {"option": "yes", "comment": ""},
+    "q4_1_electricity": {"option": "no", "comment": ""},
+    "q4_1_roads": {"option": "yes", "comment": ""},
+    "q4_1_consultation": {"option": "no", "comment": ""},
+    "q4_2": {"option": "yes", "comment": ""},
+    "q5_1": "Нет",
+    "q7_phone": "+7 (912) 345-67-89",
+    "q7_email": "ivanov@mail.ru",
+}
+
+def test_format_matches_data_processor():
+    """Тестирование совпадения форматирования с DataProcessor"""
+    processor = BulkProcessor.from_config_file()
+    manager = SurveyManager()
+    for question_id, answer in VALID_ANSWERS.items():
+        manager.save_answer(1, question_id, answer)
+
+    result = processor.process_one(0, VALID_ANSWERS)
+    assert result.rows == DataProcessor(manager).format_answers_for_sheets(1)
+    assert result.is_valid, result.errors
+
+def test_validation_errors():
+    """Тестирование ошибок проверки"""
+    processor = BulkProcessor.from_config_file()
+    answers = dict(VALID_ANSWERS, q1_5="50-20-0010336-38", q9_9="лишний")
+    del answers["q7_email"]
+
+    errors = {(issue.question_id, issue.message) for issue in processor.process_one(0, answers).errors}
+    assert errors == {
+        ("q1_5", "Не прошел проверку 'cadastral_number'"),
+        ("q7_email", "Нет ответа"),
+        ("q9_9", "Неизвестный вопрос"),
+    }, errors
+
+def test_process_pool():
+    """Тестирование обработки в пуле процессов"""
+    processor = BulkProcessor.from_config_file()
+    records = [VALID_ANSWERS if index % 3 else {} for index in range(40)]
+
+    sequential = list(processor.process(records))
+    parallel = list(processor.process(iter(records), workers=2, chunk_size=7))
+    assert [result.index for result in parallel] == list(range(40))
+    assert parallel == sequential
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Скрипт для тестирования кодировки callback_data
+"""
+
+import json
+
+from bot.callback_data import MAX_CALLBACK_DATA_BYTES, Callback, CallbackAction, CallbackCodec
+from bot.keyboard_builder import KeyboardBuilder
+from bot.survey_graph import compile_survey
+from bot.survey_manager import SurveyManager
+
+def iter_buttons(markup):
+    for row in markup.inline_keyboard:
+        yield from row
+
+def test_keyboard_tokens_roundtrip():
+    """Тестирование токенов в клавиатурах"""
+    manager = SurveyManager()
+    builder = KeyboardBuilder(manager)
+    codec = builder.callback_codec
+
+    assert codec.decode(next(iter_buttons(builder.build_welcome_keyboard())).callback_data) == \
+        Callback(CallbackAction.START_SURVEY)
+
+    single = [button.callback_data for button in iter_buttons(builder.build_single_choice_keyboard("q2_2"))]
+    assert codec.decode(single[0]) == Callback(CallbackAction.SINGLE_CHOICE, "q2_2", "yes")
+
+    multi = [button.callback_data for button in iter_buttons(builder.build_multi_choice_keyboard_for_mask("q3_1", 0))]
+    assert codec.decode(multi[0]) == Callback(CallbackAction.MULTI_CHOICE_TOGGLE, "q3_1", "q3_1_plant")
+    assert codec.decode(multi[-1]) == Callback(CallbackAction.MULTI_CHOICE_DONE, "q3_1")
+
+    skip = next(iter_buttons(builder.build_comment_prompt_keyboard("q3_1", "q3_1_plant", False))).callback_data
+    assert codec.decode(skip) == Callback(CallbackAction.SKIP_COMMENT, "q3_1", "q3_1_plant")
+
+    for data in single + multi + [skip]:
+        assert len(data.encode("utf-8")) <= 8, data
+
+def test_legacy_callback_data():
+    """Тестирование прежнего формата callback_data (уже отправленные клавиатуры)"""
+    codec = CallbackCodec(SurveyManager().graph)
+    assert codec.decode("start_survey") == Callback(CallbackAction.START_SURVEY)
+    assert codec.decode("single_choice:q2_2:yes") == Callback(CallbackAction.SINGLE_CHOICE, "q2_2", "yes")
+    assert codec.decode("multi_choice_toggle:q2_3:q2_3_water") == \
+        Callback(CallbackAction.MULTI_CHOICE_TOGGLE, "q2_3", "q2_3_water")
+    assert codec.decode("multi_choice_done:q2_3") == Callback(CallbackAction.MULTI_CHOICE_DONE, "q2_3")
+    assert codec.decode("skip_comment:q3_1:q3_1_plant") == Callback(CallbackAction.SKIP_COMMENT, "q3_1", "q3_1_plant")
+    # ID, которых нет в графе, разбираются как раньше
+    assert codec.decode("single_choice:q9_9:maybe:later") == \
+        Callback(CallbackAction.SINGLE_CHOICE, "q9_9", "maybe:later")
+    assert codec.decode("multi_choice_toggle:q2_3") is None
+    assert codec.decode("unknown") is None
+    assert codec.decode(None) is None
+
+def test_graph_versions():
+    """Тестирование токенов другой версии опроса"""
+    with open("survey_config.json", "r", encoding="utf-8") as f:
+        config = json.load(f)
+    codec = CallbackCodec(compile_survey(config))
+
+    # Вариант добавлен в начало: индексы сдвинулись, а старые токены не должны попасть в другой вариант
+    config["questions"]["q2_2"]["options"].insert(0, {"id": "unsure", "text": "Не знаю"})
+    new_codec = CallbackCodec(compile_survey(config))
+    old_token = codec.encode(CallbackAction.SINGLE_CHOICE, "q2_2", "yes")
+    assert codec.tag != new_codec.tag
+    assert new_codec.decode(old_token) is None
+    assert new_codec.decode(new_codec.encode(CallbackAction.SINGLE_CHOICE, "q2_2", "yes")).option_id == "yes"
+
+    # Длинные ID вне графа не должны превышать ограничение Telegram
+    try:
+        codec.encode(CallbackAction.SINGLE_CHOICE, "q" * 40, "o" * 40)
+    except ValueError:
+        pass
+    else:
+        raise AssertionError(f"callback_data длиннее {MAX_CALLBACK_DATA_BYTES} байт не отклонена")
@@ -3,11 +3,16 @@
 Скрипт для тестирования конфигурации бота
 """
 
+import copy
 import json
 import os
+import tempfile
 from dotenv import load_dotenv
 from bot.survey_manager import SurveyManager
 from bot.config import Config
+from bot.config_lint import ConfigLintError, lint_survey_config
+from bot.survey_snapshot import SurveyConfigRegistry, load_snapshot, write_snapshot_artifact
+from bot.validators import ValidatorRegistry
 
 def test_survey_config():
     """Тестирование конфигурации опроса"""
@@ -34,6 +39,94 @@ def test_survey_config():
         print(f"❌ Ошибка загрузки конфигурации: {e}")
         return False
 
+def test_survey_graph_lint():
+    """Тестирование графа опроса: все вопросы достижимы, ссылки и типы корректны"""
+    survey_manager = SurveyManager()
+    path = lint_survey_config(survey_manager.config)
+    # Цепочка next проходит все вопросы в порядке конфигурации
+    assert path == survey_manager.graph.question_ids
+
+def test_survey_graph_lint_errors():
+    """Тестирование сообщений об ошибках в конфигурации"""
+    with open("survey_config.json", 'r', encoding='utf-8') as f:
+        base = json.load(f)
+    
+    def broken(change):
+        config = copy.deepcopy(base)
+        change(config["questions"])
+        return config
+    
+    cases = [
+        ("цикл", broken(lambda q: q["q1_3"].update(next="q1_2")), "questions.q1_3.next"),
+        ("ссылка на несуществующий вопрос", broken(lambda q: q["q2_1"].update(next="q2_9")), "questions.q2_1.next"),
+        ("недостижимый вопрос", broken(lambda q: q["q1_4"].update(next="q2_1")), "questions.q1_5"),
+        ("неизвестный тип валидации", broken(lambda q: q["q1_3"].update(validation="decimal")), "questions.q1_3.validation"),
+        ("вариант без ID", broken(lambda q: q["q2_2"]["options"][1].pop("id")), "questions.q2_2.options[1].id"),
+        ("повторяющийся ID варианта", broken(lambda q: q["q2_3"]["options"][1].update(id=q["q2_3"]["options"][0]["id"])),
+         "questions.q2_3.options[1].id"),
+        ("неизвестный тип вопроса", broken(lambda q: q["q4_2"].update(type="choice")), "questions.q4_2.type"),
+    ]
+    
+    for name, config, location in cases:
+        try:
+            lint_survey_config(config)
+        except ConfigLintError as e:
+            assert e.location == location, f"{name}: ожидалось место {location}, получено {e}"
+        else:
+            raise AssertionError(f"Не обнаружено: {name}")
+
+def test_survey_custom_validation_type():
+    """Тестирование конфигурации с собственным типом валидации"""
+    with open("survey_config.json", 'r', encoding='utf-8') as f:
+        config = json.load(f)
+    config["validation_types"]["inn"] = "Проверка ИНН (10 или 12 цифр)"
+    config["questions"]["q1_3"]["validation"] = "inn"
+    
+    with tempfile.TemporaryDirectory() as directory:
+        config_file = os.path.join(directory, "survey_config.json")
+        with open(config_file, 'w', encoding='utf-8') as f:
+            json.dump(config, f, ensure_ascii=False)
+        
+        # Валидатор подключается при запуске, а не в конфигурации - загрузка и перезагрузка проходят
+        registry = SurveyConfigRegistry(config_file)
+        assert registry.current.graph.questions["q1_3"].validation == "inn"
+        config["questions"]["q1_1"]["text"] = "Как вас зовут?"
+        with open(config_file, 'w', encoding='utf-8') as f:
+            json.dump(config, f, ensure_ascii=False)
+        assert registry.reload()
+        
+        validators = ValidatorRegistry.from_config(
+            registry.current.config["validation_types"],
+            custom_validators={"inn": lambda value: value.isdigit() and len(value) in (10, 12)}
+        )
+        assert validators.validate("inn", "7707083893")
+        assert not validators.validate("inn", "77070")
+
+def test_survey_config_artifact():
+    """Тестирование скомпилированной конфигурации и отказа от ошибочной перезагрузки"""
+    with tempfile.TemporaryDirectory() as directory:
+        config_file = os.path.join(directory, "survey_config.json")
+        artifact_file = os.path.join(directory, "survey_config.snapshot")
+        with open("survey_config.json", 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        with open(config_file, 'w', encoding='utf-8') as f:
+            json.dump(config, f, ensure_ascii=False)
+        
+        write_snapshot_artifact(load_snapshot(config_file, 1), artifact_file)
+        snapshot = load_snapshot(config_file, 7, artifact_file)
+        assert snapshot.version == 7
+        assert snapshot.graph.question_ids == tuple(config["questions"])
+        
+        # После изменения исходного файла устаревший снимок не используется,
+        # а конфигурация с ошибкой не становится текущей
+        registry = SurveyConfigRegistry(config_file, artifact_file=artifact_file)
+        config["questions"]["q1_3"]["next"] = "q1_2"
+        with open(config_file, 'w', encoding='utf-8') as f:
+            json.dump(config, f, ensure_ascii=False)
+        assert not registry.reload()
+        assert registry.current.version == 1
+        assert registry.failed_reload_count == 1
+
 def test_env_variables():
     """Тестирование переменных окружения"""
     print("\n🔍 Тестирование переменных окружения...")
@@ -122,6 +215,10 @@ def main():
     
     tests = [
         ("Конфигурация опроса", test_survey_config),
+        ("Граф опроса", test_survey_graph_lint),
+        ("Ошибки в конфигурации", test_survey_graph_lint_errors),
+        ("Собственный тип валидации", test_survey_custom_validation_type),
+        ("Скомпилированная конфигурация", test_survey_config_artifact),
         ("Переменные окружения", test_env_variables),
         ("Файл учетных данных", test_credentials_file),
         ("Класс конфигурации", test_config_class)
@@ -131,7 +228,8 @@ def main():
     
     for test_name, test_func in tests:
         try:
-            result = test_func()
+            # Тесты на assert ничего не возвращают: пройден, если не вернул False
+            result = test_func() is not False
             results.append((test_name, result))
         except Exception as e:
             print(f"❌ Ошибка в тесте '{test_name}': {e}")
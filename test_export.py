@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Скрипт для тестирования выгрузки анкет в CSV и Parquet
+"""
+
+import csv
+import os
+import tempfile
+
+import pytest
+
+from bot.bulk import BulkProcessor
+from bot.export import KEY_COLUMN, SurveyExporter
+from bot.google_sheets import LAYOUT_BLOCKS, LAYOUT_WIDE, SEPARATOR_ROW
+from bot.outbox import SurveyOutbox
+from test_bulk import VALID_ANSWERS
+
+def make_outbox(path: str, count: int, layout: str = LAYOUT_BLOCKS) -> SurveyOutbox:
+    """Журнал с count анкетами в формате format_answers_for_sheets"""
+    processor = BulkProcessor.from_config_file(layout=layout)
+    outbox = SurveyOutbox(path)
+    for index in range(count):
+        answers = dict(VALID_ANSWERS, q1_1=f"Иванов Иван Иванович {index}")
+        outbox.append(f"survey-{index}", processor.format_rows(answers))
+    return outbox
+
+def test_csv_wide():
+    """Тестирование выгрузки в CSV с колонкой на вопрос"""
+    processor = BulkProcessor.from_config_file()
+    exporter = SurveyExporter(processor.graph, chunk_size=3)
+    with tempfile.TemporaryDirectory() as tmp:
+        outbox = make_outbox(os.path.join(tmp, "outbox.sqlite3"), 10)
+        output = os.path.join(tmp, "responses.csv")
+        # Порция чтения журнала меньше числа анкет - проверяем постраничный перебор
+        assert exporter.to_csv(outbox.iter_all(batch_size=4), output) == 10
+        outbox.close()
+
+        with open(output, encoding='utf-8', newline='') as f:
+            rows = list(csv.reader(f))
+
+    expected = processor.format_rows(dict(VALID_ANSWERS, q1_1="Иванов Иван Иванович 7"))
+    assert rows[0] == [KEY_COLUMN] + list(processor.graph.question_ids)
+    assert len(rows) == 11
+    assert rows[8] == ["survey-7"] + [answer for _, answer in expected]
+
+def test_csv_blocks_matches_sheets():
+    """Тестирование выгрузки в CSV теми же строками, что и в Google Sheets"""
+    processor = BulkProcessor.from_config_file(layout=LAYOUT_WIDE)
+    exporter = SurveyExporter(processor.graph)
+    with tempfile.TemporaryDirectory() as tmp:
+        # Анкеты в широкой раскладке тоже раскладываются по вопросам
+        outbox = make_outbox(os.path.join(tmp, "outbox.sqlite3"), 2, layout=LAYOUT_WIDE)
+        surveys = list(outbox.iter_all())
+        outbox.close()
+        wide_output = os.path.join(tmp, "wide.csv")
+        exporter.to_csv(surveys, wide_output)
+        with open(wide_output, encoding='utf-8', newline='') as f:
+            wide_rows = list(csv.reader(f))
+        assert wide_rows[1][1:] == surveys[0][1][0]
+
+        blocks = BulkProcessor.from_config_file().format_rows(VALID_ANSWERS)
+        blocks_output = os.path.join(tmp, "blocks.csv")
+        exporter.to_csv([(None, blocks), (None, blocks)], blocks_output, layout=LAYOUT_BLOCKS)
+        with open(blocks_output, encoding='utf-8', newline='') as f:
+            block_rows = list(csv.reader(f))
+
+    assert block_rows == [['Вопросы', 'Ответы']] + (blocks + [SEPARATOR_ROW]) * 2
+
+def test_surveys_from_other_config_version():
+    """Тестирование анкет, собранных по другой версии опроса"""
+    processor = BulkProcessor.from_config_file()
+    exporter = SurveyExporter(processor.graph)
+    rows = processor.format_rows(VALID_ANSWERS)
+    # В прежней версии не было вопроса q1_2, а вопросы шли в другом порядке
+    old_version = list(reversed([row for row in rows if row[0] != processor.graph.questions["q1_2"].text]))
+    # В другой версии был вопрос, которого нет сейчас
+    unknown = rows + [["Площадь участка, га", "12"]]
+    surveys = [("current", rows), ("old", old_version), ("unknown", unknown), ("short", [["1", "2"]])]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        output = os.path.join(tmp, "responses.csv")
+        # Выгрузка не прерывается: анкеты, которые нельзя разложить по вопросам, пропускаются
+        assert exporter.to_csv(surveys, output) == 2
+        with open(output, encoding='utf-8', newline='') as f:
+            records = list(csv.reader(f))[1:]
+
+    assert exporter.skipped == ["unknown", "short"]
+    answers = [answer for _, answer in rows]
+    assert records[0] == ["current"] + answers
+    # Ответы прежней версии - в колонках своих вопросов, на новый вопрос ответа нет
+    q1_2 = processor.graph.question_ids.index("q1_2")
+    assert records[1] == ["old"] + answers[:q1_2] + [""] + answers[q1_2 + 1:]
+
+def test_parquet():
+    """Тестирование выгрузки в Parquet"""
+    pq = pytest.importorskip("pyarrow.parquet")
+
+    processor = BulkProcessor.from_config_file()
+    exporter = SurveyExporter(processor.graph, chunk_size=4)
+    with tempfile.TemporaryDirectory() as tmp:
+        outbox = make_outbox(os.path.join(tmp, "outbox.sqlite3"), 10)
+        output = os.path.join(tmp, "responses.parquet")
+        assert exporter.to_parquet(outbox.iter_all(), output) == 10
+        outbox.close()
+        parquet_file = pq.ParquetFile(output)
+        table = parquet_file.read()
+
+    assert parquet_file.num_row_groups == 3
+    assert table.column_names == [KEY_COLUMN] + list(processor.graph.question_ids)
+    assert table.column("q1_1").to_pylist()[7] == "Иванов Иван Иванович 7"
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+"""
+Тесты локального журнала анкет и фоновой очереди выгрузки
+"""
+
+import asyncio
+import os
+import tempfile
+
+from bot.export_queue import SurveyExportQueue
+from bot.outbox import SurveyOutbox
+
+SURVEY = [["1.1. ФИО", "Иванов Иван Иванович"]]
+
+class FlakyWriter:
+    """Запись в таблицу, которая первые failures раз завершается ошибкой"""
+
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.batches = []
+
+    async def __call__(self, surveys):
+        if self.failures > 0:
+            self.failures -= 1
+            raise ConnectionError("Google Sheets недоступен")
+        self.batches.append(list(surveys))
+
+    @property
+    def surveys(self):
+        return [survey for batch in self.batches for survey in batch]
+
+def make_outbox(directory):
+    return SurveyOutbox(os.path.join(directory, "outbox.sqlite3"))
+
+def test_outbox_dedupes_by_key():
+    """Повторная запись с тем же ключом игнорируется"""
+    with tempfile.TemporaryDirectory() as directory:
+        outbox = make_outbox(directory)
+        assert outbox.append("1:session", SURVEY)
+        assert not outbox.append("1:session", SURVEY)
+        assert outbox.pending() == [("1:session", SURVEY)]
+
+        outbox.mark_exported(["1:session"])
+        assert outbox.pending_count() == 0
+        outbox.close()
+
+def test_queue_dedupes_by_key():
+    """Одна и та же анкета, поставленная дважды, выгружается один раз"""
+    with tempfile.TemporaryDirectory() as directory:
+        outbox = make_outbox(directory)
+        writer = FlakyWriter()
+        queue = SurveyExportQueue(writer, outbox=outbox, flush_interval=0.01)
+
+        async def run():
+            await queue.put(SURVEY, key="1:session")
+            await queue.put(SURVEY, key="1:session")
+            await queue.stop()
+
+        asyncio.run(run())
+        assert writer.surveys == [SURVEY]
+        assert outbox.pending_count() == 0
+        outbox.close()
+
+def test_replay_outbox_on_start():
+    """Анкеты, оставшиеся в журнале после прошлого запуска, выгружаются при старте"""
+    with tempfile.TemporaryDirectory() as directory:
+        outbox = make_outbox(directory)
+        outbox.append("1:old", SURVEY)
+        outbox.append("2:old", SURVEY)
+        writer = FlakyWriter()
+        queue = SurveyExportQueue(writer, outbox=outbox, flush_interval=0.01)
+
+        async def run():
+            await queue.put(SURVEY, key="3:new")
+            await queue.stop()
+
+        asyncio.run(run())
+        # Новая анкета есть и в журнале, и в очереди, но выгружается один раз
+        assert len(writer.surveys) == 3
+        assert outbox.pending_count() == 0
+        outbox.close()
+
+def test_failed_batch_is_retried_from_outbox():
+    """Пакет, не выгруженный при сбросе, остается в журнале и выгружается при следующем чтении"""
+    with tempfile.TemporaryDirectory() as directory:
+        outbox = make_outbox(directory)
+        writer = FlakyWriter(failures=1)
+        queue = SurveyExportQueue(writer, outbox=outbox, flush_interval=0.01,
+                                  retry_base_delay=0, outbox_rescan_interval=0.05)
+
+        async def run():
+            await queue.put(SURVEY, key="1:session")
+            # Как в webhook-режиме: сброс не ждет повторных попыток
+            await queue.flush()
+            assert writer.surveys == []
+            assert outbox.pending_count() == 1
+            assert queue.failed_count == 1
+
+            await asyncio.sleep(0.2)
+            await queue.stop()
+
+        asyncio.run(run())
+        assert writer.surveys == [SURVEY]
+        assert outbox.pending_count() == 0
+        outbox.close()
+
+def test_full_queue_does_not_block_with_outbox():
+    """С журналом переполненная очередь не блокирует обработчик"""
+    with tempfile.TemporaryDirectory() as directory:
+        outbox = make_outbox(directory)
+        release = asyncio.Event()
+        written = []
+
+        async def slow_writer(surveys):
+            await release.wait()
+            written.extend(surveys)
+
+        queue = SurveyExportQueue(slow_writer, outbox=outbox, max_batch_size=1, max_queue_size=1,
+                                  flush_interval=0.01, outbox_rescan_interval=0.05)
+
+        async def run():
+            for user_id in range(5):
+                await asyncio.wait_for(queue.put(SURVEY, key=f"{user_id}:session"), 1.0)
+            release.set()
+            await asyncio.sleep(0.3)
+            await queue.stop()
+
+        asyncio.run(run())
+        assert len(written) == 5
+        assert outbox.pending_count() == 0
+        outbox.close()
+
+def test_failed_batch_retained_without_outbox():
+    """Без журнала пакет после max_retries попыток остается в памяти и выгружается позже"""
+    writer = FlakyWriter(failures=2)
+    queue = SurveyExportQueue(writer, flush_interval=0.01, retry_base_delay=0, max_retries=2,
+                              outbox_rescan_interval=0.05)
+
+    async def run():
+        await queue.put(SURVEY)
+        await queue.flush()
+        assert writer.surveys == []
+        assert queue.failed_count == 1 and queue.retries_count == 1
+        assert queue.pending_count == 1
+
+        await asyncio.sleep(0.2)
+        assert writer.surveys == [SURVEY]
+        assert queue.pending_count == 0
+        await queue.stop()
+
+    asyncio.run(run())
+
+def test_retained_batch_written_on_stop():
+    """Без журнала отложенные анкеты выгружаются при остановке"""
+    writer = FlakyWriter(failures=1)
+    queue = SurveyExportQueue(writer, flush_interval=0.01, retry_base_delay=0, max_retries=1)
+
+    async def run():
+        await queue.put(SURVEY)
+        await queue.flush()
+        assert queue.pending_count == 1
+        await queue.stop()
+
+    asyncio.run(run())
+    assert writer.surveys == [SURVEY]
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+"""
+Скрипт для тестирования ограничения исходящих запросов к Telegram
+"""
+
+import asyncio
+from telegram.error import RetryAfter
+from bot.rate_limiter import FloodControlRateLimiter, PRIORITY_BULK, PRIORITY_INTERACTIVE
+
+def test_per_chat_limit():
+    """Тестирование ограничения запросов одного чата"""
+    limiter = FloodControlRateLimiter(per_chat_rate=20.0, per_chat_burst=1)
+
+    async def send():
+        return True
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await asyncio.gather(*(
+            limiter.process_request(send, (), {}, "sendMessage", {"chat_id": 1}, None) for _ in range(5)
+        ))
+        # Другой чат не ждет очереди первого
+        other_started = loop.time()
+        await limiter.process_request(send, (), {}, "sendMessage", {"chat_id": 2}, None)
+        return other_started - started, loop.time() - other_started
+
+    chat_elapsed, other_elapsed = asyncio.run(run())
+    # 5 запросов при 20 в секунду и корзине на 1 запрос - не быстрее 0.2 с
+    assert chat_elapsed >= 0.19, chat_elapsed
+    assert other_elapsed < 0.05, other_elapsed
+    assert limiter.sent_count == 6
+
+def test_retry_after():
+    """Тестирование повтора запроса после RetryAfter"""
+    limiter = FloodControlRateLimiter(max_retries=2)
+    attempts = []
+
+    async def send():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise RetryAfter(0)
+        return True
+
+    result = asyncio.run(limiter.process_request(send, (), {}, "editMessageText", {"chat_id": 1}, None))
+    assert result is True
+    assert len(attempts) == 3 and limiter.retry_after_count == 2
+
+def test_priorities():
+    """Тестирование приоритета ответов пользователям над массовой отправкой"""
+    limiter = FloodControlRateLimiter(global_rate=50.0, global_burst=1)
+    order = []
+
+    def make_send(name):
+        async def send():
+            order.append(name)
+            return True
+        return send
+
+    async def run():
+        bulk = [
+            asyncio.create_task(limiter.process_request(
+                make_send(f"bulk{index}"), (), {}, "sendMessage", {}, {"priority": PRIORITY_BULK}
+            ))
+            for index in range(4)
+        ]
+        await asyncio.sleep(0)
+        assert limiter.get_stats()["waiting_bulk"] == 3
+        interactive = limiter.process_request(
+            make_send("reply"), (), {}, "sendMessage", {}, {"priority": PRIORITY_INTERACTIVE}
+        )
+        await asyncio.gather(interactive, *bulk)
+
+    asyncio.run(run())
+    # Первый массовый запрос занял свободный токен, ответ обогнал остальные
+    assert order[:2] == ["bulk0", "reply"], order
+    assert limiter.queue_depth == 0
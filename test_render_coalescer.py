@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Скрипт для тестирования схлопывания перерисовок клавиатуры
+"""
+
+import asyncio
+from bot.render_coalescer import RenderCoalescer
+
+def test_coalesce_toggles():
+    """Тестирование одной перерисовки на серию нажатий"""
+    coalescer = RenderCoalescer(window=0.05)
+    rendered = []
+
+    async def render(mask):
+        rendered.append(mask)
+
+    async def run():
+        coalescer.mark_rendered("message", 0)
+        for mask in (0b1, 0b11, 0b111):
+            coalescer.schedule("message", mask, render)
+        await asyncio.sleep(0.1)
+        # Два нажатия на один вариант взаимно отменяются - редактирование не нужно
+        coalescer.schedule("message", 0b011, render)
+        coalescer.schedule("message", 0b111, render)
+        await asyncio.sleep(0.1)
+
+    asyncio.run(run())
+    assert rendered == [0b111]
+    assert coalescer.rendered_count == 1 and coalescer.skipped_count == 1
+
+def test_cancel_and_flush():
+    """Тестирование отмены и немедленной отправки перерисовок"""
+    coalescer = RenderCoalescer(window=10.0)
+    rendered = []
+
+    async def render(mask):
+        rendered.append(mask)
+
+    async def run():
+        coalescer.schedule("done", 0b1, render)
+        await coalescer.cancel("done")
+        coalescer.schedule("open", 0b10, render)
+        await coalescer.flush()
+
+    asyncio.run(run())
+    assert rendered == [0b10]
+    assert coalescer.pending_count == 0
+
+def test_cancel_waits_for_render_in_flight():
+    """Тестирование отмены во время уже отправляемой перерисовки"""
+    coalescer = RenderCoalescer(window=0.01)
+    started = asyncio.Event()
+    release = asyncio.Event()
+    edits = []
+
+    async def render(mask):
+        started.set()
+        await release.wait()
+        edits.append(mask)
+
+    async def run():
+        coalescer.schedule("message", 0b1, render)
+        await started.wait()
+        # Как в обработчике "Готово": отмена, затем итоговое сообщение
+        done = asyncio.create_task(coalescer.cancel("message"))
+        await asyncio.sleep(0.05)
+        assert not done.done()
+        release.set()
+        await done
+        edits.append("done")
+
+    asyncio.run(run())
+    assert edits == [0b1, "done"]
+    assert not coalescer._in_flight and coalescer.pending_count == 0
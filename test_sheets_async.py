@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Скрипт для тестирования асинхронного клиента Google Sheets на локальной заглушке API
+"""
+
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from bot.google_sheets import LAYOUT_BLOCKS, SEPARATOR_ROW
+from bot.sheets_async import AsyncSheetsManager
+
+STUB_TOKEN = "stub-token"
+
+class StubHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Очередь входящих соединений для параллельных запросов (по умолчанию 5)
+    request_queue_size = 128
+
+class StubCredentials:
+    """Учетные данные с обновлением токена без обращения к сети"""
+
+    def __init__(self, token=None):
+        self.token = token
+        self.refresh_count = 0
+
+    @property
+    def valid(self):
+        return self.token is not None
+
+    def refresh(self, request):
+        self.refresh_count += 1
+        self.token = STUB_TOKEN
+
+class SheetsStubServer:
+    """Локальная заглушка Sheets v4 REST API: принимает append/update/get и запоминает строки"""
+
+    def __init__(self, latency: float = 0.0, accepted_token: str = STUB_TOKEN):
+        self.latency = latency
+        self.accepted_token = accepted_token
+        self.rows = []
+        self.requests = 0
+        self._lock = threading.Lock()
+        self._server = StubHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _make_handler(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            # Заголовки и тело уходят одним сегментом (без задержки подтверждения TCP)
+            wbufsize = -1
+            disable_nagle_algorithm = True
+
+            def log_message(self, format, *args):
+                pass
+
+            def _reply(self, status, payload):
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _handle(self):
+                length = int(self.headers.get("Content-Length") or 0)
+                payload = json.loads(self.rfile.read(length)) if length else {}
+                if stub.latency:
+                    time.sleep(stub.latency)
+                with stub._lock:
+                    stub.requests += 1
+                    if self.headers.get("Authorization") != f"Bearer {stub.accepted_token}":
+                        self._reply(401, {"error": {"code": 401}})
+                        return
+                    if ":append" in self.path:
+                        stub.rows.extend(payload.get("values", []))
+                self._reply(200, {"spreadsheetId": "stub"})
+
+            do_GET = do_POST = do_PUT = _handle
+
+        return Handler
+
+def test_append_batch():
+    """Тестирование пакетной записи анкет"""
+
+    async def run(stub):
+        manager = AsyncSheetsManager(
+            "", "sheet-id", layout=LAYOUT_BLOCKS,
+            credentials=StubCredentials(STUB_TOKEN), api_endpoint=stub.url
+        )
+        assert await manager.test_connection_async()
+        await manager.append_survey_batch_async([[["q1", "a1"]], [["q2", "a2"]]])
+        await manager.close_async()
+
+    with SheetsStubServer() as stub:
+        asyncio.run(run(stub))
+        assert stub.rows == [["q1", "a1"], SEPARATOR_ROW, ["q2", "a2"], SEPARATOR_ROW]
+
+def test_token_refresh():
+    """Тестирование обновления токена после ответа 401"""
+    credentials = StubCredentials("expired-token")
+
+    async def run(stub):
+        manager = AsyncSheetsManager("", "sheet-id", credentials=credentials, api_endpoint=stub.url)
+        await asyncio.gather(*(
+            manager.append_survey_data_async([["q1", str(index)]]) for index in range(5)
+        ))
+        await manager.close_async()
+
+    with SheetsStubServer() as stub:
+        asyncio.run(run(stub))
+        assert len(stub.rows) == 10
+    assert credentials.token == STUB_TOKEN
+    # Токен обновляется один раз, даже если 401 получили все параллельные запросы
+    assert credentials.refresh_count == 1
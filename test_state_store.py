@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Скрипт для тестирования хранилищ состояний опроса
+"""
+
+import asyncio
+import json
+import os
+import tempfile
+import threading
+from bot.survey_engine import Event, SurveyEngine
+from bot.survey_manager import SurveyManager
+from bot.state_store import MemoryStateStore, SQLiteStateStore, RedisStateStore
+
+class FakeRedis:
+    """Локальная замена клиента Redis (get/set/delete/mget)"""
+
+    def __init__(self):
+        self.data = {}
+        self.expires = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        self.data[key] = value
+        self.expires[key] = ex
+
+    def delete(self, key):
+        self.data.pop(key, None)
+
+    def mget(self, keys):
+        return [self.data.get(key) for key in keys]
+
+def check_store(store):
+    """Проверить, что состояние переживает перезапуск воркера"""
+    worker = SurveyManager(state_store=store)
+    worker.begin_update(1)
+    worker.set_current_question(1, "q2_3")
+    worker.save_answer(1, "q1_1", "Иванов Иван Иванович")
+    worker.save_multi_choice_selection(1, "q2_3_water", True)
+    worker.commit_user_state(1)
+    session_key = worker.get_session_key(1)
+
+    # Новый воркер с тем же хранилищем видит состояние
+    other_worker = SurveyManager(state_store=store)
+    other_worker.begin_update(1)
+    # Ключ прохождения тот же: повторная выгрузка анкеты не создаст дубликат
+    assert other_worker.get_session_key(1) == session_key
+    assert other_worker.get_current_question(1) == "q2_3"
+    assert other_worker.get_all_answers(1) == {"q1_1": "Иванов Иван Иванович"}
+    assert other_worker.get_multi_choice_selections(1) == ["q2_3_water"]
+    assert other_worker.get_formatted_answers(1) == {"q1_1": "Иванов Иван Иванович"}
+
+    other_worker.clear_user_state(1)
+    # Запись удаляется при сохранении в конце обновления
+    assert other_worker.peek_user_state(1) is None
+    other_worker.commit_user_state(1)
+    assert store.load(1) is None
+
+def test_memory_store():
+    """Тестирование хранилища в памяти"""
+    check_store(MemoryStateStore())
+
+def test_sqlite_store():
+    """Тестирование хранилища SQLite"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = SQLiteStateStore(os.path.join(tmp_dir, "states.sqlite3"))
+        check_store(store)
+        store.close()
+
+def test_redis_store():
+    """Тестирование хранилища Redis на локальной замене клиента"""
+    check_store(RedisStateStore(FakeRedis()))
+
+class CountingStore(SQLiteStateStore):
+    """Хранилище SQLite, считающее обращения в потоке event loop и в других потоках"""
+
+    def __init__(self, path: str):
+        super().__init__(path)
+        self.loop_thread = threading.get_ident()
+        self.calls = []
+
+    def _record(self, name: str):
+        self.calls.append((name, threading.get_ident() == self.loop_thread))
+
+    def load(self, user_id):
+        self._record("load")
+        return super().load(user_id)
+
+    def save(self, state):
+        self._record("save")
+        super().save(state)
+
+    def delete(self, user_id):
+        self._record("delete")
+        super().delete(user_id)
+
+def test_update_does_not_block_loop():
+    """Тестирование обращений к общему хранилищу за одно обновление"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = CountingStore(os.path.join(tmp_dir, "states.sqlite3"))
+        manager = SurveyManager(state_store=store)
+        engine = SurveyEngine(manager)
+
+        async def update(handle):
+            # Как with_user_state в обработчиках
+            await manager.begin_update_async(1)
+            try:
+                handle()
+            finally:
+                await manager.commit_user_state_async(1)
+
+        def start():
+            manager.get_user_snapshot(1)
+            engine.handle(1, Event.START)
+            manager.get_user_state(1)
+
+        async def run():
+            # Новый пользователь: одно чтение и одна запись, обе вне event loop
+            await update(start)
+            assert store.calls == [("load", False), ("save", False)]
+            # /start: удаление записи тоже не блокирует event loop
+            store.calls.clear()
+            await update(lambda: manager.clear_user_state(1) or manager.is_waiting_for_comment(1))
+            assert store.calls == [("load", False), ("delete", False)]
+
+        asyncio.run(run())
+        assert store.load(1) is None
+        store.close()
+
+def test_evicted_session_saved_at_commit():
+    """Тестирование сессии, вытесненной из кэша во время обновления"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        store = CountingStore(os.path.join(tmp_dir, "states.sqlite3"))
+        manager = SurveyManager(state_store=store, max_sessions=1)
+
+        async def run():
+            await manager.begin_update_async(1)
+            await manager.begin_update_async(2)
+            manager.set_current_question(1, "q1_2")
+            # Сессия пользователя 2 вытесняет измененную сессию пользователя 1
+            manager.set_current_question(2, "q1_3")
+            assert 1 not in manager.states
+            assert manager.get_current_question(1) == "q1_2"
+            await manager.commit_user_state_async(1)
+            await manager.commit_user_state_async(2)
+
+        asyncio.run(run())
+        assert all(not on_loop for _, on_loop in store.calls)
+        assert [name for name, _ in store.calls].count("save") == 2
+        assert store.load(1).current_question == "q1_2"
+        assert store.load(2).current_question == "q1_3"
+        store.close()
+
+def test_store_ttl():
+    """Тестирование времени жизни записей в общих хранилищах"""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "states.sqlite3")
+        store = SQLiteStateStore(path, ttl=60)
+        manager = SurveyManager(state_store=store)
+        for user_id in (1, 2):
+            manager.set_current_question(user_id, "q1_2")
+            manager.commit_user_state(user_id)
+        # Запись пользователя 1 не обновлялась дольше ttl
+        store._conn.execute("UPDATE survey_states SET updated_at = updated_at - 120 WHERE user_id = 1")
+        assert store.load(1) is None
+        assert list(store.load_many([1, 2])) == [2]
+        store.close()
+
+        # При открытии хранилища устаревшие записи удаляются
+        store = SQLiteStateStore(path, ttl=60)
+        assert store._conn.execute("SELECT user_id FROM survey_states").fetchall() == [(2,)]
+        store.close()
+
+    client = FakeRedis()
+    manager = SurveyManager(state_store=RedisStateStore(client, ttl=60))
+    manager.set_current_question(1, "q1_2")
+    manager.commit_user_state(1)
+    assert client.expires["survey:state:1"] == 60
+
+    # Хранилище без своего времени жизни удаляет записи через session_ttl менеджера
+    client = FakeRedis()
+    manager = SurveyManager(state_store=RedisStateStore(client), session_ttl=90.5)
+    manager.set_current_question(1, "q1_2")
+    manager.commit_user_state(1)
+    assert client.expires["survey:state:1"] == 90
+
+def test_session_eviction():
+    """Тестирование вытеснения простаивающих сессий"""
+    spill_store = MemoryStateStore()
+    manager = SurveyManager(max_sessions=10, session_ttl=None, spill_store=spill_store)
+    for user_id in range(100):
+        manager.set_current_question(user_id, "q1_2")
+        manager.commit_user_state(user_id)
+
+    stats = manager.get_session_stats()
+    assert stats["resident_sessions"] == 10
+    assert stats["lru_evictions"] == 90
+
+    # Вытесненную сессию можно продолжить из хранилища вытеснения
+    assert manager.get_current_question(0) == "q1_2"
+    # Чтение состояния не создает сессию для нового пользователя
+    assert not manager.is_waiting_for_comment(10 ** 6)
+    assert 10 ** 6 not in manager.states
+
+def test_legacy_state_payload():
+    """Тестирование состояния, сохраненного без отформатированных ответов"""
+    store = RedisStateStore(FakeRedis())
+    store.client.set(store._key(1), json.dumps(
+        ["q2_3", {"q1_1": "Иванов Иван Иванович", "q2_2": {"option": "yes", "comment": ""}}, 0, None, None],
+        ensure_ascii=False
+    ).encode('utf-8'))
+
+    manager = SurveyManager(state_store=store)
+    formatted = manager.get_formatted_answers(1)
+    assert formatted["q1_1"] == "Иванов Иван Иванович"
+    assert formatted["q2_2"] == manager.get_option("q2_2", "yes").display_text
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Скрипт для тестирования движка переходов опроса
+"""
+
+from bot.data_processor import DataProcessor
+from bot.survey_engine import Action, Event, SurveyEngine
+from bot.survey_manager import SurveyManager
+
+def answer_text(engine, user_id, text):
+    return engine.handle(user_id, Event.TEXT, text=text)
+
+def select(manager, user_id, *option_ids):
+    for option_id in option_ids:
+        manager.save_multi_choice_selection(user_id, option_id, True)
+
+def test_full_survey():
+    """Тестирование прохождения всей анкеты"""
+    manager = SurveyManager()
+    engine = SurveyEngine(manager)
+    transitions = []
+    engine.add_hook(lambda event, from_question, transition, elapsed: transitions.append(
+        (event, from_question, transition.action)
+    ))
+
+    assert engine.handle(1, Event.START).question_id == "q1_1"
+    for text in ["Иванов Иван Иванович", "@ivanov", "12.5", "Краснодар", "50:20:0010336:38"]:
+        assert answer_text(engine, 1, text).action == Action.SEND_QUESTION
+    assert answer_text(engine, 1, "Пашня").question_id == "q2_2"
+
+    # Вариант с комментарием: сначала запрос комментария, потом следующий вопрос
+    transition = engine.handle(1, Event.SINGLE_CHOICE, "q2_2", "yes")
+    assert transition.action == Action.ASK_COMMENT and transition.option_id == "yes"
+    assert answer_text(engine, 1, "скважина").question_id == "q2_3"
+
+    # Пустой выбор не завершает вопрос
+    assert engine.handle(1, Event.MULTI_CHOICE_DONE, "q2_3").action == Action.SELECT_REQUIRED
+    select(manager, 1, "q2_3_water")
+    assert engine.handle(1, Event.MULTI_CHOICE_DONE, "q2_3").question_id == "q3_1"
+
+    # Два варианта с комментариями: второй запрос отправляется новым сообщением
+    select(manager, 1, "q3_1_plant", "q3_1_animal")
+    transition = engine.handle(1, Event.MULTI_CHOICE_DONE, "q3_1")
+    assert (transition.action, transition.option_id, transition.new_message) == (Action.ASK_COMMENT, "q3_1_plant", False)
+    transition = answer_text(engine, 1, "пшеница")
+    assert (transition.action, transition.option_id, transition.new_message) == (Action.ASK_COMMENT, "q3_1_animal", True)
+    assert answer_text(engine, 1, "козы").question_id == "q3_2"
+
+    select(manager, 1, "q3_2_finance")
+    engine.handle(1, Event.MULTI_CHOICE_DONE, "q3_2")
+    for question_id, option_id in [("q3_3", "maybe"), ("q4_1_water", "yes"), ("q4_1_electricity", "no"),
+                                   ("q4_1_roads", "yes"), ("q4_1_consultation", "no"), ("q4_2", "no")]:
+        engine.handle(1, Event.SINGLE_CHOICE, question_id, option_id)
+    answer_text(engine, 1, "Нет")
+    answer_text(engine, 1, "+7 (912) 345-67-89")
+    assert answer_text(engine, 1, "ivanov@mail.ru").action == Action.COMPLETE
+
+    answers = manager.get_all_answers(1)
+    assert answers["q2_2"] == {"option": "yes", "comment": "скважина"}
+    assert answers["q3_1"] == {"options": ["q3_1_plant", "q3_1_animal"],
+                               "comments": {"q3_1_plant": "пшеница", "q3_1_animal": "козы"}}
+    assert len(DataProcessor(manager).format_answers_for_sheets(1)) == len(manager.graph.question_ids)
+    assert manager.get_multi_choice_mask(1) == 0
+
+    # Хук вызывается на каждом переходе, комментарии различаются по событию
+    assert transitions[0] == (Event.START, "start", Action.SEND_QUESTION)
+    assert (Event.COMMENT, "q3_1", Action.ASK_COMMENT) in transitions
+    assert transitions[-1] == (Event.TEXT, "q7_email", Action.COMPLETE)
+
+def test_text_outside_survey():
+    """Тестирование текста вне опроса"""
+    manager = SurveyManager()
+    engine = SurveyEngine(manager)
+    assert answer_text(engine, 1, "привет").action == Action.NOT_STARTED
+    # Сессия не создается и сохранять нечего
+    assert manager.peek_user_state(1) is None
+    assert not manager._dirty
+
+    # Неизвестный вариант игнорируется
+    engine.handle(2, Event.START)
+    manager.commit_user_state(2)
+    assert engine.handle(2, Event.SINGLE_CHOICE, "q2_2", "unknown").action == Action.NONE
+    assert not manager._dirty
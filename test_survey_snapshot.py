@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Скрипт для тестирования перезагрузки конфигурации опроса без перезапуска
+"""
+
+import asyncio
+import json
+import os
+import pickle
+import signal
+import tempfile
+
+from bot.callback_data import CallbackAction
+from bot.keyboard_builder import KeyboardBuilder
+from bot.state_store import MemoryStateStore, dump_state, load_state
+from bot.survey_engine import Event, SurveyEngine
+from bot.survey_manager import SurveyManager
+from bot.survey_snapshot import SurveyConfigRegistry
+
+def load_config():
+    with open("survey_config.json", 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def write_config(path, config):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(config, f, ensure_ascii=False)
+
+def edited_config():
+    """Конфигурация с измененным текстом q1_1 и новым вариантом в q2_2"""
+    config = load_config()
+    config["questions"]["q1_1"]["text"] = "Как вас зовут?"
+    config["questions"]["q2_2"]["options"].insert(0, {"id": "unknown", "text": "Не знаю"})
+    return config
+
+def make_manager(path):
+    return SurveyManager(config_registry=SurveyConfigRegistry(path))
+
+def test_sessions_keep_version():
+    """Тестирование сессий, начатых до перезагрузки"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "survey_config.json")
+        write_config(path, load_config())
+        manager = make_manager(path)
+        engine = SurveyEngine(manager)
+        registry = manager.config_registry
+
+        engine.handle(1, Event.START)
+        old_builder = KeyboardBuilder(manager, callback_codec=registry.current.codec, graph=registry.current.graph)
+        old_token = old_builder.callback_codec.encode(CallbackAction.SINGLE_CHOICE, "q2_2", "yes")
+
+        write_config(path, edited_config())
+        assert registry.reload()
+        assert registry.current.version == 2
+
+        # Начатая сессия продолжает по первой версии, новая - по второй
+        assert manager.get_user_snapshot(1).version == 1
+        assert manager.get_user_graph(1).questions["q1_1"].text != "Как вас зовут?"
+        engine.handle(2, Event.START)
+        assert manager.get_user_graph(2).questions["q1_1"].text == "Как вас зовут?"
+        assert "unknown" not in manager.get_user_graph(1).questions["q2_2"].options_by_id
+        assert "unknown" in manager.get_user_graph(2).questions["q2_2"].options_by_id
+
+        # Индексы вариантов q2_2 сдвинулись, но кнопка старой клавиатуры разбирается по своей версии
+        callback = registry.decode_callback(old_token, version=2)
+        assert (callback.question_id, callback.option_id) == ("q2_2", "yes")
+
+        # Повторное /start переводит сессию на текущую версию
+        engine.handle(1, Event.START)
+        assert manager.get_user_snapshot(1).version == 2
+
+def test_failed_and_unchanged_reload():
+    """Тестирование перезагрузки с ошибкой и без изменений"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "survey_config.json")
+        write_config(path, load_config())
+        registry = SurveyConfigRegistry(path)
+        current = registry.current
+
+        # Файл без изменений не создает новую версию
+        assert not registry.reload()
+        assert registry.current is current
+
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write('{"blocks": [')
+        assert not registry.reload()
+        assert registry.current is current
+        assert registry.failed_reload_count == 1
+
+def test_reload_async():
+    """Тестирование перезагрузки в event loop"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "survey_config.json")
+        write_config(path, load_config())
+        registry = SurveyConfigRegistry(path)
+
+        # Изменение видно по mtime
+        write_config(path, edited_config())
+        os.utime(path, (0, 0))
+        assert asyncio.run(registry.reload_if_changed())
+        assert registry.current.version == 2
+        assert registry.current.graph.questions["q1_1"].text == "Как вас зовут?"
+        assert not asyncio.run(registry.reload_if_changed())
+
+def test_failed_reload_not_repeated():
+    """Тестирование файла с ошибкой при периодической проверке и перезагрузки по SIGHUP"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "survey_config.json")
+        write_config(path, load_config())
+        registry = SurveyConfigRegistry(path)
+
+        async def run():
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write('{"questions": ')
+            os.utime(path, (0, 0))
+            assert not await registry.reload_if_changed()
+            # Файл не менялся - повторной попытки и ошибки в логе нет
+            assert not await registry.reload_if_changed()
+            assert registry.failed_reload_count == 1
+
+            write_config(path, edited_config())
+            assert registry.install_signal_handler()
+            os.kill(os.getpid(), signal.SIGHUP)
+            for _ in range(100):
+                await asyncio.sleep(0.01)
+                if registry.reload_count:
+                    break
+            asyncio.get_running_loop().remove_signal_handler(signal.SIGHUP)
+
+        asyncio.run(run())
+        assert registry.reload_count == 1
+        assert registry.current.graph.questions["q1_1"].text == "Как вас зовут?"
+        assert not registry._signal_tasks
+
+def test_snapshot_graph_is_read_only():
+    """Тестирование неизменяемости графа, общего для всех сессий версии"""
+    graph = SurveyConfigRegistry().current.graph
+    for mapping in (graph.questions, graph.questions["q2_2"].options_by_id):
+        try:
+            mapping["q9_9"] = None
+        except TypeError:
+            continue
+        raise AssertionError("граф опроса можно изменить")
+    # Граф по-прежнему сериализуется для пула процессов и файла снимка
+    assert pickle.loads(pickle.dumps(graph)) == graph
+
+def test_state_keeps_version():
+    """Тестирование сохранения версии в хранилище состояний"""
+    manager = SurveyManager()
+    state = manager.get_user_state(1)
+    assert state.config_digest == manager.config_registry.current.digest
+    assert load_state(1, dump_state(state)).config_digest == state.config_digest
+
+def test_version_pinned_across_processes():
+    """Тестирование версии сессии в другом процессе с другой нумерацией версий"""
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "survey_config.json")
+        write_config(path, load_config())
+        store = MemoryStateStore()
+        first = SurveyManager(state_store=store, config_registry=SurveyConfigRegistry(path))
+        first.begin_update(1)
+        SurveyEngine(first).handle(1, Event.START)
+        first.commit_user_state(1)
+        original = first.get_user_graph(1)
+
+        # Другой процесс запущен с измененным файлом: у него версия 1 - другая конфигурация
+        write_config(path, edited_config())
+        second = SurveyManager(state_store=store, config_registry=SurveyConfigRegistry(path))
+        assert second.config_registry.current.version == 1
+        second.begin_update(1)
+        # Эту версию процесс не загружал - сессия продолжает по текущей
+        assert second.get_user_graph(1).questions["q1_1"].text == "Как вас зовут?"
+
+        # После возврата прежнего файла сессия снова идет по своей версии, хотя ее номер - 2
+        write_config(path, load_config())
+        assert second.config_registry.reload()
+        assert second.get_user_snapshot(1).version == 2
+        assert second.get_user_graph(1).questions["q1_1"].text == original.questions["q1_1"].text
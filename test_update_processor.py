@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Скрипт для тестирования параллельной обработки обновлений по пользователям
+"""
+
+import asyncio
+from telegram import CallbackQuery, Update, User
+from bot.update_processor import PerUserUpdateProcessor
+
+def make_update(update_id: int, user_id: int) -> Update:
+    user = User(id=user_id, first_name="user", is_bot=False)
+    query = CallbackQuery(id=str(update_id), from_user=user, chat_instance="test",
+                          data="multi_choice_toggle:q2_3:q2_3_water")
+    return Update(update_id=update_id, callback_query=query)
+
+def test_same_user_in_order():
+    """Тестирование последовательной обработки обновлений одного пользователя"""
+    processor = PerUserUpdateProcessor(16)
+    applied = []
+    running = set()
+
+    async def handle(update: Update, delay: float):
+        # Обновления одного пользователя не должны пересекаться во времени
+        assert update.effective_user.id not in running
+        running.add(update.effective_user.id)
+        await asyncio.sleep(delay)
+        running.discard(update.effective_user.id)
+        applied.append(update.update_id)
+
+    async def run():
+        # Первое обновление обрабатывается дольше остальных, но порядок сохраняется
+        delays = [0.05, 0.0, 0.01, 0.0]
+        await asyncio.gather(*(
+            processor.process_update(make_update(index, 1), handle(make_update(index, 1), delay))
+            for index, delay in enumerate(delays)
+        ))
+
+    asyncio.run(run())
+    assert applied == [0, 1, 2, 3]
+    assert processor.active_users == 0
+
+def test_users_in_parallel():
+    """Тестирование параллельной обработки разных пользователей"""
+    processor = PerUserUpdateProcessor(16)
+
+    async def handle():
+        await asyncio.sleep(0.05)
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        await asyncio.gather(*(
+            processor.process_update(make_update(user_id, user_id), handle()) for user_id in range(10)
+        ))
+        return loop.time() - started
+
+    elapsed = asyncio.run(run())
+    # 10 пользователей по 50 мс обрабатываются одновременно, а не за 500 мс
+    assert elapsed < 0.25, elapsed
+
+def test_user_queue_does_not_hold_slots():
+    """Тестирование очереди одного пользователя при ограничении одновременных обновлений"""
+    processor = PerUserUpdateProcessor(4)
+    finished = {}
+
+    async def handle(update_id: int):
+        await asyncio.sleep(0.05)
+        finished[update_id] = asyncio.get_running_loop().time()
+
+    async def run():
+        started = asyncio.get_running_loop().time()
+        # Пользователь 1 прислал 8 обновлений, пользователь 2 - одно после них
+        updates = [processor.process_update(make_update(index, 1), handle(index)) for index in range(8)]
+        updates.append(processor.process_update(make_update(8, 2), handle(8)))
+        await asyncio.gather(*updates)
+        return started
+
+    started = asyncio.run(run())
+    # Ожидающие в очереди пользователя 1 не занимают мест: пользователь 2 не ждет всю очередь
+    assert finished[8] < finished[1]
+    assert finished[8] - started < 0.1
+    assert processor.active_users == 0
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Скрипт для тестирования реестра валидаторов
+"""
+
+import itertools
+from bot.survey_manager import SurveyManager
+from bot.data_processor import DataProcessor
+from bot.validators import ValidatorRegistry
+
+def test_builtin_validators():
+    """Тестирование встроенных валидаторов"""
+    registry = ValidatorRegistry()
+    cases = [
+        ("email", "ivanov@mail.ru", True), ("email", "user@@mail.ru", False),
+        ("phone", "+7 (912) 345-67-89", True), ("phone", "12345", False),
+        ("number", " 12.5 ", True), ("number", "0,5", False),
+        ("full_name", "Иванов Иван Иванович", True), ("full_name", "Петрова Анна", False),
+        ("telegram_username", "@ivanov", True), ("telegram_username", "ivanov", False),
+        ("cadastral_number", " 50:20:0010336:38 ", True), ("cadastral_number", "::::", False),
+        ("cadastral_number", "1234567", False), ("cadastral_number", "50-20-0010336-38", False),
+    ]
+    for validation_type, value, expected in cases:
+        assert registry.validate(validation_type, value) == expected, (validation_type, value)
+
+def test_cadastral_number():
+    """Тестирование проверки кадастрового номера на всех коротких строках и длинном вводе"""
+    registry = ValidatorRegistry()
+    for length in range(7):
+        for chars in itertools.product("1: x", repeat=length):
+            value = "".join(chars)
+            stripped = value.strip()
+            expected = (bool(stripped) and set(stripped) <= set("1:")
+                        and "1" in stripped and ":" in stripped)
+            assert registry.validate("cadastral_number", value) == expected, repr(value)
+    # На таком вводе выражение с вложенными повторениями перебирало бы разбиения экспоненциально долго
+    assert not registry.validate("cadastral_number", "1:" * 20000 + "x")
+    assert registry.validate("cadastral_number", "1:" * 20000)
+
+def test_custom_validator():
+    """Тестирование собственного валидатора в DataProcessor"""
+    manager = SurveyManager()
+    processor = DataProcessor(manager)
+    assert processor.validate_answer("q1_1", "Иванов Иван Иванович")
+    assert not processor.validate_answer("q1_1", "Иванов")
+
+    # Замена проверки ФИО через реестр
+    processor.validators.register("full_name", lambda value: len(value.split()) >= 2)
+    assert processor.validate_answer("q1_1", "Петрова Анна")
+
+    # Тип без реализации не ограничивает ответ
+    registry = ValidatorRegistry.from_config(["email", "inn"])
+    assert "email" in registry and "inn" not in registry
+    assert registry.validate("inn", "что угодно")